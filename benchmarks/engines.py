@@ -0,0 +1,259 @@
+import contextlib
+import io
+import math
+import time
+
+import numpy as np
+
+from valuation import black_scholes_merton as bsm
+from valuation.binomial import binary_tree
+from valuation.binomial.binomial_lattice import lattice_value
+from valuation.binomial.binomial_option import BinaryOption
+from valuation.fourier import characteristic_functions as cf
+from valuation.fourier.carr_madan import carr_madan_value
+from valuation.fourier.cos_method import cos_value
+from valuation.fourier.fourier_valuation import Fourier
+from valuation.fourier.lewis import LewisPricer
+from valuation.market_data import MarketData
+from valuation.montecarlo.monte_carlo_simulation import MonteCarloSimulation
+from valuation.montecarlo.random_number_generator import RandomNumberGenerator as rng
+from valuation.option import Option
+
+# common contract and markets of the benchmarks
+UNDERLYING_PRICE = 100.0
+STRIKE = 100.0
+MATURITY = 1.0
+RATE = 0.05
+VOLATILITY = 0.2
+HESTON = dict(volatility=math.sqrt(0.04), rho=-0.7, theta=0.04, kappa=1.5, std_volatility=0.5)
+
+
+def timed(function, repeat=3):
+    """
+    Best wall clock time of a function over several runs, the first run being kept as the result
+    :param function: function
+    without arguments
+    :param repeat: int
+    :return: tuple (float, object)
+    seconds and result of the function
+    """
+    best = float('inf')
+    result = None
+    for run in range(repeat):
+        start = time.perf_counter()
+        output = function()
+        best = min(best, time.perf_counter() - start)
+        if run == 0:
+            result = output
+    return best, result
+
+
+def record(engine, case, parameter, value, seconds, error, contracts=1, **extra):
+    """
+    One measurement of the suite
+    :param engine: str
+    :param case: str
+    contract or model valued
+    :param parameter: str
+    resolution parameter that is varied (steps, paths, terms, contracts...)
+    :param value: int
+    :param seconds: float
+    :param error: float
+    largest absolute error against the reference
+    :param contracts: int
+    number of contracts valued in the measured time
+    :return: dict
+    """
+    measurement = {'engine': engine, 'case': case, 'parameter': parameter, 'value': int(value),
+                   'seconds': float(seconds), 'seconds_per_contract': float(seconds) / contracts,
+                   'error': float(error), 'contracts': int(contracts)}
+    measurement.update(extra)
+    return measurement
+
+
+def market():
+    return MarketData(RATE, VOLATILITY)
+
+
+def heston_market():
+    return MarketData(RATE, HESTON['volatility'], HESTON['rho'], HESTON['theta'], HESTON['kappa'],
+                      HESTON['std_volatility'])
+
+
+def references():
+    """
+    High precision values of the benchmark contracts: closed forms, a 10001 step Leisen-Reimer lattice with
+    Richardson extrapolation for the American put and a 4096 term COS expansion for Heston
+    :return: dict
+    """
+    european_call = float(bsm.BSM_value_array(UNDERLYING_PRICE, STRIKE, MATURITY, RATE, VOLATILITY, 1))
+    european_put = float(bsm.BSM_value_array(UNDERLYING_PRICE, STRIKE, MATURITY, RATE, VOLATILITY, 2))
+    american_put = lattice_value(BinaryOption(2, 2, UNDERLYING_PRICE, STRIKE, MATURITY, VOLATILITY, 1, market(),
+                                              10001), scheme='lr', richardson=True)
+    heston_call = float(cos_value(cf.characteristic_function(heston_market(), 'heston'), UNDERLYING_PRICE, STRIKE,
+                                  MATURITY, RATE, 1, terms=4096, truncation=12))
+    return {'european_call': european_call, 'european_put': european_put, 'american_put': american_put,
+            'heston_call': heston_call}
+
+
+def _closed_form_value(underlying_price, strike, maturity, r, volatility, option_type):
+    """
+    Scalar Black-Scholes-Merton value through math.erfc, independent from the vectorized implementation
+    """
+    d1 = (math.log(underlying_price / strike) + (r + 0.5 * volatility ** 2) * maturity) / (volatility *
+                                                                                         math.sqrt(maturity))
+    d2 = d1 - volatility * math.sqrt(maturity)
+    normal = lambda x: 0.5 * math.erfc(-x / math.sqrt(2))
+    if option_type == 1:
+        return underlying_price * normal(d1) - strike * math.exp(-r * maturity) * normal(d2)
+    return strike * math.exp(-r * maturity) * normal(-d2) - underlying_price * normal(-d1)
+
+
+def _random_book(contracts, seed=0):
+    generator = np.random.default_rng(seed)
+    return (generator.uniform(60, 140, contracts), generator.choice([0.1, 0.25, 0.5, 1.0, 2.0], contracts),
+            generator.uniform(0.1, 0.5, contracts), generator.integers(1, 3, contracts))
+
+
+def bsm_value(reference, quick):
+    """
+    BSM_value one contract at a time and BSM_value_array over whole books
+    """
+    results = []
+    strikes, maturities, volatilities, option_types = _random_book(100)
+    expected = [_closed_form_value(UNDERLYING_PRICE, k, t, RATE, v, o)
+                for k, t, v, o in zip(strikes, maturities, volatilities, option_types)]
+
+    def scalar():
+        values = []
+        for k, t, v, o in zip(strikes, maturities, volatilities, option_types):
+            values.append(bsm.BSM_value(Option(int(o), 1, UNDERLYING_PRICE, k, t), MarketData(RATE, v)))
+        return values
+    seconds, values = timed(scalar)
+    results.append(record('BSM_value', 'european', 'contracts', 100, seconds,
+                          np.max(np.abs(np.array(values) - expected)), 100))
+
+    for contracts in (1000, 10000, 100000) if quick else (1000, 10000, 100000, 1000000):
+        strikes, maturities, volatilities, option_types = _random_book(contracts)
+        seconds, values = timed(lambda: bsm.BSM_value_array(UNDERLYING_PRICE, strikes, maturities, RATE,
+                                                            volatilities, option_types))
+        sample = slice(0, 100)
+        error = np.max(np.abs(values[sample] - [_closed_form_value(UNDERLYING_PRICE, k, t, RATE, v, o) for
+                                                 k, t, v, o in zip(strikes[sample], maturities[sample],
+                                                                   volatilities[sample], option_types[sample])]))
+        results.append(record('BSM_value_array', 'european', 'contracts', contracts, seconds, error, contracts))
+    return results
+
+
+def implied_volatility(reference, quick):
+    """
+    implied_volatility one quote at a time and implied_volatility_array over whole chains, the error being
+    measured on the volatilities the quotes were generated with. Quotes with a vega below 1e-2 hardly depend
+    on the volatility and are left out of the error.
+    """
+    results = []
+    strikes, maturities, volatilities, option_types = _random_book(100)
+    quotes = bsm.BSM_value_array(UNDERLYING_PRICE, strikes, maturities, RATE, volatilities, option_types)
+
+    def scalar():
+        return [bsm.implied_volatility(Option(int(o), 1, UNDERLYING_PRICE, k, t), MarketData(RATE), q)[0]
+                for k, t, o, q in zip(strikes, maturities, option_types, quotes)]
+    seconds, solved = timed(scalar)
+    results.append(record('implied_volatility', 'european', 'quotes', 100, seconds,
+                          _volatility_error(solved, strikes, maturities, volatilities), 100))
+
+    for contracts in (1000, 10000, 100000) if quick else (1000, 10000, 100000, 1000000):
+        strikes, maturities, volatilities, option_types = _random_book(contracts)
+        quotes = bsm.BSM_value_array(UNDERLYING_PRICE, strikes, maturities, RATE, volatilities, option_types)
+        seconds, solved = timed(lambda: bsm.implied_volatility_array(quotes, UNDERLYING_PRICE, strikes, maturities,
+                                                                     RATE, option_types)[0])
+        results.append(record('implied_volatility_array', 'european', 'quotes', contracts, seconds,
+                              _volatility_error(solved, strikes, maturities, volatilities), contracts))
+    return results
+
+
+def _volatility_error(solved, strikes, maturities, volatilities):
+    vega = bsm.BSM_greeks_array(UNDERLYING_PRICE, strikes, maturities, RATE, volatilities)['vega']
+    return np.nanmax(np.abs(np.asarray(solved) - volatilities)[vega > 1e-2])
+
+
+def binomial_tree(reference, quick):
+    """
+    The linked binary tree (createTree, computeSt, computePayOff), whose size doubles with every step,
+    and the recombining lattices
+    """
+    results = []
+    for steps in range(2, 13 if quick else 17, 2):
+        option = BinaryOption(2, 1, UNDERLYING_PRICE, STRIKE, MATURITY, VOLATILITY, 1, market(), steps)
+
+        def tree():
+            root = binary_tree.createTree(steps, option)
+            binary_tree.computeSt(root, option, steps)
+            return binary_tree.computePayOff(root, option, steps)
+        seconds, value = timed(tree, repeat=1 if steps > 12 else 3)
+        results.append(record('binary_tree', 'european_put', 'steps', steps, seconds,
+                              abs(value - reference['european_put'])))
+
+    for scheme in ('crr', 'lr'):
+        for steps in (25, 50, 100, 200, 400, 800, 1600) if quick else (25, 50, 100, 200, 400, 800, 1600, 3200):
+            for case, style in (('european_put', 1), ('american_put', 2)):
+                option = BinaryOption(2, style, UNDERLYING_PRICE, STRIKE, MATURITY, VOLATILITY, 1, market(), steps)
+                seconds, value = timed(lambda: lattice_value(option, scheme=scheme))
+                results.append(record('lattice_' + scheme, case, 'steps', steps, seconds,
+                                      abs(value - reference[case])))
+    return results
+
+
+def monte_carlo(reference, quick):
+    """
+    MonteCarloSimulation.valuate_option on European calls, American puts (Longstaff-Schwartz) and Heston calls
+    """
+    results = []
+    cases = (('european_call', 1, 1, False), ('american_put', 2, 2, False), ('heston_call', 1, 1, True))
+    for paths in (1000, 10000, 100000) if quick else (1000, 10000, 100000, 1000000):
+        for case, option_type, style, stochastic_volatility in cases:
+            market_data = heston_market() if stochastic_volatility else market()
+
+            def simulation():
+                option = Option(option_type, style, UNDERLYING_PRICE, STRIKE, MATURITY)
+                return MonteCarloSimulation(option, market_data, stochastic_volatility, paths=paths,
+                                            random_state=rng.create_generator(0)).valuate_option()
+            seconds, (value, std_error, _) = timed(simulation, repeat=1 if paths > 100000 else 3)
+            results.append(record('monte_carlo', case, 'paths', paths, seconds, abs(value - reference[case]),
+                                  std_error=std_error))
+    return results
+
+
+def fourier(reference, quick):
+    """
+    Fourier.valuate_option (binomial convolution by FFT) and the characteristic function engines
+    """
+    results = []
+    option = Option(1, 1, UNDERLYING_PRICE, STRIKE, MATURITY)
+    for steps in (64, 256, 1024, 4096) if quick else (64, 256, 1024, 4096, 16384):
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds, value = timed(lambda: Fourier.valuate_option(option, steps, market()))
+        results.append(record('fourier_binomial', 'european_call', 'steps', steps, seconds,
+                              abs(value - reference['european_call'])))
+
+    characteristic_function = cf.characteristic_function(heston_market(), 'heston')
+    for terms in (16, 32, 64, 128, 256):
+        seconds, value = timed(lambda: float(cos_value(characteristic_function, UNDERLYING_PRICE, STRIKE, MATURITY,
+                                                       RATE, 1, terms)))
+        results.append(record('cos', 'heston_call', 'terms', terms, seconds, abs(value - reference['heston_call'])))
+    for points in (16, 32, 64, 96, 128):
+        seconds, value = timed(lambda: float(LewisPricer(characteristic_function, points).value(
+            UNDERLYING_PRICE, STRIKE, MATURITY, RATE)))
+        results.append(record('lewis', 'heston_call', 'points', points, seconds,
+                              abs(value - reference['heston_call'])))
+    for points in (256, 1024, 4096, 16384):
+        seconds, value = timed(lambda: carr_madan_value(characteristic_function, UNDERLYING_PRICE,
+                                                        np.array([STRIKE]), MATURITY, RATE, 1, points)[0])
+        results.append(record('carr_madan', 'heston_call', 'points', points, seconds,
+                              abs(value - reference['heston_call'])))
+    return results
+
+
+# benchmark groups, in the order they are run
+SUITES = {'bsm_value': bsm_value, 'implied_volatility': implied_volatility, 'binomial_tree': binomial_tree,
+          'monte_carlo': monte_carlo, 'fourier': fourier}
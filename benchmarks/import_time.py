@@ -0,0 +1,61 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# modules a pricing process imports
+PRICING_MODULES = ('valuation.pricing', 'valuation.pricing_cache', 'valuation.option_book',
+                   'valuation.volatility_surface', 'valuation.binomial.binary_tree')
+# packages that only plotting, calibration or parallel runs may load
+HEAVY_PACKAGES = ('matplotlib', 'scipy', 'multiprocessing')
+
+# measured in a fresh interpreter, NumPy being imported beforehand as every pricing process needs it anyway
+_SCRIPT = """
+import json, sys, time
+import numpy
+start = time.perf_counter()
+for module in %r:
+    __import__(module)
+seconds = time.perf_counter() - start
+loaded = sorted(set(name.split('.')[0] for name in sys.modules) & set(%r))
+print(json.dumps({'seconds': seconds, 'loaded': loaded}))
+"""
+
+
+def measure(modules=PRICING_MODULES, repeat=5):
+    """
+    Time taken to import modules in a fresh interpreter, the best of several interpreters
+    :param modules: tuple of str
+    :param repeat: int
+    :return: dict
+    with keys 'seconds' and 'loaded', the heavy packages the import pulled in
+    """
+    best = None
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', _SCRIPT % (tuple(modules), HEAVY_PACKAGES)])
+        measurement = json.loads(output.decode())
+        if best is None or measurement['seconds'] < best['seconds']:
+            best = measurement
+    return best
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Checks that importing the pricing engines stays fast and "
+                                                 "headless")
+    parser.add_argument('--budget', type=float, default=0.05, help="seconds the import may take")
+    options = parser.parse_args(arguments)
+
+    measurement = measure()
+    print("pricing import: %.1f ms (budget %.1f ms)" % (1000 * measurement['seconds'], 1000 * options.budget))
+    failed = False
+    if measurement['loaded']:
+        print("heavy packages imported: " + ", ".join(measurement['loaded']))
+        failed = True
+    if measurement['seconds'] > options.budget:
+        print("import time over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+from benchmarks import engines
+
+
+def run(suites=None, quick=False):
+    """
+    Runs benchmark suites against the high precision references
+    :param suites: list of str
+    names of engines.SUITES, all of them when None
+    :param quick: bool
+    smaller books, step and path counts
+    :return: dict
+    metadata of the run and list of measurements
+    """
+    suites = list(engines.SUITES) if suites is None else suites
+    reference = engines.references()
+    results = []
+    for name in suites:
+        for measurement in engines.SUITES[name](reference, quick):
+            measurement['suite'] = name
+            results.append(measurement)
+    return {'metadata': metadata(quick), 'references': reference, 'results': results}
+
+
+def metadata(quick=False):
+    """
+    Description of the code and machine a run was made on
+    :return: dict
+    """
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'processor': platform.processor(), 'quick': quick}
+
+
+def compare(baseline, current, threshold=1.25, error_threshold=2.0):
+    """
+    Measurements of current that are slower or less accurate than the same measurement of baseline
+    :param baseline: dict
+    result of run
+    :param current: dict
+    result of run
+    :param threshold: float
+    ratio of the times above which a measurement is reported
+    :param error_threshold: float
+    ratio of the errors above which a measurement is reported, errors below 1e-12 being ignored
+    :return: list of dict
+    regressions, with the baseline and current times and errors
+    """
+    def key(measurement):
+        return measurement['engine'], measurement['case'], measurement['parameter'], measurement['value']
+
+    previous = dict((key(measurement), measurement) for measurement in baseline['results'])
+    regressions = []
+    for measurement in current['results']:
+        old = previous.get(key(measurement))
+        if old is None:
+            continue
+        slower = measurement['seconds'] > threshold * old['seconds']
+        less_accurate = measurement['error'] > max(error_threshold * old['error'], 1e-12)
+        if slower or less_accurate:
+            regressions.append({'engine': measurement['engine'], 'case': measurement['case'],
+                                'parameter': measurement['parameter'], 'value': measurement['value'],
+                                'baseline_seconds': old['seconds'], 'seconds': measurement['seconds'],
+                                'baseline_error': old['error'], 'error': measurement['error']})
+    return regressions
+
+
+def print_results(results):
+    print("%-26s %-14s %-10s %9s %12s %12s" % ('engine', 'case', 'parameter', 'value', 'seconds', 'error'))
+    for measurement in results['results']:
+        print("%-26s %-14s %-10s %9d %12.3e %12.3e" % (measurement['engine'], measurement['case'],
+                                                       measurement['parameter'], measurement['value'],
+                                                       measurement['seconds'], measurement['error']))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Speed and accuracy benchmarks of the pricing engines")
+    parser.add_argument('--suite', action='append', choices=sorted(engines.SUITES),
+                        help="suite to run, can be repeated, all of them by default")
+    parser.add_argument('--quick', action='store_true', help="smaller books, step and path counts")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file the results are written to")
+    parser.add_argument('--compare', help="JSON results of a previous run to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown ratio reported as a regression")
+    options = parser.parse_args(arguments)
+
+    results = run(options.suite, options.quick)
+    with open(options.output, 'w') as output:
+        json.dump(results, output, indent=1)
+    print_results(results)
+    if options.compare:
+        with open(options.compare) as baseline:
+            regressions = compare(json.load(baseline), results, options.threshold)
+        for regression in regressions:
+            print("regression: " + json.dumps(regression))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
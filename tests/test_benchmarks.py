@@ -0,0 +1,35 @@
+import json
+
+from benchmarks import engines, run_benchmarks
+
+
+def results(*measurements):
+    return {'results': [engines.record('cos', 'heston_call', 'terms', terms, seconds, error)
+                        for terms, seconds, error in measurements]}
+
+
+def test_compare_reports_slower_and_less_accurate_measurements():
+    baseline = results((64, 1.0, 1e-6), (128, 1.0, 1e-9), (256, 1.0, 1e-14), (512, 1.0, 1e-14))
+    current = results((64, 1.2, 1.5e-6), (128, 1.3, 1e-9), (256, 1.0, 5e-13), (1024, 9.0, 1.0))
+    regressions = run_benchmarks.compare(baseline, current)
+    # errors below 1e-12 and measurements missing from the baseline are not reported
+    assert [regression['value'] for regression in regressions] == [128]
+    assert regressions[0]['baseline_seconds'] == 1.0 and regressions[0]['seconds'] == 1.3
+    assert [regression['value'] for regression in run_benchmarks.compare(baseline, current, 1.1, 1.2)] == [64, 128]
+
+
+def test_fourier_suite_is_accurate_and_checked_against_a_baseline(tmp_path):
+    output = str(tmp_path / 'current.json')
+    assert run_benchmarks.main(['--suite', 'fourier', '--quick', '--output', output]) == 0
+    with open(output) as current:
+        measurements = json.load(current)['results']
+    assert all(measurement['suite'] == 'fourier' for measurement in measurements)
+    finest = dict((measurement['engine'], measurement['error']) for measurement in measurements)
+    assert finest['cos'] < 1e-8 and finest['lewis'] < 1e-6 and finest['carr_madan'] < 1e-4
+
+    # a baseline where everything ran a hundred times faster
+    baseline = {'results': [dict(measurement, seconds=measurement['seconds'] / 100) for measurement in measurements]}
+    with open(str(tmp_path / 'baseline.json'), 'w') as baseline_file:
+        json.dump(baseline, baseline_file)
+    assert run_benchmarks.main(['--suite', 'fourier', '--quick', '--output', output, '--compare',
+                                str(tmp_path / 'baseline.json')]) == 1
@@ -0,0 +1,51 @@
+import numpy as np
+
+from valuation import black_scholes_merton as bsm
+from valuation.binomial import binary_tree
+from valuation.binomial.binomial_lattice import adaptive_lattice_value, lattice_chain_value, lattice_value
+from valuation.binomial.binomial_option import BinaryOption
+from valuation.market_data import MarketData
+
+# American put S=100, K=100, T=1, r=0.05, volatility=0.2 on a 20001 step Leisen-Reimer lattice
+AMERICAN_PUT = 6.090357581614725
+
+
+def put(style):
+    return BinaryOption(2, style, 100.0, 100.0, 1.0, 0.2, 1, MarketData(0.05, 0.2), 25)
+
+
+def test_richardson_extrapolation_of_american_leisen_reimer_values():
+    assert abs(lattice_value(put(2), 25, 'lr', richardson=True) - AMERICAN_PUT) < 5e-4
+    values, steps, change = adaptive_lattice_value(put(2), tolerance=1e-3)
+    assert abs(values[0] - AMERICAN_PUT) < 1e-3
+
+
+def test_richardson_extrapolation_of_a_mixed_chain():
+    values = lattice_chain_value(put(1), np.array([100.0, 100.0]), 2, np.array([1, 2]), 25, 'lr', richardson=True)
+    assert abs(values[0] - bsm.BSM_value_array(100.0, 100.0, 1.0, 0.05, 0.2, 2)) < 1e-5
+    assert abs(values[1] - AMERICAN_PUT) < 5e-4
+
+
+def test_lattice_matches_the_binary_tree_and_converges_to_bsm():
+    for style in (1, 2):
+        option = BinaryOption(2, style, 100.0, 100.0, 1.0, 0.2, 1, MarketData(0.05, 0.2), 8)
+        root = binary_tree.createTree(8, option)
+        binary_tree.computeSt(root, option, 8)
+        assert np.isclose(lattice_value(option), binary_tree.computePayOff(root, option, 8))
+    for option_type in (1, 2):
+        option = BinaryOption(option_type, 1, 100.0, 110.0, 1.0, 0.2, 1, MarketData(0.05, 0.2), 2000)
+        assert abs(lattice_value(option) - bsm.BSM_value_array(100.0, 110.0, 1.0, 0.05, 0.2, option_type)) < 5e-3
+    american = lattice_value(BinaryOption(2, 2, 100.0, 100.0, 1.0, 0.2, 1, MarketData(0.05, 0.2), 2000))
+    assert abs(american - AMERICAN_PUT) < 2e-3
+
+
+def test_chain_values_match_single_contract_lattices():
+    strikes = np.array([80.0, 100.0, 120.0, 100.0])
+    option_types = np.array([1, 2, 2, 1])
+    styles = np.array([2, 2, 1, 1])
+    for scheme in ('crr', 'lr', 'trinomial'):
+        chain = lattice_chain_value(put(1), strikes, option_types, styles, 101, scheme)
+        single = [lattice_value(BinaryOption(int(option_type), int(style), 100.0, strike, 1.0, 0.2, 1,
+                                             MarketData(0.05, 0.2), 101), scheme=scheme)
+                  for strike, option_type, style in zip(strikes, option_types, styles)]
+        assert np.allclose(chain, single, rtol=1e-12, atol=1e-12)
@@ -0,0 +1,75 @@
+import numpy as np
+
+from valuation import black_scholes_merton as bsm
+from valuation.market_data import MarketData
+from valuation.option import Option
+
+
+def test_implied_volatility_of_tiny_deep_out_of_the_money_quotes():
+    # quotes below the pricing precision must not be converged at the initial guess
+    for strike, option_type in ((130.0, 1), (70.0, 2)):
+        volatility, residual, converged = bsm.implied_volatility_array(1e-9, 100.0, strike, 0.05, 0.0, option_type)
+        assert converged
+        assert volatility > 0.1
+        assert np.isclose(bsm.BSM_value_array(100.0, strike, 0.05, 0.0, volatility, option_type), 1e-9, rtol=1e-3)
+
+
+def test_implied_volatility_round_trip():
+    strikes = np.linspace(60.0, 140.0, 41)
+    volatilities = np.linspace(0.1, 0.5, 41)
+    for option_type in (1, 2):
+        quotes = bsm.BSM_value_array(100.0, strikes, 1.0, 0.05, volatilities, option_type)
+        solved, _, converged = bsm.implied_volatility_array(quotes, 100.0, strikes, 1.0, 0.05, option_type)
+        assert converged.all()
+        assert np.allclose(solved, volatilities, atol=1e-7)
+
+
+def test_implied_volatility_residual_is_taken_at_the_returned_volatility():
+    strikes = np.array([60.0, 100.0, 140.0])
+    quotes = bsm.BSM_value_array(100.0, strikes, 1.0, 0.05, 0.8, 1)
+    for max_iterations in (1, 2, 50):
+        solved, residual, _ = bsm.implied_volatility_array(quotes, 100.0, strikes, 1.0, 0.05, 1,
+                                                           max_iterations=max_iterations)
+        assert np.allclose(residual, bsm.BSM_value_array(100.0, strikes, 1.0, 0.05, solved, 1) - quotes, atol=1e-9)
+
+
+def test_vectorized_values_match_known_values_and_put_call_parity():
+    values = bsm.BSM_value_array(100.0, 100.0, 1.0, 0.05, 0.2, np.array([1, 2, 3]))
+    assert np.allclose(values[:2], [10.450583572185565, 5.573526022256971])
+    assert np.isnan(values[2])
+
+    strikes = np.linspace(50.0, 150.0, 11)[:, None]
+    maturities = np.array([0.1, 1.0, 5.0])
+    calls = bsm.BSM_value_array(100.0, strikes, maturities, 0.03, 0.3, 1)
+    puts = bsm.BSM_value_array(100.0, strikes, maturities, 0.03, 0.3, 2)
+    assert calls.shape == (11, 3)
+    assert np.allclose(calls - puts, 100.0 - strikes * np.exp(-0.03 * maturities))
+    assert np.isclose(bsm.BSM_value(Option(1, 1, 100.0, 120.0, 5.0), MarketData(0.03, 0.3)), calls[7, 2])
+
+
+def test_greeks_match_finite_differences():
+    strikes = np.array([80.0, 100.0, 120.0])
+    h = 1e-4
+
+    def value(underlying_price=100.0, maturity=1.0, r=0.05, volatility=0.25, option_type=1):
+        return bsm.BSM_value_array(underlying_price, strikes, maturity, r, volatility, option_type)
+
+    for option_type in (1, 2):
+        greeks = bsm.BSM_greeks_array(100.0, strikes, 1.0, 0.05, 0.25, option_type)
+        differences = {
+            'delta': (value(100.0 + h, option_type=option_type) - value(100.0 - h, option_type=option_type)) / (2 * h),
+            'gamma': (value(100.0 + 1e-2, option_type=option_type) - 2 * value(option_type=option_type) +
+                      value(100.0 - 1e-2, option_type=option_type)) / 1e-4,
+            'vega': (value(volatility=0.25 + h, option_type=option_type) -
+                     value(volatility=0.25 - h, option_type=option_type)) / (2 * h),
+            'theta': -(value(maturity=1.0 + h, option_type=option_type) -
+                       value(maturity=1.0 - h, option_type=option_type)) / (2 * h),
+            'rho': (value(r=0.05 + h, option_type=option_type) - value(r=0.05 - h, option_type=option_type)) / (2 * h),
+            'volga': (value(volatility=0.25 + 1e-3, option_type=option_type) - 2 * value(option_type=option_type) +
+                      value(volatility=0.25 - 1e-3, option_type=option_type)) / 1e-6,
+        }
+        for name, difference in differences.items():
+            assert np.allclose(greeks[name], difference, rtol=1e-4, atol=1e-5), name
+        vanna = (bsm.BSM_greeks_array(100.0, strikes, 1.0, 0.05, 0.25 + h, option_type)['delta'] -
+                 bsm.BSM_greeks_array(100.0, strikes, 1.0, 0.05, 0.25 - h, option_type)['delta']) / (2 * h)
+        assert np.allclose(greeks['vanna'], vanna, rtol=1e-4, atol=1e-6)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from valuation.calibration import calibrate_heston
+from valuation.fourier import characteristic_functions as cf
+from valuation.fourier.cos_method import cos_value
+from valuation.market_data import MarketData
+
+
+def heston_quotes(market_data):
+    strikes, maturities = np.meshgrid(np.linspace(80.0, 120.0, 5), np.array([0.25, 0.5, 1.0, 2.0]))
+    option_types = np.where(strikes < 100.0, 2, 1)
+    quotes = cos_value(cf.characteristic_function(market_data, 'heston'), 100.0, strikes, maturities, market_data.r,
+                       option_types, terms=512)
+    return strikes, maturities, quotes, option_types
+
+
+def parameters(market_data):
+    return np.array([market_data.kappa, market_data.theta, market_data.std_volatility, market_data.rho,
+                     market_data.volatility])
+
+
+def test_calibration_recovers_the_parameters_of_cos_quotes():
+    expected = MarketData(0.03, 0.25, -0.6, 0.05, 2.0, 0.4)
+    strikes, maturities, quotes, option_types = heston_quotes(expected)
+    market_data, error = calibrate_heston(100.0, strikes, maturities, 0.03, quotes, option_types)
+    assert error < 1e-8
+    assert np.allclose(parameters(market_data), parameters(expected), atol=1e-5)
+
+    parallel, error = calibrate_heston(100.0, strikes, maturities, 0.03, quotes, option_types, workers=2)
+    assert error < 1e-8
+    assert np.allclose(parameters(parallel), parameters(expected), atol=1e-5)
+
+    warm, error = calibrate_heston(100.0, strikes, maturities, 0.03, quotes, option_types, initial=market_data)
+    assert error < 1e-8
+    assert np.allclose(parameters(warm), parameters(expected), atol=1e-5)
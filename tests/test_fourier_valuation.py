@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from valuation import black_scholes_merton as bsm
+from valuation.binomial.binomial_lattice import lattice_value
+from valuation.binomial.binomial_option import BinaryOption
+from valuation.fourier import characteristic_functions as cf
+from valuation.fourier.carr_madan import carr_madan_value
+from valuation.fourier.cos_method import cos_value
+from valuation.fourier.fourier_valuation import Fourier
+from valuation.fourier.lewis import LewisPricer, heston_pricer
+from valuation.market_data import MarketData
+from valuation.option import Option
+from valuation.option_book import OptionBook
+from valuation.pricing import price
+from valuation.volatility_surface import VolatilitySurface
+
+
+def surface_market():
+    strikes, maturities = np.meshgrid(np.linspace(70.0, 130.0, 7), np.array([0.25, 0.5, 1.0, 2.0]))
+    volatilities = 0.2 + 0.1 * np.log(strikes / 100.0) ** 2 + 0.02 * maturities
+    return MarketData(0.05, VolatilitySurface.fit(100.0, 0.05, strikes.ravel(), maturities.ravel(),
+                                                  volatilities.ravel()))
+
+
+def test_chains_read_the_volatility_surface():
+    market_data = surface_market()
+    option = Option(1, 1, 100.0, 100.0, 1.0)
+    strikes = np.array([80.0, 90.0, 100.0, 110.0, 120.0])
+    option_types = np.array([2, 2, 1, 1, 1])
+    expected = bsm.BSM_value_array(100.0, strikes, 1.0, 0.05, market_data.volatility_for(strikes, 1.0), option_types)
+    assert np.allclose(Fourier.valuate_chain(option, market_data, strikes, option_types), expected, atol=1e-5)
+    assert np.allclose(Fourier.valuate_chain_cos(option, market_data, strikes, option_types), expected, atol=1e-8)
+    assert np.allclose(Fourier.valuate_chain_lewis(option, market_data, strikes, option_types, model='bsm'),
+                       expected, atol=1e-8)
+
+    maturities = np.array([0.5, 1.0, 1.0, 2.0, 2.0])
+    expected = bsm.BSM_value_array(100.0, strikes, maturities, 0.05, market_data.volatility_for(strikes, maturities),
+                                   option_types)
+    assert np.allclose(Fourier.valuate_chain_cos(option, market_data, strikes, option_types, maturities), expected,
+                       atol=1e-8)
+
+
+def test_characteristic_function_rejects_a_surface_without_volatility():
+    with pytest.raises(ValueError):
+        cf.characteristic_function(surface_market())
+
+
+def test_heston_rejects_a_volatility_surface():
+    surface = surface_market().volatility
+    market_data = MarketData(0.05, surface, -0.7, 0.04, 1.5, 0.5)
+    option = Option(1, 1, 100.0, 100.0, 1.0)
+    book = OptionBook.from_options([option])
+    with pytest.raises(ValueError):
+        Fourier.valuate_chain_cos(option, market_data, model='heston')
+    with pytest.raises(ValueError):
+        Fourier.valuate_book(book, market_data, 'heston')
+    for engine in ('cos', 'lewis'):
+        with pytest.raises(ValueError):
+            price(book, market_data, engine=engine)
+
+
+def test_heston_chain_uses_one_initial_variance():
+    market_data = MarketData(0.05, 0.2, -0.7, 0.04, 1.5, 0.5)
+    option = Option(1, 1, 100.0, 100.0, 1.0)
+    strikes = np.array([80.0, 100.0, 120.0])
+    chain = Fourier.valuate_chain_cos(option, market_data, strikes, model='heston', terms=512)
+    single = [Fourier.valuate_chain_cos(Option(1, 1, 100.0, strike, 1.0), market_data, model='heston', terms=512)[0]
+              for strike in strikes]
+    assert np.allclose(chain, single)
+    assert np.allclose(Fourier.valuate_chain_lewis(option, market_data, strikes), chain, atol=1e-4)
+
+
+def heston_market():
+    return MarketData(0.05, 0.2, -0.7, 0.04, 1.5, 0.5)
+
+
+def test_carr_madan_chain_matches_black_scholes_merton_and_cos():
+    strikes = np.linspace(60.0, 150.0, 10)
+    option_types = np.where(strikes < 100.0, 2, 1)
+    expected = bsm.BSM_value_array(100.0, strikes, 1.0, 0.05, 0.2, option_types)
+    values = carr_madan_value(cf.characteristic_function(MarketData(0.05, 0.2)), 100.0, strikes, 1.0, 0.05,
+                              option_types)
+    assert np.allclose(values, expected, atol=1e-6)
+
+    heston = cf.characteristic_function(heston_market(), 'heston')
+    assert np.allclose(carr_madan_value(heston, 100.0, strikes, 1.0, 0.05, option_types),
+                       cos_value(heston, 100.0, strikes, 1.0, 0.05, option_types, terms=512), atol=1e-6)
+
+
+def test_cos_matches_black_scholes_merton_across_maturities():
+    strikes = np.linspace(60.0, 150.0, 10)
+    maturities = np.array([[0.05], [0.5], [1.0], [3.0]])
+    option_types = np.where(strikes < 100.0, 2, 1)
+    expected = bsm.BSM_value_array(100.0, strikes, maturities, 0.05, 0.2, option_types)
+    values = cos_value(cf.characteristic_function(MarketData(0.05, 0.2)), 100.0, strikes, maturities, 0.05,
+                       option_types)
+    assert np.allclose(values, expected, atol=1e-10)
+
+
+def test_cos_bermudan_put_converges_to_the_american_lattice():
+    market_data = MarketData(0.05, 0.2)
+    values = [Fourier.valuate_bermudan_cos(Option(2, 2, 100.0, 100.0, 1.0), market_data, exercise_dates)
+              for exercise_dates in (1, 10, 49, 100)]
+    assert abs(values[0] - bsm.BSM_value_array(100.0, 100.0, 1.0, 0.05, 0.2, 2)) < 1e-10
+    assert np.all(np.diff(values) > 0)
+    american = lattice_value(BinaryOption(2, 2, 100.0, 100.0, 1.0, 0.2, 1, market_data, 2001), scheme='lr')
+    assert values[-1] < american < values[-1] + 0.01
+
+
+def test_lewis_pricer_matches_black_scholes_merton_and_keeps_maturity_terms():
+    strikes = np.linspace(60.0, 150.0, 10)
+    maturities = np.array([[0.05], [0.5], [1.0], [3.0]])
+    option_types = np.where(strikes < 100.0, 2, 1)
+    pricer = LewisPricer(cf.characteristic_function(MarketData(0.05, 0.2)))
+    values = pricer.value(100.0, strikes, maturities, 0.05, option_types)
+    assert np.allclose(values, bsm.BSM_value_array(100.0, strikes, maturities, 0.05, 0.2, option_types), atol=1e-8)
+    assert sorted(pricer.maturity_terms) == [0.05, 0.5, 1.0, 3.0]
+    pricer.clear()
+    assert not pricer.maturity_terms
+
+
+def test_heston_pricer_matches_cos():
+    strikes = np.linspace(60.0, 150.0, 10)
+    option_types = np.where(strikes < 100.0, 2, 1)
+    expected = cos_value(cf.characteristic_function(heston_market(), 'heston'), 100.0, strikes, 1.0, 0.05,
+                         option_types, terms=512)
+    assert np.allclose(heston_pricer(heston_market()).value(100.0, strikes, 1.0, 0.05, option_types), expected,
+                       atol=1e-7)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from valuation import instrumentation
+
+
+def test_nested_memory_blocks_keep_the_outer_peak():
+    with instrumentation.instrument(memory=True) as outer:
+        large = np.ones(2000000)
+        del large
+        with instrumentation.instrument(memory=True) as inner:
+            small = np.ones(100000)
+            del small
+        with instrumentation.instrument() as untracked:
+            pass
+    assert 800000 <= inner.peak_memory < 2000000
+    assert untracked.peak_memory is None
+    assert outer.peak_memory >= 16000000
+
+
+def test_nested_peak_is_folded_into_the_outer_block():
+    with instrumentation.instrument(memory=True) as outer:
+        with instrumentation.instrument(memory=True) as inner:
+            large = np.ones(2000000)
+            del large
+    assert inner.peak_memory >= 16000000
+    assert outer.peak_memory >= inner.peak_memory
+
+
+def test_counters_and_stages_are_merged_and_disabled_outside_blocks():
+    reported = []
+    instrumentation.count('paths', 10)
+    with instrumentation.instrument(callback=reported.append) as outer:
+        instrumentation.count('paths', 10)
+        with instrumentation.instrument() as inner:
+            instrumentation.count('paths', 5)
+            with instrumentation.stage('payoff'):
+                pass
+    assert inner.counters == {'paths': 5}
+    assert outer.counters == {'paths': 15}
+    assert 'payoff' in outer.timings
+    assert reported == [outer]
+    assert instrumentation.current() is None
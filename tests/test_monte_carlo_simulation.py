@@ -0,0 +1,119 @@
+import numpy as np
+
+from valuation import black_scholes_merton as bsm
+from valuation.fourier.fourier_valuation import Fourier
+from valuation.market_data import MarketData
+from valuation.montecarlo.monte_carlo_simulation import MonteCarloSimulation
+from valuation.montecarlo.random_number_generator import RandomNumberGenerator as rng
+from valuation.option import Option
+
+# American put S=100, K=100, T=1, r=0.05, volatility=0.2, exercisable on the 49 simulation dates after time 0
+AMERICAN_PUT = 6.08
+BSM_CALL = 10.450583572185565
+
+
+def american_put(**parameters):
+    return MonteCarloSimulation(Option(2, 2, 100.0, 100.0, 1.0), MarketData(0.05, 0.2), **parameters)
+
+
+def test_streaming_american_value_does_not_depend_on_block_size():
+    small = american_put(random_state=rng.create_generator(1)).valuate_option_streaming(max_paths=400000,
+                                                                                       block_size=2000)
+    large = american_put(random_state=rng.create_generator(2)).valuate_option_streaming(max_paths=400000,
+                                                                                       block_size=100000)
+    assert abs(small[0] - large[0]) < 4 * np.hypot(small[1], large[1])
+    for value, std_error, paths in (small, large):
+        assert paths == 400000
+        assert abs(value - AMERICAN_PUT) < 0.03
+
+
+def test_parallel_american_value_does_not_depend_on_chunk_size():
+    small = american_put(paths=400000).valuate_option_parallel(workers=1, seed=3, chunk_size=10000)
+    large = american_put(paths=400000).valuate_option_parallel(workers=1, seed=4, chunk_size=200000)
+    assert abs(small[0] - large[0]) < 4 * np.hypot(small[1], large[1])
+    for value, std_error, paths in (small, large):
+        assert abs(value - AMERICAN_PUT) < 0.03
+
+
+def test_parallel_value_does_not_depend_on_workers():
+    single = american_put(paths=40000).valuate_option_parallel(workers=1, seed=5, chunk_size=10000)
+    pooled = american_put(paths=40000).valuate_option_parallel(workers=2, seed=5, chunk_size=10000)
+    assert single == pooled
+
+
+def test_streaming_stops_at_the_target_standard_error():
+    simulation = MonteCarloSimulation(Option(1, 1, 100.0, 100.0, 1.0), MarketData(0.05, 0.2),
+                                      random_state=rng.create_generator(3))
+    value, std_error, paths = simulation.valuate_option_streaming(target_std_error=0.02, block_size=10000)
+    assert std_error <= 0.02 and paths < 1000000
+    assert abs(value - bsm.BSM_value_array(100.0, 100.0, 1.0, 0.05, 0.2, 1)) < 4 * std_error
+    value, std_error, paths = simulation.valuate_option_streaming(max_paths=30000, block_size=10000)
+    assert paths == 30000
+
+
+def european_call(**parameters):
+    return MonteCarloSimulation(Option(1, 1, 100.0, 100.0, 1.0), MarketData(0.05, 0.2), **parameters)
+
+
+def test_qmc_european_value_matches_black_scholes_merton():
+    value, std_error, paths = european_call(paths=4096).valuate_option_qmc(replications=8, seed=5)
+    assert paths == 8 * 4096
+    assert abs(value - BSM_CALL) < max(4 * std_error, 1e-3)
+    # scrambled Sobol points beat plain Monte Carlo with the same number of paths
+    _, mc_std_error, _ = european_call(paths=8 * 4096, random_state=rng.create_generator(5)).valuate_option()
+    assert std_error < mc_std_error
+
+
+def test_control_variates_reduce_the_standard_error():
+    market_data = MarketData(0.05, 0.2)
+    for option, control_variate, reduction in ((Option(1, 1, 100.0, 100.0, 1.0), 'underlying', 3),
+                                               (Option(2, 2, 100.0, 100.0, 1.0), 'european', 1.1),
+                                               (Option(1, 3, 100.0, 100.0, 1.0), 'geometric_asian', 10)):
+        simulation = MonteCarloSimulation(option, market_data, paths=20000, random_state=rng.create_generator(4))
+        plain, plain_std_error, _ = simulation.valuate_option()
+        value, std_error, _ = simulation.valuate_option(control_variate=control_variate)
+        assert std_error * reduction < plain_std_error
+        assert abs(value - plain) < 4 * plain_std_error
+    value, std_error, _ = european_call(paths=20000, random_state=rng.create_generator(4)).valuate_option(
+        control_variate='underlying')
+    assert abs(value - BSM_CALL) < 4 * std_error
+
+
+def test_importance_sampling_values_deep_out_of_the_money_calls():
+    simulation = MonteCarloSimulation(Option(1, 1, 100.0, 160.0, 1.0), MarketData(0.05, 0.2), paths=20000,
+                                      random_state=rng.create_generator(4))
+    _, plain_std_error, _ = simulation.valuate_option()
+    value, std_error, _ = simulation.valuate_option(drift_shift='auto')
+    assert std_error * 10 < plain_std_error
+    assert abs(value - bsm.BSM_value_array(100.0, 160.0, 1.0, 0.05, 0.2, 1)) < 4 * std_error
+
+
+def test_out_of_sample_exercise_rule_is_low_biased_for_every_basis():
+    for basis in ('laguerre', 'hermite', 'monomial'):
+        value, std_error, _ = american_put(paths=100000, random_state=rng.create_generator(6)).valuate_option(
+            basis=basis, out_of_sample=True)
+        assert AMERICAN_PUT - 0.08 < value < AMERICAN_PUT + 3 * std_error
+
+
+def test_quadratic_exponential_scheme_matches_heston_cos_on_a_coarse_grid():
+    market_data = MarketData(0.05, 0.2, rho=-0.7, theta=0.04, kappa=1.5, std_volatility=0.6)
+    option = Option(1, 1, 100.0, 100.0, 1.0)
+    expected = Fourier.valuate_chain_cos(option, market_data, np.array([100.0]), np.array([1]), model='heston')[0]
+    errors = {}
+    for scheme in ('qe', 'euler'):
+        simulation = MonteCarloSimulation(option, market_data, True, time_intervals=13, paths=100000, scheme=scheme,
+                                          random_state=rng.create_generator(7))
+        value, std_error, _ = simulation.valuate_option()
+        errors[scheme] = abs(value - expected) / std_error
+    assert errors['qe'] < 4
+    # full truncation Euler is visibly biased on monthly dates
+    assert errors['euler'] > errors['qe']
+
+
+def test_single_precision_paths_give_the_same_values():
+    for simulation, expected in ((european_call(paths=100000, dtype=np.float32), BSM_CALL),
+                                 (american_put(paths=100000, dtype=np.float32), AMERICAN_PUT)):
+        simulation.random_state = rng.create_generator(8)
+        value, std_error, _ = simulation.valuate_option()
+        assert simulation.gbm_paths.dtype == np.float32
+        assert abs(value - expected) < 4 * std_error + 0.02
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from valuation import black_scholes_merton as bsm
+from valuation.binomial.binomial_lattice import lattice_book_value, lattice_value
+from valuation.binomial.binomial_option import BinaryOption
+from valuation.market_data import MarketData
+from valuation.montecarlo.monte_carlo_simulation import MonteCarloSimulation
+from valuation.montecarlo.random_number_generator import RandomNumberGenerator as rng
+from valuation.option import Option
+from valuation.option_book import OptionBook
+from valuation.pricing import price
+
+
+def test_option_types_and_styles_given_by_name():
+    book = OptionBook.from_options([Option('call', 'european', 100.0, 100.0, 1.0),
+                                    Option('put', 'american', 100.0, 100.0, 1.0)])
+    assert book.option_types.tolist() == [1, 2]
+    assert book.styles.tolist() == [1, 2]
+    values, _, engines = price([Option('put', 'european', 100.0, 100.0, 1.0)], MarketData(0.05, 0.2))
+    assert engines[0] == 'bsm' and np.isclose(values[0], price([Option(2, 1, 100.0, 100.0, 1.0)],
+                                                                 MarketData(0.05, 0.2))[0][0])
+    for option in (Option('straddle', 1), Option(1, 'bermudan'), Option(3, 1)):
+        with pytest.raises(ValueError):
+            OptionBook.from_options([option])
+
+
+def test_options_round_trip():
+    options = [Option(1, 1, 100.0, 90.0, 0.5, None, 0), Option(2, 3, 95.0, 100.0, 2.0, 0.25, 3)]
+    for original, copy in zip(options, OptionBook.from_options(options).to_options()):
+        assert vars(copy) == vars(original)
+
+
+def mixed_book():
+    return OptionBook.from_arrays([1, 2, 2, 1, 2, 1], [1, 1, 2, 2, 3, 1], [100.0, 100.0, 100.0, 110.0, 100.0, 100.0],
+                                  [90.0, 110.0, 110.0, 100.0, 100.0, 90.0], [1.0, 1.0, 1.0, 0.5, 1.0, 1.0],
+                                  underlyings=[0, 0, 0, 1, 0, 0])
+
+
+def test_slices_are_views_and_masks_copies():
+    book = mixed_book()
+    book[:2].strikes[0] = 95.0
+    assert book.strikes[0] == 95.0
+    book.select(option_type=2).strikes[0] = 120.0
+    assert book.strikes[1] == 110.0
+    assert book.mask(option_type=2, style=1).tolist() == [False, True, False, False, False, False]
+    assert len(book.select(underlying=1)) == 1
+
+
+def test_factorize_and_groups():
+    book = mixed_book()
+    (strikes, option_types), inverse = book.factorize(('strike', 'option_type'))
+    assert strikes.tolist() == [90.0, 100.0, 100.0, 110.0] and option_types.tolist() == [1, 1, 2, 2]
+    assert inverse.tolist() == [0, 3, 3, 1, 2, 0]
+    groups = book.groups()
+    assert [key for key, _ in groups] == [(0, 1.0), (1, 0.5)]
+    assert groups[0][1].tolist() == [0, 1, 2, 4, 5] and groups[1][1].tolist() == [3]
+
+
+def test_book_engines_match_single_contract_engines():
+    book = mixed_book()
+    market_data = MarketData(0.05, 0.2)
+    options = book.to_options()
+
+    values = bsm.BSM_value_book(book, market_data)
+    assert np.allclose(values[book.styles == 1], [bsm.BSM_value(option, market_data) for option in options
+                                                  if option.style == 1])
+    assert np.isnan(values[book.styles != 1]).all()
+
+    values = lattice_book_value(book, market_data, steps=50)
+    for value, option in zip(values, options):
+        if option.style == 3:
+            assert np.isnan(value)
+        else:
+            single = BinaryOption(option.option_type, option.style, option.underlying_price, option.strike,
+                                  option.maturity, 0.2, option.asset, market_data, 50)
+            assert np.isclose(value, lattice_value(single))
+
+    values, std_errors = MonteCarloSimulation.valuate_book(book, market_data, paths=20000,
+                                                           random_state=rng.create_generator(9))
+    assert np.all(np.abs(values - lattice_book_value(book, market_data, steps=500))[book.styles == 1] <
+                  4 * std_errors[book.styles == 1])
+    assert values[0] == values[5] and np.all(np.isfinite(values))
@@ -0,0 +1,28 @@
+import warnings
+
+import numpy as np
+
+from valuation import black_scholes_merton as bsm
+from valuation.market_data import MarketData
+from valuation.option import Option
+from valuation.pricing import price
+
+
+def test_monte_carlo_route_values_american_options_without_in_sample_bias():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        values, errors, engines = price([Option(2, 2, 100.0, 100.0, 1.0)], MarketData(0.05, 0.2), engine='mc',
+                                        tolerance=5e-3)
+    assert engines[0] == 'mc'
+    assert errors[0] < 5e-3
+    # exercisable on the 49 simulation dates after time 0
+    assert abs(values[0] - 6.08) < 0.02
+
+
+def test_automatic_routing():
+    options = [Option(1, 1, 100.0, 100.0, 1.0), Option(2, 2, 100.0, 100.0, 1.0)]
+    values, errors, engines = price(options, MarketData(0.05, 0.2))
+    assert list(engines) == ['bsm', 'lattice']
+    assert np.isclose(values[0], bsm.BSM_value_array(100.0, 100.0, 1.0, 0.05, 0.2, 1))
+    assert abs(values[1] - 6.090357581614725) < 1e-3
+    assert np.all(errors < 1e-3)
@@ -0,0 +1,70 @@
+import pickle
+
+import pytest
+
+from valuation.market_data import MarketData
+from valuation.option import Option
+from valuation.pricing_cache import MarketState, OptionTerms, PricingCache
+
+BSM_CALL = 10.450583572185565
+
+
+def counting_pricer(calls):
+    def pricer(option, market_data, **parameters):
+        calls.append(parameters)
+        return option.strike + market_data.r
+    return pricer
+
+
+def test_values_are_priced_once_per_contract_market_and_parameters():
+    cache = PricingCache()
+    option, market_data = Option(1, 1, 100.0, 100.0, 1.0), MarketData(0.05, 0.2)
+    assert abs(cache.value(option, market_data) - BSM_CALL) < 1e-12
+    assert cache.value(Option(1, 1, 100.0, 100.0, 1.0), MarketData(0.05, 0.2)) == cache.value(option, market_data)
+
+    calls = []
+    pricer = counting_pricer(calls)
+    cache.value(option, market_data, pricer, steps=10)
+    cache.value(option, market_data, pricer, steps=10)
+    cache.value(option, market_data, pricer, steps=20)
+    # changing the market in place leads to a new key
+    market_data.r = 0.06
+    assert cache.value(option, market_data, pricer, steps=10) == 100.06
+    assert calls == [{'steps': 10}, {'steps': 20}, {'steps': 10}]
+    assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 4
+
+
+def test_least_recently_used_values_are_evicted_and_markets_invalidated():
+    calls = []
+    cache = PricingCache(maxsize=2, pricer=counting_pricer(calls))
+    market_data = MarketData(0.05, 0.2)
+    for strike in (90.0, 100.0, 90.0, 110.0, 90.0, 100.0):
+        cache.value(Option(1, 1, 100.0, strike, 1.0), market_data)
+    # 100 was the least recently used when 110 came in
+    assert calls == [{}] * 4
+    assert cache.stats()['evictions'] == 2 and cache.stats()['size'] == 2
+
+    old_state = MarketState.from_market_data(market_data)
+    market_data.volatility = 0.3
+    cache.value(Option(1, 1, 100.0, 90.0, 1.0), market_data)
+    assert cache.invalidate(old_state) == 1
+    assert cache.invalidate() == 1
+    assert cache.stats()['invalidations'] == 2
+    with pytest.raises(ValueError):
+        PricingCache(maxsize=0)
+
+
+def test_frozen_terms_are_immutable_hashable_and_picklable():
+    option = Option(2, 2, 100.0, 90.0, 0.5)
+    terms = OptionTerms.from_option(option)
+    assert terms == OptionTerms(2, 2, 100, 90, 0.5) and hash(terms) == hash(OptionTerms(2, 2, 100, 90, 0.5))
+    assert terms != OptionTerms(2, 2, 100.0, 95.0, 0.5)
+    with pytest.raises(AttributeError):
+        terms.strike = 95.0
+    assert pickle.loads(pickle.dumps(terms)) == terms
+    assert OptionTerms.from_option(terms.to_option()) == terms
+
+    state = MarketState.from_market_data(MarketData(0.05, 0.2, -0.7, 0.04, 1.5, 0.5))
+    assert pickle.loads(pickle.dumps(state)) == state
+    assert MarketState.from_market_data(state.to_market_data()) == state
+    assert state.volatility_for(100.0, 1.0) == 0.2
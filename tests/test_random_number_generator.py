@@ -0,0 +1,70 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from valuation import black_scholes_merton as bsm
+from valuation.market_data import MarketData
+from valuation.montecarlo.monte_carlo_simulation import MonteCarloSimulation
+from valuation.montecarlo.random_number_generator import RandomNumberGenerator as rng
+from valuation.option import Option
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        result = function()
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+def test_float32_numbers_from_the_global_state_need_no_float64_temporary():
+    np.random.seed(0)
+    peak, numbers = peak_memory(lambda: rng.generate_standard_normal(1, 50, 100000, anti_paths=False,
+                                                                     moment_matching=False, dtype=np.float32))
+    assert numbers.dtype == np.float32 and numbers.shape == (50, 100000)
+    assert peak < 1.2 * numbers.nbytes
+    assert abs(np.mean(numbers)) < 1e-2 and abs(np.std(numbers) - 1) < 1e-2
+
+    np.random.seed(0)
+    again = rng.generate_standard_normal(1, 50, 100000, anti_paths=False, moment_matching=False, dtype=np.float32)
+    assert np.array_equal(numbers, again)
+
+
+def test_generators_are_reproducible_for_every_bit_generator():
+    for bit_generator in ('pcg64', 'philox', 'sfc64', 'mt19937'):
+        first = rng.create_generator(11, bit_generator).standard_normal(5)
+        assert np.array_equal(first, rng.create_generator(11, bit_generator).standard_normal(5))
+        assert not np.array_equal(first, rng.create_generator(12, bit_generator).standard_normal(5))
+    with pytest.raises(ValueError):
+        rng.create_generator(11, 'xorshift')
+
+
+def test_normal_pool_is_antithetic_moment_matched_and_read_only(tmp_path):
+    filename = str(tmp_path / 'pool.npy')
+    pool = rng.generate_normal_pool(filename, 2, 10, 1000, random_state=rng.create_generator(3), block_paths=128)
+    assert pool.shape == (2, 10, 1000)
+    assert np.array_equal(pool[:, :, 500:], -pool[:, :, :500])
+    assert abs(np.mean(pool)) < 1e-12 and abs(np.std(pool) - 1) < 1e-12
+    assert not pool.flags.writeable
+    assert rng.load_normal_pool(filename).shape == (2, 10, 1000)
+
+    single = rng.generate_normal_pool(str(tmp_path / 'single.npy'), 1, 10, 1001, anti_paths=False,
+                                      random_state=rng.create_generator(3), block_paths=128)
+    assert single.shape == (10, 1001)
+    assert abs(np.mean(single)) < 1e-12 and abs(np.std(single) - 1) < 1e-12
+
+
+def test_valuations_sharing_a_pool_use_common_random_numbers(tmp_path):
+    filename = str(tmp_path / 'pool.npy')
+    rng.generate_normal_pool(filename, 1, 50, 40000, random_state=rng.create_generator(4))
+    values = []
+    for strike in (100.0, 100.0, 101.0):
+        simulation = MonteCarloSimulation(Option(1, 1, 100.0, strike, 1.0), MarketData(0.05, 0.2),
+                                          normal_pool=filename)
+        values.append(simulation.valuate_option()[0])
+    assert values[0] == values[1]
+    expected = bsm.BSM_value_array(100.0, 101.0, 1.0, 0.05, 0.2, 1) - bsm.BSM_value_array(100.0, 100.0, 1.0, 0.05,
+                                                                                          0.2, 1)
+    assert abs(values[2] - values[0] - expected) < 0.005
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from numpy.polynomial import laguerre
+
+from valuation.montecarlo.regression import basis_matrix, least_squares
+
+
+def test_laguerre_basis_matches_numpy():
+    x = np.linspace(0.5, 1.5, 11)
+    design = basis_matrix(x, 4)[0]
+    assert np.allclose(design, np.exp(-0.5 * x)[:, None] * laguerre.lagvander(x, 4))
+
+
+def test_standardized_bases_reuse_the_given_standardization():
+    x = np.linspace(0.5, 1.5, 11)
+    for basis in ('hermite', 'monomial'):
+        design, center, scale = basis_matrix(x, 3, basis)
+        assert np.allclose(basis_matrix(x, 3, basis, center, scale)[0], design)
+        assert np.allclose(design[:, 1], (x - center) / scale)
+    with pytest.raises(ValueError):
+        basis_matrix(x, 3, 'chebyshev')
+
+
+def test_least_squares_matches_lstsq_on_an_ill_conditioned_basis():
+    x = np.random.default_rng(0).uniform(0.8, 1.2, 20000)
+    design = np.vander(x, 8, increasing=True)
+    y = np.exp(x) + 0.01 * np.sin(50 * x)
+    expected = np.linalg.lstsq(design, y, rcond=None)[0]
+    assert np.allclose(np.dot(design, least_squares(design, y)), np.dot(design, expected), atol=1e-10)
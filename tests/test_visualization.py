@@ -0,0 +1,31 @@
+from benchmarks import import_time
+from valuation.binomial import binary_tree
+from valuation.binomial.binomial_option import BinaryOption
+from valuation.market_data import MarketData
+from valuation import visualization
+
+
+def computed_tree(steps):
+    option = BinaryOption(2, 2, 100.0, 100.0, 1.0, 0.2, 1, MarketData(0.05, 0.2), steps)
+    root = binary_tree.createTree(steps, option)
+    binary_tree.computeSt(root, option, steps)
+    binary_tree.computePayOff(root, option, steps)
+    return root
+
+
+def test_tree_edges_and_nodes_cover_the_whole_tree():
+    for steps in (1, 3, 5):
+        root = computed_tree(steps)
+        # the tree does not recombine: 2 ** (steps + 1) - 1 nodes, each but the root reached by one edge
+        assert len(visualization.tree_edges(root)) == 2 ** (steps + 1) - 2
+        # recombining nodes are drawn at the same place
+        positions = set(node[0] for node in visualization.node_positions(root))
+        assert len(positions) == (steps + 1) * (steps + 2) // 2
+
+
+def test_pricing_imports_neither_plotting_nor_scipy():
+    assert import_time.measure(repeat=1)['loaded'] == []
+    # the engines only import visualization when one of their plotting methods is called
+    engines = ('valuation.black_scholes_merton', 'valuation.binomial.binomial_lattice',
+               'valuation.montecarlo.monte_carlo_simulation', 'valuation.fourier.fourier_valuation')
+    assert 'matplotlib' not in import_time.measure(engines, repeat=1)['loaded']
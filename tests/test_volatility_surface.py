@@ -0,0 +1,45 @@
+import numpy as np
+
+from valuation.market_data import MarketData
+from valuation.volatility_surface import VolatilitySurface, flat_volatility
+
+MATURITIES = np.array([0.25, 0.5, 1.0, 2.0])
+COEFFICIENTS = np.array([[0.008, 0.05, -0.4, 0.0, 0.1],
+                         [0.015, 0.06, -0.4, 0.01, 0.12],
+                         [0.03, 0.08, -0.35, 0.02, 0.15],
+                         [0.06, 0.1, -0.3, 0.03, 0.2]])
+
+
+def test_fit_recovers_an_svi_surface():
+    surface = VolatilitySurface(100.0, 0.05, MATURITIES, COEFFICIENTS)
+    strikes, maturities = np.meshgrid(np.linspace(70.0, 130.0, 13), MATURITIES)
+    volatilities = surface.volatility(strikes, maturities)
+    # missing quotes are ignored
+    volatilities[0, 0] = np.nan
+    fitted = VolatilitySurface.fit(100.0, 0.05, strikes, maturities, volatilities)
+    assert np.array_equal(fitted.maturities, MATURITIES)
+    grid = np.meshgrid(np.linspace(75.0, 125.0, 21), np.array([0.25, 0.4, 0.75, 1.0, 1.5, 2.0]))
+    assert np.allclose(fitted.volatility(*grid), surface.volatility(*grid), atol=1e-4)
+
+
+def test_total_variance_is_interpolated_without_calendar_arbitrage():
+    surface = VolatilitySurface(100.0, 0.05, MATURITIES, COEFFICIENTS)
+    k = np.linspace(-0.5, 0.5, 11)
+    variances = surface.total_variance(k, np.linspace(0.25, 2.0, 36)[:, np.newaxis])
+    assert np.all(np.diff(variances, axis=0) >= 0)
+    middle = surface.total_variance(k, 0.75)
+    assert np.allclose(middle, 0.5 * (surface.total_variance(k, 0.5) + surface.total_variance(k, 1.0)))
+    # the implied volatility of the closest slice is kept outside the quoted expiries
+    assert np.allclose(surface.volatility(90.0 * np.exp(0.05 * 0.1), 0.1),
+                       surface.volatility(90.0 * np.exp(0.05 * 0.25), 0.25))
+    assert np.allclose(surface.volatility(110.0 * np.exp(0.05 * 3.0), 3.0),
+                       surface.volatility(110.0 * np.exp(0.05 * 2.0), 2.0))
+
+
+def test_market_data_looks_volatilities_up_on_the_surface():
+    surface = VolatilitySurface(100.0, 0.05, MATURITIES, COEFFICIENTS)
+    market_data = MarketData(0.05, surface)
+    assert np.allclose(market_data.volatility_for(np.array([90.0, 110.0]), 1.0),
+                       surface.volatility(np.array([90.0, 110.0]), 1.0))
+    assert isinstance(flat_volatility(surface, 100.0, 1.0), float)
+    assert flat_volatility(0.2, np.array([90.0, 110.0]), 1.0) == 0.2
@@ -1,6 +1,6 @@
 from valuation.binomial.binomial_option import BinaryOption
-import matplotlib.pyplot as plt
 import math
+from valuation import instrumentation
 from valuation.market_data import MarketData
 
 __author__ = "Sarah Souissi"
@@ -90,6 +90,7 @@ def createTr(i, root):
 
 
 def createTree(i, option):
+    instrumentation.count('tree_nodes')
     if i == 0:
         return BinaryTree(i, option)
     else:
@@ -100,7 +101,7 @@ def createTree(i, option):
 
 
 def computeSt(tree, option, n):
-    if tree is None:
+    if tree is not None:
         if (tree.isRoot()):
             tree.St = option.underlying_price
             tree.drawPosition =(0, (n+1)*10)
@@ -145,33 +146,13 @@ def computePayOff(tree, option, n):
 
 
 def plot(tree):
-    edges = []
-    if not tree.isLeaf():
-
-        edges.append([tree.drawPosition, tree.getDownChild().drawPosition])
-        edges.append([tree.drawPosition, tree.getUpChild().drawPosition])
-        if tree.getDownChild() is None and tree.getUpChild() is None:
-            edges = edges+plot(tree.getDownChild())
-            edges = edges+plot(tree.getUpChild())
-            # for e in plot(tree.getDownChild()):
-            #    edges.append(e)
-            # for e in plot(tree.getUpChild()):
-            #    edges.append(e)
-    return edges
+    from valuation import visualization
+    return visualization.tree_edges(tree)
 
 
 def nodePositions(tree):
-    position = set()
-    # if tree.exercice == True
-    position.add(((tree.drawPosition[0], tree.drawPosition[1]-4), tree.St, tree.payOff, tree.exercice))
-    if tree.getDownChild() is None and tree.getUpChild() is None:
-        for p in nodePositions(tree.getDownChild()):
-            position.add(p)
-        for p in nodePositions(tree.getUpChild()):
-            position.add(p)
-        # position.union(nodePositions(tree.getDownChild()))
-        # position.union(nodePositions(tree.getUpChild()))
-    return position
+    from valuation import visualization
+    return visualization.node_positions(tree)
 
 if __name__ == '__main__':
     # myTree = BinaryTree("root")
@@ -257,37 +238,5 @@ if __name__ == '__main__':
     computeSt(root, option, n)
     print(computePayOff(root, option, n))
     # print(nodePositions(root))
-    c = plot(root)
-
-    fig = plt.figure()
-    ax = fig.add_subplot(111)
-    fig.subplots_adjust(top=0.85)
-
-    noeuds = nodePositions(root)
-    # plt.plot([-10,1], [-10,1], marker="^", color="black", markersize=10, label="iii")
-    for l in c:
-        # print(l)
-        d = [[p[0] for p in l], [p[1] for p in l]]
-        # print(str(d[0])+""+str( d[1]))
-        ax.plot(d[0], d[1], 'k-*')
-        # print (str(d[0]) +" " + str(d[1]) +"d[0]")
-        # for p in l:
-        #   noeuds.add(p)
-
-    for p in noeuds:
-        if p[3] is True:
-            ax.annotate(str(round(p[1],2))+"\n\nPayOff="+str(round(p[2], 2)), xy=p[0],
-                        arrowprops=dict(facecolor='black'), label="ss")
-        # print(p[0])
-        else:
-            ax.annotate(str(round(p[1],2))+"\n\nPayOff="+str(round(p[2],2)), xy=p[0], label="")
-        # ax.annotate(str(round(p[1],2)), xy=p[0])
-
-    ax.annotate("should exercice the option", xy=(2, n*20+15), arrowprops=dict(facecolor='black'))
-    # ax.legend()
-
-    plt.title("Option Valuation \n" + str(option),  fontsize=9, fontweight='bold')
-
-    plt.xlim([0, (n+1)*10])
-    plt.ylim([0, (n+1)*20])
-    plt.show()
+    from valuation import visualization
+    visualization.plot_tree(root, option, n)
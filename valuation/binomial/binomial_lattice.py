@@ -0,0 +1,353 @@
+import math
+
+import numpy as np
+
+from valuation import instrumentation
+from valuation.binomial.binomial_option import BinaryOption
+
+SCHEMES = ('crr', 'lr', 'trinomial')
+
+
+def lattice_value(option, steps=None, scheme='crr', richardson=False):
+    """
+    Prices a BinaryOption on a recombining lattice.
+    Only one vector of node values is kept and rolled back in place, so the memory use is O(steps)
+    and the backward induction is O(steps^2) vectorized operations, early exercise included
+    for American options (style 2). European options are priced directly from the terminal nodes.
+    :param option: BinaryOption
+    :param steps: int
+    number of time steps, defaults to option.steps
+    :param scheme: str
+    'crr' (Cox-Ross-Rubinstein), 'lr' (Leisen-Reimer) or 'trinomial'
+    :param richardson: bool
+    extrapolate the values obtained with steps and 2 * steps
+    :return: float
+    option value at time 0
+    """
+    return float(lattice_chain_value(option, steps=steps, scheme=scheme, richardson=richardson)[0])
+
+
+def lattice_chain_value(option, strikes=None, option_types=None, styles=None, steps=None, scheme='crr',
+                        richardson=False):
+    """
+    Prices a whole chain of options sharing the underlying, maturity, volatility and asset class of
+    a BinaryOption through a single recombining lattice. Node values are carried as a
+    (nodes x contracts) array, so the lattice parameters, discounting and underlying prices are
+    computed once per step for the whole chain.
+    The Leisen-Reimer scheme centres its lattice on each strike, so its parameters are computed per
+    contract; it needs an odd number of steps and even counts are raised by one. Its values converge
+    in O(1/steps^2) for European options without the odd/even oscillation of CRR.
+    With richardson=True, the values for n = steps and m = 2 * steps are combined into
+    ((m / n)^k * V(m) - V(n)) / ((m / n)^k - 1), with k = 2 for European options under Leisen-Reimer and
+    k = 1 otherwise: the early exercise boundary brings American options back to O(1/steps).
+    :param option: BinaryOption
+    template holding the shared terms
+    :param strikes: numpy array
+    strike of each contract, defaults to option.strike
+    :param option_types: numpy array
+    1: Call, 2: Put for each contract, defaults to option.option_type
+    :param styles: numpy array
+    1: Europeen, 2: American for each contract, defaults to option.style
+    :param steps: int
+    number of time steps, defaults to option.steps
+    :param scheme: str
+    'crr' (Cox-Ross-Rubinstein), 'lr' (Leisen-Reimer) or 'trinomial'
+    :param richardson: bool
+    :return: numpy array
+    value at time 0 of each contract
+    """
+    if scheme not in SCHEMES:
+        raise ValueError("scheme must be one of " + str(SCHEMES))
+    strikes = np.atleast_1d(np.asarray(option.strike if strikes is None else strikes, dtype=float))
+    option_types = np.asarray(option.option_type if option_types is None else option_types)
+    styles = np.asarray(option.style if styles is None else styles)
+    strikes, option_types, styles = np.broadcast_arrays(strikes, option_types, styles)
+
+    n = _valid_steps(option.steps if steps is None else steps, scheme)
+    with instrumentation.stage('lattice'):
+        values = _chain_value(option, strikes, option_types, styles, n, scheme)
+        if richardson:
+            fine_steps = _valid_steps(2 * n, scheme)
+            fine_values = _chain_value(option, strikes, option_types, styles, fine_steps, scheme)
+            values = _extrapolate(values, n, fine_values, fine_steps, scheme, styles)
+    return values
+
+
+def adaptive_lattice_value(option, tolerance=0.005, strikes=None, option_types=None, styles=None, scheme='lr',
+                           richardson=True, initial_steps=25, max_steps=10000):
+    """
+    Prices a chain like lattice_chain_value, doubling the number of steps only until every value
+    moves by less than tolerance between two consecutive refinements.
+    :param option: BinaryOption
+    :param tolerance: float
+    absolute price stability required for every contract
+    :param strikes: numpy array
+    :param option_types: numpy array
+    :param styles: numpy array
+    :param scheme: str
+    :param richardson: bool
+    :param initial_steps: int
+    :param max_steps: int
+    the refinement stops there even if the tolerance is not met
+    :return: tuple (numpy array, int, numpy array)
+    values, number of steps of the last refinement and absolute change from the previous refinement
+    """
+    if scheme not in SCHEMES:
+        raise ValueError("scheme must be one of " + str(SCHEMES))
+    strikes = np.atleast_1d(np.asarray(option.strike if strikes is None else strikes, dtype=float))
+    option_types = np.asarray(option.option_type if option_types is None else option_types)
+    styles = np.asarray(option.style if styles is None else styles)
+    strikes, option_types, styles = np.broadcast_arrays(strikes, option_types, styles)
+
+    # each raw lattice is priced once, Richardson reuses the finer lattice of the previous refinement
+    steps = _valid_steps(initial_steps, scheme)
+    with instrumentation.stage('lattice'):
+        raw = _chain_value(option, strikes, option_types, styles, steps, scheme)
+    values = None
+    while True:
+        fine_steps = _valid_steps(2 * steps, scheme)
+        with instrumentation.stage('lattice'):
+            fine_raw = _chain_value(option, strikes, option_types, styles, fine_steps, scheme)
+        refined = _extrapolate(raw, steps, fine_raw, fine_steps, scheme, styles) if richardson else fine_raw
+        if values is None:
+            change = np.abs(refined - raw)
+        else:
+            change = np.abs(refined - values)
+        values, steps, raw = refined, fine_steps, fine_raw
+        if np.all(change < tolerance) or 2 * steps > max_steps:
+            return values, steps, change
+
+
+def lattice_book_value(book, market_data, steps=100, scheme='crr', richardson=False):
+    """
+    Prices the European and American contracts of an OptionBook, one lattice being rolled back for each
+    group of contracts sharing the underlying price, maturity, asset class and volatility
+    (see lattice_chain_value), with one column per distinct contract of the group
+    :param book: OptionBook
+    :param market_data: MarketData
+    :param steps: int
+    :param scheme: str
+    :param richardson: bool
+    :return: numpy array
+    value of each contract, NaN for the Asian ones
+    """
+    values = np.full(len(book), np.nan)
+    volatilities = np.broadcast_to(market_data.volatility_for(book.strikes, book.maturities), (len(book),))
+    lattice_styles = (book.styles == 1) | (book.styles == 2)
+    for (underlying_price, maturity, asset, volatility), index in book.groups(
+            (book.underlying_prices, book.maturities, book.assets, volatilities)):
+        index = index[lattice_styles[index]]
+        if len(index) == 0:
+            continue
+        # duplicated contracts are priced once
+        (strikes, option_types, styles), inverse = book[index].factorize(('strike', 'option_type', 'style'))
+        template = BinaryOption(int(option_types[0]), int(styles[0]), underlying_price, float(strikes[0]), maturity,
+                                volatility, asset, market_data, steps)
+        values[index] = lattice_chain_value(template, strikes, option_types, styles, scheme=scheme,
+                                            richardson=richardson)[inverse]
+    return values
+
+
+def _valid_steps(steps, scheme):
+    """
+    Leisen-Reimer needs an odd number of steps, even counts are raised by one
+    :param steps: int
+    :param scheme: str
+    :return: int
+    """
+    return steps + 1 - steps % 2 if scheme == 'lr' else steps
+
+
+def _extrapolate(values, steps, fine_values, fine_steps, scheme, styles):
+    """
+    Two-point Richardson extrapolation of lattice values, assuming an error in O(1/steps^2) for European
+    options under Leisen-Reimer and in O(1/steps) for American options and the other schemes
+    :param styles: numpy array
+    1: Europeen, 2: American for each contract
+    :return: numpy array
+    """
+    order = np.where((styles != 2) & (scheme == 'lr'), 2, 1)
+    ratio = (fine_steps / float(steps)) ** order
+    return (ratio * fine_values - values) / (ratio - 1)
+
+
+def _chain_value(option, strikes, option_types, styles, n, scheme):
+    """
+    Prices a chain on a single lattice with n steps
+    :return: numpy array
+    """
+    instrumentation.count('lattices')
+    St, probabilities, step_back = _lattice_parameters(option, strikes, n, scheme)
+    discount = math.exp(-option.market_data.r * option.maturity / n)
+    probabilities = [discount * probability for probability in probabilities]
+
+    # payoffs are written as max(sign * (St - K), 0) so calls and puts share the same operations;
+    # nodes run along the first axis so that the shrinking slices of the induction stay contiguous
+    sign = np.where(option_types == 1, 1.0, -1.0)
+    values = np.maximum(sign * (St - strikes), 0.0)
+
+    result = np.empty(len(strikes))
+    american = styles == 2
+    if scheme == 'trinomial':
+        european = ~american
+        if np.any(european):
+            result[european] = _backward_induction(np.ascontiguousarray(values[:, european]),
+                                                   [_select(probability, european) for probability in probabilities])
+    else:
+        p_down, p_up = probabilities
+        if np.all((p_up > 0) & (p_down > 0)):
+            # without early exercise the induction collapses to the discounted binomial expectation, O(steps)
+            european = ~american
+            if np.any(european):
+                instrumentation.count('lattice_nodes', (n + 1) * int(np.sum(european)))
+                weights = _terminal_weights(n, _select(p_up, european), _select(p_down, european))
+                result[european] = np.sum(weights * values[:, european], axis=0)
+        else:
+            sign = np.where(american, sign, 0.0)
+            american = np.ones(len(strikes), dtype=bool)
+
+    if np.any(american):
+        result[american] = _backward_induction(np.ascontiguousarray(values[:, american]),
+                                               [_select(probability, american) for probability in probabilities],
+                                               sign[american] * _select(St, american), _select(step_back, american),
+                                               sign[american] * strikes[american])
+    return result
+
+
+def _lattice_parameters(option, strikes, n, scheme):
+    """
+    Computes the terminal underlying prices and branch probabilities of a lattice.
+    Parameters shared by the whole chain are returned with a single column, per-contract ones with
+    one column per contract.
+    :return: tuple (numpy array, list of numpy arrays, numpy array)
+    terminal prices (nodes x columns), undiscounted branch probabilities from the lowest to the highest
+    branch, and the factor f such that each node sits at f times the price of its lowest child
+    """
+    dt = option.maturity / n
+    sigma = option.implied_volatility
+    carry = _cost_of_carry(option)
+    growth = math.exp(carry * dt)
+
+    if scheme == 'crr':
+        up = np.array([option.getUp(n)])
+        down = np.array([option.getDown(n)])
+        p = np.array([option.riskNeutralProbability(n)])
+    elif scheme == 'lr':
+        sigma_sqrt_t = sigma * math.sqrt(option.maturity)
+        d1 = (np.log(option.underlying_price / strikes) + (carry + 0.5 * sigma ** 2) *
+              option.maturity) / sigma_sqrt_t
+        d2 = d1 - sigma_sqrt_t
+        p = _peizer_pratt(d2, n)
+        up = growth * _peizer_pratt(d1, n) / p
+        down = (growth - p * up) / (1 - p)
+    else:
+        up = math.exp(sigma * math.sqrt(2 * dt))
+        half_up = math.exp(sigma * math.sqrt(dt / 2))
+        p_up = ((math.sqrt(growth) - 1 / half_up) / (half_up - 1 / half_up)) ** 2
+        p_down = ((half_up - math.sqrt(growth)) / (half_up - 1 / half_up)) ** 2
+        St = option.underlying_price * up ** (np.arange(2 * n + 1) - float(n))
+        probabilities = [np.array([p_down]), np.array([1 - p_up - p_down]), np.array([p_up])]
+        return St[:, np.newaxis], probabilities, np.array([up])
+
+    up_moves = np.arange(n + 1)[:, np.newaxis]
+    St = option.underlying_price * np.exp(up_moves * np.log(up) + (n - up_moves) * np.log(down))
+    return St, [1 - p, p], 1 / down
+
+
+def _cost_of_carry(option):
+    """
+    Cost of carry b of the underlying, such that E[S_t+dt] = S_t * exp(b * dt) under the risk-neutral
+    measure. It is recovered from the one-step probability of the option so that the asset-class
+    conventions of BinaryOption.riskNeutralProbability apply to every scheme.
+    :param option: BinaryOption
+    :return: float
+    """
+    up = option.getUp(1)
+    down = option.getDown(1)
+    return math.log(option.riskNeutralProbability(1) * (up - down) + down) / option.maturity
+
+
+def _peizer_pratt(z, n):
+    """
+    Peizer-Pratt method 2 inversion of the normal distribution used by Leisen-Reimer
+    :param z: numpy array
+    :param n: int
+    odd number of steps
+    :return: numpy array
+    """
+    return 0.5 + np.sign(z) * np.sqrt(0.25 - 0.25 * np.exp(-(z / (n + 1.0 / 3)) ** 2 * (n + 1.0 / 6)))
+
+
+def _select(parameter, mask):
+    """
+    Selects the lattice parameters of the masked contracts. Parameters shared by the whole chain
+    (a single column) are returned as they are, or as a scalar when they are one-dimensional.
+    :param parameter: numpy array
+    :param mask: numpy array of bool
+    :return: numpy array or float
+    """
+    if parameter.shape[-1] == 1:
+        return parameter if parameter.ndim > 1 else parameter[0]
+    return parameter[..., mask]
+
+
+def _backward_induction(values, probabilities, signed_prices=None, step_back=None, signed_strikes=None):
+    """
+    Rolls a (nodes x contracts) array of terminal values back to time 0. A binomial lattice has two
+    branch probabilities and loses one node per step, a trinomial one has three and loses two.
+    When underlying prices are given, the early-exercise max is applied at every node.
+    :param values: numpy array
+    terminal values, overwritten in place
+    :param probabilities: list of numpy arrays
+    discounted branch probabilities from the lowest to the highest branch
+    :param signed_prices: numpy array
+    terminal underlying prices times 1 for calls, -1 for puts and 0 without early exercise
+    :param step_back: numpy array
+    factor f such that each node sits at f times the price of its lowest child
+    :param signed_strikes: numpy array
+    strike of each contract with the same sign as signed_prices
+    :return: numpy array
+    value at time 0 of each contract
+    """
+    shrink = len(probabilities) - 1
+    width = values.shape[0]
+    # nodes visited: w (w + 1) / 2 for a binomial lattice, ((w + 1) / 2)^2 for a trinomial one
+    instrumentation.count('lattice_nodes', (width * (width + 1) // 2 if shrink == 1 else ((width + 1) // 2) ** 2) *
+                          values.shape[1])
+    buffer = np.empty_like(values)
+    if signed_prices is not None:
+        # underlying prices are rolled back multiplicatively (S_i[j] = f * S_i+1[j]) in a full-size array
+        # so that every operation of the loop is contiguous
+        prices = np.empty_like(values)
+        prices[:] = signed_prices
+    while width > 1:
+        width -= shrink
+        # all operations work in place on the leading nodes of the preallocated arrays
+        current = values[:width]
+        continuation = np.multiply(values[1:width + 1], probabilities[1], out=buffer[:width])
+        if shrink == 2:
+            continuation += probabilities[2] * values[2:width + 2]
+        current *= probabilities[0]
+        current += continuation
+        if signed_prices is not None:
+            prices[:width] *= step_back
+            exercise = np.subtract(prices[:width], signed_strikes, out=buffer[:width])
+            np.maximum(current, exercise, out=current)
+    return values[0]
+
+
+def _terminal_weights(n, p_up, p_down):
+    """
+    Discounted risk-neutral probabilities of reaching each terminal node of an n-step binomial lattice,
+    computed in log space so that large step counts do not underflow
+    :param n: int
+    :param p_up: numpy array
+    discounted probability of an up move, per column
+    :param p_down: numpy array
+    discounted probability of a down move, per column
+    :return: numpy array of (n + 1) x columns weights
+    """
+    j = np.arange(1, n + 1)
+    log_binomial = np.concatenate(([0.0], np.cumsum(np.log(n - j + 1.0) - np.log(j))))[:, np.newaxis]
+    up_moves = np.arange(n + 1)[:, np.newaxis]
+    return np.exp(log_binomial + up_moves * np.log(p_up) + (n - up_moves) * np.log(p_down))
@@ -4,12 +4,15 @@ import math
 from valuation.market_data import MarketData
 
 from valuation.option import Option
+from valuation.volatility_surface import flat_volatility
 
 
 class BinaryOption (Option):
 
     def __init__(self, option_type, style, underlying_price, strike, maturity, volatility,asset, market_data, steps):
-        Option.__init__(self,option_type, style, underlying_price, strike, maturity, volatility, asset)
+        # a volatility surface is read at the strike and maturity of the option
+        Option.__init__(self,option_type, style, underlying_price, strike, maturity,
+                        flat_volatility(volatility, strike, maturity), asset)
         self.steps = steps
         self.market_data = market_data
 
@@ -76,11 +79,13 @@ class BinaryOption (Option):
     #def __repr__(self):
     #    return str(self.S0)
 
-    def getDown(self):
-        return math.exp(-self.implied_volatility * math.sqrt(self.maturity / self.steps))
+    def getDown(self, steps=None):
+        steps = self.steps if steps is None else steps
+        return math.exp(-self.implied_volatility * math.sqrt(self.maturity / steps))
 
-    def getUp(self):
-        return math.exp(self.implied_volatility * math.sqrt(self.maturity/self.steps))
+    def getUp(self, steps=None):
+        steps = self.steps if steps is None else steps
+        return math.exp(self.implied_volatility * math.sqrt(self.maturity / steps))
 
     def callPayOff(self,St):
         return max(St - self.strike, 0.0)
@@ -94,17 +99,18 @@ class BinaryOption (Option):
         else :
             return self.putPayOff(St)
 
-    def riskNeutralProbability(self):
-        up = self.getUp()
-        down = self.getDown()
+    def riskNeutralProbability(self, steps=None):
+        steps = self.steps if steps is None else steps
+        up = self.getUp(steps)
+        down = self.getDown(steps)
         if self.asset in [0, 1]:
-            return (math.exp(self.market_data.r*self.maturity/self.steps) - down)/(up-down)
+            return (math.exp(self.market_data.r*self.maturity/steps) - down)/(up-down)
         if self.asset in [2, 3]:
-            return (math.exp((self.market_data.r-self.q)*self.maturity/self.steps) - down)/(up-down)
+            return (math.exp((self.market_data.r-self.q)*self.maturity/steps) - down)/(up-down)
         if self.asset in [4, 5]:
             return (1 - down)/(up-down)
         if self.asset == 6:
-            return (math.exp((self.market_data.r-self.rf)*self.maturity/self.steps) - down)/(up-down)
+            return (math.exp((self.market_data.r-self.rf)*self.maturity/steps) - down)/(up-down)
 
     #def __repr__(self):
         #st = "Stock price S0 :" +str(self.S0) + \
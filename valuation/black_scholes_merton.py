@@ -8,10 +8,7 @@
 
 import math
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-mpl.rcParams['font.family'] = 'serif'
-from scipy.integrate import quad
+from valuation import instrumentation
 from valuation.market_data import MarketData
 from valuation.option import Option
 
@@ -21,15 +18,120 @@ __author__ = "Alexis Paquette"
 # Helper Functions
 def dN(x):
     """ Probability density function of standard normal random variable x."""
-    return math.exp(-0.5 * x ** 2) / math.sqrt(2 * math.pi)
+    return np.exp(-0.5 * np.square(x)) / math.sqrt(2 * math.pi)
 
 
 def N(d):
-    """ Cumulative density function of standard normal random variable x."""
-    return quad(lambda x: dN(x), -20, d, limit=50)[0]
+    """ Cumulative density function of standard normal random variable x.
+    Works element-wise on NumPy arrays."""
+    # scipy takes tens of milliseconds to import, it is only loaded by the first valuation
+    from scipy.special import ndtr
+    return ndtr(d)
 
 
 # Valuation Functions
+def _bsm_intermediates(underlying_price, strike, maturity, r, volatility, option_type):
+    """ Broadcasts the inputs against each other and computes the terms shared by prices and Greeks.
+    Where the option has no time value left (expired or zero volatility), d1 and d2 are set to +/- infinity
+    so that N(d1) and N(d2) collapse to the exercise indicator of the discounted intrinsic value.
+
+    Returns
+    =======
+    St, K, T, r, sigma, option_type, discounted_strike, sigma_sqrt_t, d1, d2: arrays
+    """
+    St, K, T, r, sigma, option_type = np.broadcast_arrays(
+        np.asarray(underlying_price, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(maturity, dtype=float), np.asarray(r, dtype=float),
+        np.asarray(volatility, dtype=float), np.asarray(option_type))
+
+    discounted_strike = K * np.exp(-r * T)
+    sigma_sqrt_t = sigma * np.sqrt(T)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(St / K) + (r + 0.5 * sigma ** 2) * T) / sigma_sqrt_t
+    d2 = d1 - sigma_sqrt_t
+
+    degenerate = sigma_sqrt_t <= 0
+    if np.any(degenerate):
+        limit = np.where(St > discounted_strike, np.inf, -np.inf)
+        d1 = np.where(degenerate, limit, d1)
+        d2 = np.where(degenerate, limit, d2)
+    return St, K, T, r, sigma, option_type, discounted_strike, sigma_sqrt_t, d1, d2
+
+
+def BSM_value_array(underlying_price, strike, maturity, r, volatility, option_type=1):
+    """ Calculates Black-Scholes-Merton European call or put values for whole arrays of options at once.
+    All parameters are broadcast against each other, so scalars and arrays can be mixed freely.
+
+    Parameters
+    ==========
+    underlying_price: float or array
+    strike: float or array
+    maturity: float or array
+    r: float or array
+    volatility: float or array
+    option_type: int or array (1: Call, 2: Put)
+
+    Returns
+    =======
+    values: array of option values (NaN where option_type is neither 1 nor 2)
+    """
+    St, K, T, r, sigma, option_type, discounted_strike, sigma_sqrt_t, d1, d2 = \
+        _bsm_intermediates(underlying_price, strike, maturity, r, volatility, option_type)
+
+    call_value = St * N(d1) - discounted_strike * N(d2)
+    put_value = discounted_strike * N(-d2) - St * N(-d1)
+    return np.where(option_type == 1, call_value, np.where(option_type == 2, put_value, np.nan))
+
+
+def BSM_greeks_array(underlying_price, strike, maturity, r, volatility, option_type=1):
+    """ Calculates the analytic Black-Scholes-Merton Greeks for whole arrays of options in a single pass.
+    d1, d2, the normal density and the discount factor are computed once and shared by every Greek.
+
+    Parameters
+    ==========
+    underlying_price: float or array
+    strike: float or array
+    maturity: float or array
+    r: float or array
+    volatility: float or array
+    option_type: int or array (1: Call, 2: Put)
+
+    Returns
+    =======
+    greeks: dict of arrays with keys 'delta', 'gamma', 'vega', 'theta', 'rho', 'vanna' and 'volga'.
+    Theta is expressed per year, vega, vanna and volga per unit of volatility and rho per unit of rate.
+    """
+    St, K, T, r, sigma, option_type, discounted_strike, sigma_sqrt_t, d1, d2 = \
+        _bsm_intermediates(underlying_price, strike, maturity, r, volatility, option_type)
+
+    pdf_d1 = dN(d1)
+    cdf_d1 = N(d1)
+    cdf_d2 = N(d2)
+    is_call = option_type == 1
+    valid = is_call | (option_type == 2)
+    # zero denominators only occur without time value, where the pdf already makes the Greek vanish
+    with np.errstate(divide='ignore', invalid='ignore'):
+        safe_sigma_sqrt_t = np.where(sigma_sqrt_t > 0, sigma_sqrt_t, np.inf)
+        safe_sigma = np.where(sigma > 0, sigma, np.inf)
+        sqrt_t = np.sqrt(T)
+        vega = St * pdf_d1 * sqrt_t
+        gamma = pdf_d1 / (St * safe_sigma_sqrt_t)
+        vanna = -pdf_d1 * np.nan_to_num(d2) / safe_sigma
+        volga = vega * np.nan_to_num(d1) * np.nan_to_num(d2) / safe_sigma
+        time_decay = -St * pdf_d1 * sigma / (2 * np.where(sqrt_t > 0, sqrt_t, np.inf))
+
+    delta = np.where(is_call, cdf_d1, cdf_d1 - 1.0)
+    itm_discounted_strike = np.where(is_call, discounted_strike * cdf_d2, -discounted_strike * (1.0 - cdf_d2))
+    theta = time_decay - r * itm_discounted_strike
+    rho = T * itm_discounted_strike
+
+    greeks = {'delta': delta, 'gamma': gamma, 'vega': vega, 'theta': theta, 'rho': rho,
+              'vanna': vanna, 'volga': volga}
+    for name in greeks:
+        greeks[name] = np.where(valid, greeks[name], np.nan)
+    return greeks
+
+
 def BSM_value(Option, MarketData):
     """ Calculates Black-Scholes-Merton European call or put option value.
     Parameters
@@ -42,88 +144,178 @@ def BSM_value(Option, MarketData):
     call_value:  float
     put_value:   float
     """
-    St = Option.underlying_price
-    K = Option.strike
-    t = 0
-    T = Option.maturity
-    r = MarketData.r
-    sigma = MarketData.volatility
+    if Option.option_type not in (1, 2):
+        return None
+    return float(BSM_value_array(Option.underlying_price, Option.strike, Option.maturity, MarketData.r,
+                                 MarketData.volatility_for(Option.strike, Option.maturity), Option.option_type))
+
+
+def BSM_value_book(OptionBook, MarketData):
+    """ Calculates Black-Scholes-Merton values of the European contracts of an OptionBook in one pass.
+
+    Parameters
+    ==========
+    OptionBook: Class OptionBook
+    MarketData:  Class MarketData
+
+    Returns
+    =======
+    values: array of option values, NaN for the contracts that are not European calls or puts
+    """
+    values = BSM_value_array(OptionBook.underlying_prices, OptionBook.strikes, OptionBook.maturities, MarketData.r,
+                             MarketData.volatility_for(OptionBook.strikes, OptionBook.maturities),
+                             OptionBook.option_types)
+    return np.where(OptionBook.styles == 1, values, np.nan)
 
-    d1 = (math.log(St / K) + (r + 0.5 * sigma ** 2) * (T - t)) / (sigma * math.sqrt(T - t))
-    d2 = d1 - sigma * math.sqrt(T - t)
-    call_value = St * N(d1) - math.exp(-r * (T - t)) * K * N(d2)
-    if Option.option_type == 1:
-        return call_value
 
-    elif Option.option_type == 2:
-        put_value = call_value - St + math.exp(-r * (T - t)) * K
-        return put_value
+def geometric_asian_value_array(underlying_price, strike, maturity, r, volatility, fixings, option_type=1):
+    """ Calculates the closed-form value of discretely monitored geometric average price calls or puts,
+    the average being taken over fixings equally spaced dates from maturity / fixings to maturity.
+
+    Parameters
+    ==========
+    underlying_price: float or array
+    strike: float or array
+    maturity: float or array
+    r: float or array
+    volatility: float or array
+    fixings: int
+    option_type: int or array (1: Call, 2: Put)
+
+    Returns
+    =======
+    values: array of option values (NaN where option_type is neither 1 nor 2)
+    """
+    St, K, T, r, sigma, option_type = np.broadcast_arrays(
+        np.asarray(underlying_price, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(maturity, dtype=float), np.asarray(r, dtype=float),
+        np.asarray(volatility, dtype=float), np.asarray(option_type))
+
+    # the log of the geometric average is normal with the following mean and variance
+    mean = np.log(St) + (r - 0.5 * sigma ** 2) * T * (fixings + 1) / (2.0 * fixings)
+    variance = sigma ** 2 * T * (fixings + 1) * (2 * fixings + 1) / (6.0 * fixings ** 2)
+    d2 = (mean - np.log(K)) / np.sqrt(variance)
+    d1 = d2 + np.sqrt(variance)
+    forward = np.exp(mean + 0.5 * variance)
+    discount = np.exp(-r * T)
+
+    call_value = discount * (forward * N(d1) - K * N(d2))
+    put_value = discount * (K * N(-d2) - forward * N(-d1))
+    return np.where(option_type == 1, call_value, np.where(option_type == 2, put_value, np.nan))
 
 
 # Plotting European Option Values
 def plot_values(Option, MarketData):
-    """ Plots European option values for different parameters"""
-    plt.figure(figsize=(10, 8.3))
-    points = 100
-    #
-    # Model Parameters
-    # C(K) plot
-    plt.subplot(221)
-    klist = np.linspace(Option.strike - 20, Option.strike + 20, points)
-    vlist = []
-    for K in klist:
-        Option.strike = K
-        vlist.append(BSM_value(Option, MarketData))
-    Option.strike -= 20
-    plt.plot(klist, vlist)
-    plt.grid()
-    plt.xlabel('strike $K$')
-    plt.ylabel('present value')
-
-    # C(T) plot
-    plt.subplot(222)
-    tlist = np.linspace(0.0001, Option.maturity, points)
-    vlist = []
-    for T in tlist:
-        Option.maturity = T
-        vlist.append(BSM_value(Option, MarketData))
-    plt.plot(tlist, vlist)
-    plt.grid(True)
-    plt.xlabel('maturity $T$')
-    #
-    # C(r) plot
-    plt.subplot(223)
-    rlist = np.linspace(0, 0.1, points)
-    rate = MarketData.r
-    vlist = []
-    for R in rlist:
-        MarketData.r = R
-        vlist.append(BSM_value(Option, MarketData))
-    MarketData.r = rate
-    plt.plot(rlist, vlist)
-    plt.grid(True)
-    plt.xlabel('short rate $r$')
-    plt.ylabel('present value')
-    plt.axis('tight')
-    #
-    # C(sigma) plot
-    plt.subplot(224)
-    sigmalist = np.linspace(0.001, 0.5, points)
-    sig = MarketData.volatility
-    vlist = []
-    for sigma in sigmalist:
-        MarketData.volatility = sigma
-        vlist.append(BSM_value(Option, MarketData))
-    MarketData.volatility = sig
-    plt.plot(sigmalist, vlist)
-    plt.grid(True)
-    plt.xlabel('volatility $\sigma$')
-    plt.show()
+    """ Plots European option values for different parameters, see visualization.plot_values"""
+    from valuation import visualization
+    visualization.plot_values(Option, MarketData)
 
 
 # Implied volatility
+def implied_volatility_array(value, underlying_price, strike, maturity, r, option_type=1, precision=1e-8,
+                             max_iterations=50, max_volatility=10.0, volatility_precision=1e-6):
+    """ Inverts the Black-Scholes-Merton model for whole chains of quotes at once.
+    Every quote starts from the Corrado-Miller rational approximation and is refined by Halley steps
+    (using vega and volga) that fall back to bisection whenever they leave the current bracket.
+    The inputs are never modified.
+
+    Parameters
+    ==========
+    value: float or array of option values
+    underlying_price: float or array
+    strike: float or array
+    maturity: float or array
+    r: float or array
+    option_type: int or array (1: Call, 2: Put)
+    precision: float, absolute pricing error at which a quote is considered converged
+    max_iterations: int
+    max_volatility: float, upper end of the initial bracket
+    volatility_precision: float, the pricing error divided by vega must also be below it, so that quotes
+        smaller than precision (deep out of the money) are not converged before their volatility is found
+
+    Returns
+    =======
+    volatility: array of implied volatilities (NaN for quotes outside the no-arbitrage bounds)
+    residual: array of model value minus quoted value at the returned volatility
+    converged: boolean array
+    """
+    value, St, K, T, r, option_type = np.broadcast_arrays(
+        np.asarray(value, dtype=float), np.asarray(underlying_price, dtype=float),
+        np.asarray(strike, dtype=float), np.asarray(maturity, dtype=float),
+        np.asarray(r, dtype=float), np.asarray(option_type))
+
+    # puts are converted to calls through put-call parity so that a single solver handles both
+    discounted_strike = K * np.exp(-r * T)
+    target = np.where(option_type == 2, value + St - discounted_strike, value)
+    intrinsic = np.maximum(St - discounted_strike, 0.0)
+    valid = ((option_type == 1) | (option_type == 2)) & (T > 0) & (target > intrinsic) & (target < St)
+
+    volatility = np.full(value.size, np.nan)
+    residual = np.full(value.size, np.nan)
+    converged = np.zeros(value.size, dtype=bool)
+
+    index = np.flatnonzero(valid)
+    St, X, T, C = St.ravel()[index], discounted_strike.ravel()[index], T.ravel()[index], target.ravel()[index]
+
+    # Corrado-Miller initial guess, Brenner-Subrahmanyam when its square root turns negative
+    half_moneyness = 0.5 * (St - X)
+    root = (C - half_moneyness) ** 2 - (St - X) ** 2 / math.pi
+    sigma = np.where(root > 0, math.sqrt(2 * math.pi) / (np.sqrt(T) * (St + X)) *
+                     (C - half_moneyness + np.sqrt(np.maximum(root, 0.0))),
+                     math.sqrt(2 * math.pi) / np.sqrt(T) * C / St)
+    sigma_low = np.zeros_like(sigma)
+    sigma_high = np.full_like(sigma, max_volatility)
+    sigma = np.clip(sigma, 1e-4, 0.5 * max_volatility)
+    error = np.full_like(sigma, np.nan)
+
+    active = np.arange(len(index))
+    instrumentation.count('implied_volatility_quotes', len(index))
+    for iteration in range(max_iterations):
+        if len(active) == 0:
+            break
+        instrumentation.count('implied_volatility_iterations')
+        instrumentation.count('implied_volatility_quote_iterations', len(active))
+        s = sigma[active]
+        St_a, _, T_a, _, _, _, X_a, _, d1, d2 = _bsm_intermediates(
+            St[active], X[active], T[active], 0.0, s, 1)
+        f = St_a * N(d1) - X_a * N(d2) - C[active]
+        error[active] = f
+        vega = St_a * dN(d1) * np.sqrt(T_a)
+
+        done = (np.abs(f) < precision) & (np.abs(f) < volatility_precision * vega)
+        converged[index[active[done]]] = True
+
+        # the call value increases with volatility, which keeps the bracket consistent
+        high = f > 0
+        sigma_high[active[high]] = s[high]
+        sigma_low[active[~high]] = s[~high]
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = f / vega
+            halley_correction = 1.0 - 0.5 * newton * d1 * d2 / s
+            # Halley is only trusted while it stays close to the Newton step
+            halley = (halley_correction > 0.5) & (halley_correction < 2.0)
+            step = s - np.where(halley, newton / halley_correction, newton)
+        lower, upper = sigma_low[active], sigma_high[active]
+        outside = ~np.isfinite(step) | (step <= lower) | (step >= upper)
+        step = np.where(outside, 0.5 * (lower + upper), step)
+        sigma[active[~done]] = step[~done]
+        active = active[~done]
+
+    if len(active) > 0:
+        # the quotes left unconverged were moved after their last evaluation
+        St_a, _, _, _, _, _, X_a, _, d1, d2 = _bsm_intermediates(St[active], X[active], T[active], 0.0,
+                                                                sigma[active], 1)
+        error[active] = St_a * N(d1) - X_a * N(d2) - C[active]
+
+    volatility[index] = sigma
+    residual[index] = error
+    return volatility.reshape(value.shape), residual.reshape(value.shape), converged.reshape(value.shape)
+
+
 def implied_volatility(Option, MarketData, value):
     """ Calculates the implied volatility by reversing Black-Scholes-Merton model.
+    MarketData is left untouched.
 
     Parameters
     ==========
@@ -133,26 +325,12 @@ def implied_volatility(Option, MarketData, value):
 
     Returns
     =======
-    MarketData.volatility:  float
+    volatility:  float
     error:   float
     """
-    error = 100
-    precision = 0.001
-    sigmaL = min(0.001, precision)
-    sigmaH = 5
-    n = 0
-    while abs(error) >= precision and n < 10000:
-        MarketData.volatility = (sigmaL+sigmaH)/2
-        approxM = BSM_value(Option, MarketData)
-        if approxM > value:
-            sigmaH = MarketData.volatility
-
-        elif approxM < value:
-            sigmaL = MarketData.volatility
-
-        error = abs(approxM - value)
-        n += 1
-    return MarketData.volatility, error
+    volatility, residual, converged = implied_volatility_array(value, Option.underlying_price, Option.strike,
+                                                               Option.maturity, MarketData.r, Option.option_type)
+    return float(volatility), abs(float(residual))
 
 
 def dividend_actualisation(div, t, r=0.05):
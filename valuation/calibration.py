@@ -0,0 +1,124 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import numpy as np
+
+from valuation import black_scholes_merton as bsm
+from valuation.fourier import characteristic_functions as cf
+from valuation.fourier.lewis import LewisPricer
+from valuation.market_data import MarketData
+
+# calibrated parameters, in the order of the optimizer vector
+HESTON_PARAMETERS = ('kappa', 'theta', 'std_volatility', 'rho', 'variance')
+HESTON_BOUNDS = (np.array([1e-3, 1e-4, 1e-3, -0.999, 1e-4]), np.array([20.0, 2.0, 5.0, 0.999, 2.0]))
+HESTON_GUESS = np.array([1.5, 0.04, 0.5, -0.5, 0.04])
+
+
+def calibrate_heston(underlying_price, strikes, maturities, r, quotes, option_types=1, weights=None, initial=None,
+                     points=96, workers=None, tolerance=1e-10, max_evaluations=500):
+    """
+    Fits the Heston parameters kappa, theta, std_volatility, rho and the initial variance to a surface of
+    European option quotes by weighted least squares (scipy trust region reflective within HESTON_BOUNDS).
+    Every evaluation of the objective prices the whole surface with a Lewis pricer, whose characteristic
+    function work is shared by all the strikes of a maturity.
+    :param underlying_price: float
+    :param strikes: numpy array
+    :param maturities: numpy array
+    broadcast against strikes
+    :param r: float
+    :param quotes: numpy array
+    option values, broadcast against strikes
+    :param option_types: numpy array
+    1: Call, 2: Put, broadcast against strikes
+    :param weights: numpy array
+    weight of each price residual, defaults to the inverse Black-Scholes-Merton vega of the quote (floored
+    at 1% of the underlying price) so that the fit is close to a fit of implied volatilities
+    :param initial: MarketData
+    starting parameters, typically the result of the previous calibration (warm start), HESTON_GUESS when None
+    :param points: int
+    Gauss-Laguerre nodes of the pricer
+    :param workers: int or concurrent.futures.Executor
+    processes evaluating the finite difference jacobian, in-process when None or 1. An executor can be
+    passed instead, to keep the processes alive between successive calibrations
+    :param tolerance: float
+    relative tolerance on the cost, the parameters and the gradient
+    :param max_evaluations: int
+    :return: tuple (MarketData, float)
+    calibrated market data (volatility being the square root of the initial variance) and root mean
+    square of the weighted residuals
+    """
+    from scipy.optimize import least_squares
+
+    strikes, maturities, quotes, option_types = [
+        array.ravel() for array in np.broadcast_arrays(np.asarray(strikes, dtype=float),
+                                                       np.asarray(maturities, dtype=float),
+                                                       np.asarray(quotes, dtype=float), np.asarray(option_types))]
+    if weights is None:
+        volatility = bsm.implied_volatility_array(quotes, underlying_price, strikes, maturities, r, option_types)[0]
+        vega = bsm.BSM_greeks_array(underlying_price, strikes, maturities, r, np.nan_to_num(volatility, nan=0.2),
+                                    option_types)['vega']
+        weights = 1 / np.maximum(vega, 0.01 * underlying_price)
+    weights = np.broadcast_to(np.asarray(weights, dtype=float), quotes.shape)
+
+    surface = (underlying_price, strikes, maturities, r, option_types, points)
+    x0 = HESTON_GUESS if initial is None else np.array([initial.kappa, initial.theta, initial.std_volatility,
+                                                         initial.rho, initial.volatility ** 2])
+    x0 = np.clip(x0, HESTON_BOUNDS[0] * (1 + 1e-9) + 1e-12, HESTON_BOUNDS[1] * (1 - 1e-9))
+
+    def residuals(parameters):
+        return weights * (_heston_values(parameters, surface) - quotes)
+
+    if isinstance(workers, Executor):
+        executor = workers
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers) if workers is not None and workers > 1 else None
+    try:
+        jacobian = '2-point' if executor is None else lambda parameters: _parallel_jacobian(
+            parameters, surface, weights, executor)
+        result = least_squares(residuals, x0, jac=jacobian, bounds=HESTON_BOUNDS, method='trf', x_scale='jac',
+                               ftol=tolerance, xtol=tolerance, gtol=tolerance, max_nfev=max_evaluations)
+    finally:
+        if executor is not None and executor is not workers:
+            executor.shutdown()
+
+    kappa, theta, std_volatility, rho, variance = result.x
+    market_data = MarketData(r, float(np.sqrt(variance)), float(rho), float(theta), float(kappa),
+                             float(std_volatility))
+    return market_data, float(np.sqrt(np.mean(result.fun ** 2)))
+
+
+def _heston_values(parameters, surface):
+    """
+    Heston values of the quoted surface for a vector of parameters in the order of HESTON_PARAMETERS
+    :param parameters: numpy array
+    :param surface: tuple (float, numpy array, numpy array, float, numpy array, int)
+    underlying price, strikes, maturities, r, option types and Gauss-Laguerre nodes
+    :return: numpy array
+    """
+    underlying_price, strikes, maturities, r, option_types, points = surface
+    kappa, theta, std_volatility, rho, variance = parameters
+    pricer = LewisPricer(lambda u, maturity: cf.heston_characteristic_function(
+        u, maturity, r, variance, kappa, theta, std_volatility, rho), points)
+    return pricer.value(underlying_price, strikes, maturities, r, option_types)
+
+
+def _bumped_values(task):
+    """
+    Worker of _parallel_jacobian
+    :param task: tuple (numpy array, tuple)
+    :return: numpy array
+    """
+    return _heston_values(*task)
+
+
+def _parallel_jacobian(parameters, surface, weights, executor):
+    """
+    Forward difference jacobian of the weighted residuals, the bumped parameter vectors being priced
+    in parallel. Steps are taken backwards at the upper bounds.
+    :return: numpy array
+    (quotes, parameters)
+    """
+    steps = np.sqrt(np.finfo(float).eps) * np.maximum(np.abs(parameters), 1e-2)
+    steps = np.where(parameters + steps > HESTON_BOUNDS[1], -steps, steps)
+    bumped = [parameters] + [parameters + step * unit for step, unit in zip(steps, np.eye(len(parameters)))]
+    values = list(executor.map(_bumped_values, [(vector, surface) for vector in bumped]))
+    return weights[:, np.newaxis] * (np.array(values[1:]).T - values[0][:, np.newaxis]) / steps
@@ -0,0 +1,88 @@
+import numpy as np
+
+from valuation.volatility_surface import VolatilitySurface
+
+MODELS = ('bsm', 'heston')
+
+
+def bsm_characteristic_function(u, maturity, r, volatility):
+    """
+    Characteristic function of the log-return ln(S_T / S_0) under the risk-neutral Black-Scholes-Merton dynamics
+    :param u: numpy array
+    real or complex arguments
+    :param maturity: float or numpy array
+    broadcast against u
+    :param r: float
+    :param volatility: float
+    :return: numpy array
+    """
+    u = np.asarray(u, dtype=complex)
+    return np.exp((1j * u * (r - 0.5 * volatility ** 2) - 0.5 * volatility ** 2 * u ** 2) * maturity)
+
+
+def heston_characteristic_function(u, maturity, r, variance, kappa, theta, std_volatility, rho):
+    """
+    Characteristic function of the log-return ln(S_T / S_0) in the Heston model, written in the form of
+    Albrecher et al. (the "little trap") which stays on the principal branch of the complex logarithm
+    for long maturities
+    :param u: numpy array
+    real or complex arguments
+    :param maturity: float or numpy array
+    broadcast against u
+    :param r: float
+    :param variance: float
+    initial variance
+    :param kappa: float
+    mean reversion speed of the variance
+    :param theta: float
+    long-run variance
+    :param std_volatility: float
+    volatility of the variance
+    :param rho: float
+    correlation of the variance and the underlying
+    :return: numpy array
+    """
+    u = np.asarray(u, dtype=complex)
+    beta = kappa - rho * std_volatility * 1j * u
+    d = np.sqrt(beta ** 2 + std_volatility ** 2 * (1j * u + u ** 2))
+    g = (beta - d) / (beta + d)
+    decay = np.exp(-d * maturity)
+    c = (1j * u * r * maturity + kappa * theta / std_volatility ** 2 *
+         ((beta - d) * maturity - 2 * np.log((1 - g * decay) / (1 - g))))
+    d_term = (beta - d) / std_volatility ** 2 * (1 - decay) / (1 - g * decay)
+    return np.exp(c + d_term * variance)
+
+
+def characteristic_function(market_data, model='bsm', volatility=None):
+    """
+    Characteristic function of the log-return built on the parameters of a MarketData
+    :param market_data: MarketData
+    :param model: str
+    'bsm' (constant volatility) or 'heston', whose variance starts at volatility ** 2 and uses
+    kappa, theta (long-run variance), std_volatility and rho
+    :param volatility: float
+    volatility to use instead of market_data.volatility, required under 'bsm' when the latter is a
+    VolatilitySurface, typically market_data.volatility_for(strike, maturity) of the contracts valued.
+    The Heston initial variance is a state of the model, not read from an implied volatility smile: a surface
+    is rejected under 'heston'.
+    :return: function
+    function of (u, maturity)
+    """
+    if volatility is None:
+        if isinstance(market_data.volatility, VolatilitySurface):
+            if model == 'heston':
+                raise ValueError("the heston model needs a single volatility, the square root of its initial "
+                                 "variance, not a volatility surface")
+            raise ValueError("a characteristic function takes a single volatility, read the volatility surface at "
+                             "the strikes and maturities valued with market_data.volatility_for")
+        volatility = market_data.volatility
+    if model == 'bsm':
+        return lambda u, maturity: bsm_characteristic_function(u, maturity, market_data.r, volatility)
+    elif model == 'heston':
+        if market_data.rho is None or market_data.theta is None or market_data.kappa is None \
+                or market_data.std_volatility is None:
+            raise ValueError("the heston model needs rho, theta, kappa and std_volatility")
+        return lambda u, maturity: heston_characteristic_function(
+            u, maturity, market_data.r, volatility ** 2, market_data.kappa, market_data.theta,
+            market_data.std_volatility, market_data.rho)
+    raise ValueError("model must be one of " + str(MODELS))
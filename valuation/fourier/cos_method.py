@@ -0,0 +1,181 @@
+import numpy as np
+
+from valuation.fourier import characteristic_functions as cf
+
+
+def cos_value(characteristic_function, underlying_price, strikes, maturities, r, option_types=1, terms=256,
+              truncation=10):
+    """
+    Fang-Oosterlee (2008) COS values of European options. The density of ln(S_T / S_0) is expanded in a
+    cosine series on a truncation range common to all the strikes of a maturity, so the characteristic
+    function is evaluated once per maturity and the payoff coefficients of every strike are combined
+    with it in a single product. The series converges exponentially for smooth densities.
+    Puts are valued by the series and calls by the put-call parity, which is the more stable order.
+    :param characteristic_function: function
+    characteristic function of ln(S_T / S_0) as a function of (u, maturity), see characteristic_functions
+    :param underlying_price: float
+    :param strikes: numpy array
+    :param maturities: numpy array
+    broadcast against strikes
+    :param r: float
+    :param option_types: numpy array
+    1: Call, 2: Put, broadcast against strikes
+    :param terms: int
+    number of cosine terms
+    :param truncation: float
+    half width L of the truncation range, see _truncation_range
+    :return: numpy array
+    value of each option
+    """
+    strikes, maturities, option_types = np.broadcast_arrays(np.asarray(strikes, dtype=float),
+                                                            np.asarray(maturities, dtype=float),
+                                                            np.asarray(option_types))
+    values = np.empty(strikes.shape)
+    for maturity in np.unique(maturities):
+        selected = maturities == maturity
+        a, b = _truncation_range(characteristic_function, maturity, truncation)
+        u = np.arange(terms) * np.pi / (b - a)
+        weights = np.real(characteristic_function(u, maturity) * np.exp(-1j * u * a))
+        weights[0] *= 0.5
+        log_strikes = np.log(strikes[selected] / underlying_price)
+        discount = np.exp(-r * maturity)
+        puts = discount * np.dot(weights, _payoff_coefficients(u, a, b, a, np.clip(log_strikes, a, b), log_strikes,
+                                                               2, underlying_price))
+        calls = puts + underlying_price - strikes[selected] * discount
+        values[selected] = np.where(option_types[selected] == 2, puts, calls)
+    return values
+
+
+def cos_bermudan_value(underlying_price, strike, maturity, r, volatility, exercise_dates, option_type=2,
+                       terms=256, truncation=10):
+    """
+    COS value of a Bermudan option under Black-Scholes-Merton, by backward recursion of the cosine
+    coefficients of the value function over equally spaced exercise dates (Fang-Oosterlee 2009).
+    At each date the early exercise boundary is located by bisection, the coefficients of the exercise
+    region are analytic and those of the continuation region follow from the coefficients of the next date.
+    The model must have independent increments, so only constant volatility is supported.
+    :param underlying_price: float
+    :param strike: float
+    :param maturity: float
+    :param r: float
+    :param volatility: float
+    :param exercise_dates: int
+    number of exercise dates, the last one being the maturity
+    :param option_type: int
+    1: Call, 2: Put
+    :param terms: int
+    :param truncation: float
+    :return: float
+    """
+    dt = maturity / exercise_dates
+    characteristic_function = lambda u, t: cf.bsm_characteristic_function(u, t, r, volatility)
+    a, b = _truncation_range(characteristic_function, maturity, truncation)
+    u = np.arange(terms) * np.pi / (b - a)
+    log_strike = np.log(strike / underlying_price)
+    # transition over one period, halved first term of the cosine sum
+    transition = characteristic_function(u, dt)
+    transition[0] *= 0.5
+    discount = np.exp(-r * dt)
+
+    def payoff(z):
+        return np.maximum((1 if option_type == 1 else -1) * underlying_price * (np.exp(z) - strike /
+                                                                                 underlying_price), 0)
+
+    def continuation(z, coefficients):
+        return discount * np.real(np.dot(np.exp(1j * np.outer(z - a, u)), transition * coefficients))
+
+    if option_type == 1:
+        coefficients = _payoff_coefficients(u, a, b, log_strike, b, None, 1, underlying_price)
+    else:
+        coefficients = _payoff_coefficients(u, a, b, a, log_strike, None, 2, underlying_price)
+    for _ in range(exercise_dates - 1):
+        boundary = _exercise_boundary(lambda z: continuation(z, coefficients) - payoff(z), a, b, log_strike,
+                                      option_type)
+        if option_type == 1:
+            continued = _continuation_coefficients(u, a, b, a, boundary, transition * coefficients, discount)
+            coefficients = continued + _payoff_coefficients(u, a, b, boundary, b, log_strike, 1, underlying_price)
+        else:
+            continued = _continuation_coefficients(u, a, b, boundary, b, transition * coefficients, discount)
+            coefficients = continued + _payoff_coefficients(u, a, b, a, boundary, log_strike, 2, underlying_price)
+    return float(continuation(np.zeros(1), coefficients)[0])
+
+
+def _truncation_range(characteristic_function, maturity, truncation):
+    """
+    Truncation range of ln(S_T / S_0) from its first, second and fourth cumulants, [c1 - L w, c1 + L w]
+    with w = sqrt(c2 + sqrt(c4)), the cumulants being obtained by finite differences of the logarithm
+    of the characteristic function at 0
+    :return: tuple (float, float)
+    """
+    h = 1e-2
+    log_cf = np.log(characteristic_function(np.array([h, -h, 2 * h]), maturity))
+    mean = np.imag(log_cf[0] - log_cf[1]) / (2 * h)
+    # the real part is -c2 u^2 / 2 + c4 u^4 / 24 + O(u^6)
+    even = np.real(log_cf[0] + log_cf[1]) / 2
+    fourth = 2 * (np.real(log_cf[2]) - 4 * even) / h ** 4
+    variance = -2 * even / h ** 2 + fourth * h ** 2 / 12
+    width = truncation * np.sqrt(max(variance, 1e-12) + np.sqrt(max(fourth, 0)))
+    return mean - width, mean + width
+
+
+def _chi(u, a, c, d):
+    """
+    Cosine coefficients of e^z on [c, d] over the range starting at a
+    """
+    return (np.cos(u * (d - a)) * np.exp(d) - np.cos(u * (c - a)) * np.exp(c) +
+            u * np.sin(u * (d - a)) * np.exp(d) - u * np.sin(u * (c - a)) * np.exp(c)) / (1 + u ** 2)
+
+
+def _psi(u, a, c, d):
+    """
+    Cosine coefficients of 1 on [c, d] over the range starting at a
+    """
+    safe_u = np.where(u == 0, 1, u)
+    return np.where(u == 0, d - c, (np.sin(u * (d - a)) - np.sin(u * (c - a))) / safe_u)
+
+
+def _payoff_coefficients(u, a, b, c, d, log_strike, option_type, underlying_price):
+    """
+    Cosine coefficients on [c, d] of the payoff S_0 (e^z - e^k)^+ (calls) or S_0 (e^k - e^z)^+ (puts),
+    k being the log strike, c or d when log_strike is None. Bounds and log strikes may be arrays of
+    contracts, the result being then (terms, contracts).
+    """
+    u = u[:, np.newaxis] if np.ndim(c) or np.ndim(d) else u
+    log_strike = (d if option_type == 2 else c) if log_strike is None else log_strike
+    sign = 1 if option_type == 1 else -1
+    return sign * 2 / (b - a) * underlying_price * (_chi(u, a, c, d) - np.exp(log_strike) * _psi(u, a, c, d))
+
+
+def _continuation_coefficients(u, a, b, c, d, weighted, discount):
+    """
+    Cosine coefficients on [c, d] of the continuation value whose next-date coefficients, multiplied by the
+    transition characteristic function, are weighted
+    """
+    # integrals of exp(i u_j (z - a)) cos(u_k (z - a)) over [c, d], through exp(i (u_j +- u_k) (z - a))
+    integrals = np.zeros((len(u), len(u)), dtype=complex)
+    for sign in (1, -1):
+        w = u[np.newaxis, :] + sign * u[:, np.newaxis]
+        safe_w = np.where(w == 0, 1, w)
+        integrals += np.where(w == 0, d - c, (np.exp(1j * w * (d - a)) - np.exp(1j * w * (c - a))) / (1j * safe_w))
+    return discount / (b - a) * np.real(np.dot(integrals, weighted))
+
+
+def _exercise_boundary(difference, a, b, log_strike, option_type, iterations=60):
+    """
+    Early exercise boundary, root of continuation minus payoff, by bisection between the log strike and
+    the end of the range on the in-the-money side
+    :return: float
+    """
+    low, high = (log_strike, b) if option_type == 1 else (a, log_strike)
+    # exercise side of the bracket
+    exercise_low = option_type == 2
+    if (difference(np.array([low if exercise_low else high]))[0] >= 0):
+        return low if exercise_low else high
+    for _ in range(iterations):
+        middle = 0.5 * (low + high)
+        exercised = difference(np.array([middle]))[0] < 0
+        if exercised == exercise_low:
+            low = middle
+        else:
+            high = middle
+    return 0.5 * (low + high)
@@ -6,6 +6,10 @@ import numpy as np
 from numpy.fft import fft, ifft
 
 from valuation.binomial.binomial_valuation import BinomialValuation as bn
+from valuation.fourier import characteristic_functions as cf
+from valuation.fourier.carr_madan import carr_madan_value
+from valuation.fourier.cos_method import cos_bermudan_value, cos_value
+from valuation.fourier.lewis import LewisPricer
 
 
 class Fourier:
@@ -13,29 +17,196 @@ class Fourier:
     @staticmethod
     def valuate_option(option, M, market_data):
         """
-
-        :param M:
+        Values a European call by convolution of the terminal payoff of a M steps binomial tree with its
+        branch probabilities through the FFT
+        :param M: int
         :return:
         """
 
         dt, df, u, d, q = bn.get_binomial_parameters(option, M, market_data)
 
-        # Array Generation for Stock Prices
-        mu = np.arange(M + 1)
-        mu = np.resize(mu, (M + 1, M + 1))
-        md = np.transpose(mu)
-        #Fourier- Based Option Pricing 125
-        mu = u ** (mu - md)
-        md = d ** md
-        S = option.S0 * mu * md
+        # Terminal stock prices, from M up movements to M down movements
+        md = np.arange(M + 1)
+        S = option.underlying_price * u ** (M - md) * d ** md
         # Valuation by fft
-        CT = np.maximum(S[:, -1] - option.K, 0)
-        qv = np.zeros(M + 1, dtype= np.float)
+        CT = np.maximum(S - option.strike, 0)
+        qv = np.zeros(M + 1, dtype=float)
         qv[0] = q
         qv[1] = 1 - q
 
-        C0 = fft(math.exp(-market_data.r * option.T) * ifft(CT) * fft(qv) ** M)
+        C0 = np.real(fft(math.exp(-market_data.r * option.maturity) * ifft(CT) * fft(qv) ** M))
         # Results Output
-        print("Value of European option is %8.3f" % np.real(C0[0]))
+        print("Value of European option is %8.3f" % C0[0])
         option.C0 = C0[0]
-        return C0[0]
\ No newline at end of file
+        return C0[0]
+
+    @staticmethod
+    def valuate_chain(option, market_data, strikes=None, option_types=None, model='bsm', points=4096, eta=0.25,
+                      alpha=1.5):
+        """
+        Values a chain of European options sharing the underlying and maturity of option with the
+        Carr-Madan FFT engine
+        :param option: Option
+        template holding the shared terms
+        :param market_data: MarketData
+        :param strikes: numpy array
+        defaults to option.strike
+        :param option_types: numpy array
+        1: Call, 2: Put for each strike, defaults to option.option_type
+        :param model: str
+        'bsm' or 'heston', see characteristic_functions.characteristic_function
+        :param points: int
+        :param eta: float
+        :param alpha: float
+        :return: numpy array
+        value of each option
+        """
+        strikes = np.atleast_1d(np.asarray(option.strike if strikes is None else strikes, dtype=float))
+        option_types = np.asarray(option.option_type if option_types is None else option_types)
+        return Fourier._value_by_volatility(
+            market_data, model, strikes, option.maturity, option_types,
+            lambda characteristic_function, strikes, maturities, option_types: carr_madan_value(
+                characteristic_function, option.underlying_price, strikes, option.maturity, market_data.r,
+                option_types, points, eta, alpha))
+
+    @staticmethod
+    def valuate_chain_cos(option, market_data, strikes=None, option_types=None, maturities=None, model='bsm',
+                          terms=256):
+        """
+        Values European options sharing the underlying of option with the COS method, the characteristic
+        function being evaluated once per maturity
+        :param option: Option
+        template holding the shared terms
+        :param market_data: MarketData
+        :param strikes: numpy array
+        defaults to option.strike
+        :param option_types: numpy array
+        1: Call, 2: Put, defaults to option.option_type
+        :param maturities: numpy array
+        broadcast against strikes, defaults to option.maturity
+        :param model: str
+        'bsm' or 'heston', see characteristic_functions.characteristic_function
+        :param terms: int
+        number of cosine terms, heavy-tailed models with long maturities may need more
+        :return: numpy array
+        value of each option
+        """
+        strikes = np.atleast_1d(np.asarray(option.strike if strikes is None else strikes, dtype=float))
+        option_types = np.asarray(option.option_type if option_types is None else option_types)
+        maturities = np.asarray(option.maturity if maturities is None else maturities, dtype=float)
+        return Fourier._value_by_volatility(
+            market_data, model, strikes, maturities, option_types,
+            lambda characteristic_function, strikes, maturities, option_types: cos_value(
+                characteristic_function, option.underlying_price, strikes, maturities, market_data.r, option_types,
+                terms))
+
+    @staticmethod
+    def valuate_bermudan_cos(option, market_data, exercise_dates, terms=256):
+        """
+        Values a Bermudan option exercisable on exercise_dates equally spaced dates up to its maturity with the
+        COS method, under Black-Scholes-Merton
+        :param option: Option
+        :param market_data: MarketData
+        :param exercise_dates: int
+        :param terms: int
+        :return: float
+        """
+        option.C0 = cos_bermudan_value(option.underlying_price, option.strike, option.maturity, market_data.r,
+                                       market_data.volatility_for(option.strike, option.maturity), exercise_dates,
+                                       option.option_type, terms)
+        return option.C0
+
+    @staticmethod
+    def valuate_chain_lewis(option, market_data, strikes=None, option_types=None, maturities=None, model='heston',
+                            points=96):
+        """
+        Values European options sharing the underlying of option with the Lewis formula on Gauss-Laguerre
+        nodes. Keep a LewisPricer to reuse the maturity terms across calls.
+        :param option: Option
+        template holding the shared terms
+        :param market_data: MarketData
+        :param strikes: numpy array
+        defaults to option.strike
+        :param option_types: numpy array
+        1: Call, 2: Put, defaults to option.option_type
+        :param maturities: numpy array
+        broadcast against strikes, defaults to option.maturity
+        :param model: str
+        'bsm' or 'heston', see characteristic_functions.characteristic_function
+        :param points: int
+        :return: numpy array
+        value of each option
+        """
+        strikes = np.atleast_1d(np.asarray(option.strike if strikes is None else strikes, dtype=float))
+        option_types = np.asarray(option.option_type if option_types is None else option_types)
+        maturities = np.asarray(option.maturity if maturities is None else maturities, dtype=float)
+        return Fourier._value_by_volatility(
+            market_data, model, strikes, maturities, option_types,
+            lambda characteristic_function, strikes, maturities, option_types: LewisPricer(
+                characteristic_function, points).value(option.underlying_price, strikes, maturities, market_data.r,
+                                                       option_types))
+
+    @staticmethod
+    def valuate_book(book, market_data, model='bsm', terms=256):
+        """
+        Values the European contracts of an OptionBook with the COS method, one call of cos_value per
+        underlying price covering all its distinct strikes and maturities. Under 'bsm', a volatility surface is read
+        at each contract and contracts are grouped by volatility as well, 'heston' rejects surfaces.
+        :param book: OptionBook
+        :param market_data: MarketData
+        :param model: str
+        'bsm' or 'heston', see characteristic_functions.characteristic_function
+        :param terms: int
+        :return: numpy array
+        value of each contract, NaN for the contracts that are not European
+        """
+        values = np.full(len(book), np.nan)
+        if model == 'bsm':
+            volatilities = np.broadcast_to(market_data.volatility_for(book.strikes, book.maturities), (len(book),))
+        else:
+            volatilities = np.zeros(len(book))
+            characteristic_function = cf.characteristic_function(market_data, model)
+        european = book.styles == 1
+        for (underlying_price, volatility), index in book.groups((book.underlying_prices, volatilities)):
+            index = index[european[index]]
+            if len(index) == 0:
+                continue
+            if model == 'bsm':
+                characteristic_function = cf.characteristic_function(market_data, model, volatility)
+            (strikes, maturities, option_types), inverse = book[index].factorize(('strike', 'maturity',
+                                                                                  'option_type'))
+            values[index] = cos_value(characteristic_function, underlying_price, strikes, maturities, market_data.r,
+                                      option_types, terms)[inverse]
+        return values
+
+    @staticmethod
+    def _value_by_volatility(market_data, model, strikes, maturities, option_types, engine):
+        """
+        Calls engine once per distinct volatility read at the strikes and maturities, so that each characteristic
+        function holds a single volatility even when market_data.volatility is a VolatilitySurface. Other models
+        than 'bsm' take their parameters from market_data and are called once.
+        :param market_data: MarketData
+        :param model: str
+        :param strikes: numpy array
+        :param maturities: float or numpy array
+        :param option_types: int or numpy array
+        :param engine: function
+        of (characteristic_function, strikes, maturities, option_types) returning their values
+        :return: numpy array
+        """
+        if model != 'bsm':
+            return engine(cf.characteristic_function(market_data, model), strikes, maturities, option_types)
+        volatilities = market_data.volatility_for(strikes, maturities)
+        if np.ndim(volatilities) == 0:
+            return engine(cf.characteristic_function(market_data, model, volatilities), strikes, maturities,
+                          option_types)
+        strikes, maturities, option_types, volatilities = np.broadcast_arrays(strikes, maturities, option_types,
+                                                                              volatilities)
+        values = np.empty(strikes.shape)
+        distinct, inverse = np.unique(volatilities, return_inverse=True)
+        inverse = inverse.reshape(strikes.shape)
+        for position, volatility in enumerate(distinct):
+            group = inverse == position
+            values[group] = engine(cf.characteristic_function(market_data, model, volatility), strikes[group],
+                                   maturities[group], option_types[group])
+        return values
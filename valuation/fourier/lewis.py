@@ -0,0 +1,115 @@
+import functools
+
+import numpy as np
+from numpy.polynomial import laguerre
+
+from valuation.fourier import characteristic_functions as cf
+
+# smallest spacing factor of the nodes, the integrand having poles at +-i/2
+NODE_SCALE = 0.5
+
+
+@functools.lru_cache(maxsize=None)
+def gauss_laguerre_nodes(points):
+    """
+    Gauss-Laguerre nodes and weights, the weights being multiplied by e^x so that they integrate f(x) rather
+    than e^-x f(x) over [0, inf). They are computed once per number of points and returned read-only.
+    :param points: int
+    :return: tuple (numpy array, numpy array)
+    """
+    nodes, weights = laguerre.laggauss(points)
+    weights = weights * np.exp(nodes)
+    nodes.flags.writeable = False
+    weights.flags.writeable = False
+    return nodes, weights
+
+
+class LewisPricer:
+    """
+    Class valuing European options with the Lewis (2001) formula
+    C = S_0 - e^(-rT) sqrt(S_0 K) / pi * int_0^inf Re(e^(iuk) phi(u - i/2)) / (u^2 + 1/4) du, k = ln(S_0 / K),
+    integrated on a fixed Gauss-Laguerre node set. Everything that does not depend on the strike (nodes,
+    weights and characteristic function values) is computed once per maturity and kept, so that further
+    strikes of a known maturity only cost a weighted sum.
+    """
+
+    def __init__(self, characteristic_function, points=96):
+        """
+        Class default constructor
+        :param characteristic_function: function
+        characteristic function of ln(S_T / S_0) as a function of (u, maturity), see characteristic_functions.
+        The cached terms assume it does not change, see clear
+        :param points: int
+        number of Gauss-Laguerre nodes, maturities of a few days need more
+        :return:
+        """
+        self.characteristic_function = characteristic_function
+        self.points = points
+        self.maturity_terms = {}
+
+    def clear(self):
+        """
+        Method forgetting the cached maturity terms, to be called when the model parameters change
+        :return:
+        """
+        self.maturity_terms.clear()
+
+    def terms(self, maturity):
+        """
+        Nodes and strike-independent part of the integrand of a maturity, computed on first use
+        :param maturity: float
+        :return: tuple (numpy array, numpy array)
+        """
+        maturity = float(maturity)
+        if maturity not in self.maturity_terms:
+            nodes, weights = gauss_laguerre_nodes(self.points)
+            # the nodes are spread further when the density is narrow, its transform then decaying slowly
+            h = 1e-3
+            log_cf = np.log(self.characteristic_function(np.array([h, -h]), maturity))
+            variance = max(-np.real(log_cf[0] + log_cf[1]) / h ** 2, 1e-12)
+            scale = max(NODE_SCALE, np.sqrt(60 / variance) / nodes[-1])
+            u = scale * nodes
+            self.maturity_terms[maturity] = (u, scale * weights * self.characteristic_function(u - 0.5j, maturity) /
+                                             (u ** 2 + 0.25))
+        return self.maturity_terms[maturity]
+
+    def value(self, underlying_price, strikes, maturities, r, option_types=1):
+        """
+        Method valuing European options, vectorized over strikes and maturities. Puts follow from the
+        put-call parity.
+        :param underlying_price: float
+        :param strikes: numpy array
+        :param maturities: numpy array
+        broadcast against strikes
+        :param r: float
+        :param option_types: numpy array
+        1: Call, 2: Put, broadcast against strikes
+        :return: numpy array
+        value of each option
+        """
+        strikes, maturities, option_types = np.broadcast_arrays(np.asarray(strikes, dtype=float),
+                                                                np.asarray(maturities, dtype=float),
+                                                                np.asarray(option_types))
+        values = np.empty(strikes.shape)
+        for maturity in np.unique(maturities):
+            selected = maturities == maturity
+            u, terms = self.terms(maturity)
+            selected_strikes = strikes[selected]
+            integrals = np.real(np.dot(np.exp(1j * np.outer(np.log(underlying_price / selected_strikes), u)), terms))
+            discounted_strikes = selected_strikes * np.exp(-r * maturity)
+            calls = underlying_price - np.exp(-r * maturity) * np.sqrt(underlying_price * selected_strikes) / np.pi * \
+                integrals
+            values[selected] = np.where(option_types[selected] == 2, calls - underlying_price + discounted_strikes,
+                                        calls)
+        return values
+
+
+def heston_pricer(market_data, points=96):
+    """
+    Lewis pricer of the Heston model on the parameters of a MarketData, see
+    characteristic_functions.characteristic_function
+    :param market_data: MarketData
+    :param points: int
+    :return: LewisPricer
+    """
+    return LewisPricer(cf.characteristic_function(market_data, 'heston'), points)
@@ -0,0 +1,156 @@
+import contextlib
+import threading
+import time
+import tracemalloc
+
+# valuation statistics being collected by the current thread, if any
+_state = threading.local()
+# stage returned while nothing is collected, entering and leaving it costs a few tens of nanoseconds
+_DISABLED = contextlib.nullcontext()
+
+
+class ValuationStats:
+    """
+    Class holding what the instrumented code reported while it was collected: the time spent in each stage
+    (stages may be nested, each time includes the stages it contains), counters (paths, nodes, iterations,
+    cache hits...), the total time and, when memory is tracked, the peak memory allocated
+    """
+
+    def __init__(self):
+        """
+        Class default constructor
+        :return: empty statistics
+        """
+        self.timings = {}
+        self.counters = {}
+        self.total_time = 0.0
+        self.peak_memory = None
+
+    def as_dict(self):
+        """
+        Statistics as plain types, ready to be fed to a metrics system
+        :return: dict
+        with keys 'timings', 'counters', 'total_time' and 'peak_memory' (bytes, None when not tracked)
+        """
+        return {'timings': dict(self.timings), 'counters': dict(self.counters), 'total_time': self.total_time,
+                'peak_memory': self.peak_memory}
+
+    def __repr__(self):
+        return "ValuationStats(" + repr(self.as_dict()) + ")"
+
+
+class _Stage:
+    """
+    Context manager adding the time spent inside it to a stage of the collected statistics
+    """
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.timings[self.name] = self.stats.timings.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+@contextlib.contextmanager
+def instrument(callback=None, memory=False):
+    """
+    Collects the statistics of everything valued by the current thread inside the with block. Outside such
+    a block the instrumentation hooks of the engines do nothing.
+        with instrument() as stats:
+            simulation.valuate_option()
+        print(stats.timings, stats.counters)
+    :param callback: function
+    called with the ValuationStats when the block exits, to forward them to a metrics system
+    :param memory: bool
+    track the peak memory allocated in the block (NumPy arrays included) with tracemalloc, which slows
+    down the allocations of the Python objects
+    :return: ValuationStats
+    """
+    stats = ValuationStats()
+    previous = getattr(_state, 'stats', None)
+    tracing = memory and not tracemalloc.is_tracing()
+    if memory:
+        # tracemalloc has a single peak: the peak of the enclosing memory block, wiped by reset_peak, and the
+        # peaks of the nested ones are kept in a list per memory block and folded back on exit
+        enclosing_peaks = getattr(_state, 'peaks', None)
+        if tracing:
+            tracemalloc.start()
+        else:
+            _keep_peak(enclosing_peaks, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        _state.peaks = [baseline]
+    _state.stats = stats
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.total_time = time.perf_counter() - start
+        _state.stats = previous
+        if memory:
+            peak = max(tracemalloc.get_traced_memory()[1], _state.peaks[0])
+            stats.peak_memory = peak - baseline
+            _state.peaks = enclosing_peaks
+            _keep_peak(enclosing_peaks, peak)
+            if tracing:
+                tracemalloc.stop()
+        if previous is not None:
+            _merge(previous, stats)
+        if callback is not None:
+            callback(stats)
+
+
+def current():
+    """
+    Statistics being collected by the current thread
+    :return: ValuationStats or None
+    """
+    return getattr(_state, 'stats', None)
+
+
+def stage(name):
+    """
+    Context manager timing a stage of a valuation, a shared no-op when nothing is collected
+    :param name: str
+    :return: context manager
+    """
+    stats = getattr(_state, 'stats', None)
+    if stats is None:
+        return _DISABLED
+    return _Stage(stats, name)
+
+
+def count(name, amount=1):
+    """
+    Adds amount to a counter of the collected statistics, does nothing when nothing is collected
+    :param name: str
+    :param amount: int
+    :return:
+    """
+    stats = getattr(_state, 'stats', None)
+    if stats is not None:
+        stats.counters[name] = stats.counters.get(name, 0) + amount
+
+
+def _keep_peak(peaks, peak):
+    """
+    Raises the peak of an enclosing memory block, when there is one
+    """
+    if peaks is not None:
+        peaks[0] = max(peaks[0], peak)
+
+
+def _merge(outer, inner):
+    """
+    Adds the statistics of a nested instrument block to the enclosing one
+    """
+    for name, seconds in inner.timings.items():
+        outer.timings[name] = outer.timings.get(name, 0.0) + seconds
+    for name, amount in inner.counters.items():
+        outer.counters[name] = outer.counters.get(name, 0) + amount
@@ -1,9 +1,6 @@
-from valuation.binomial.binomial_option import BinaryOption
 from valuation.market_data import MarketData
 from valuation.option import Option
-from valuation.binomial.binary_tree import createTree
-from valuation.binomial.binary_tree import computeSt
-from valuation.binomial.binary_tree import computePayOff
+from valuation.pricing import price
 
 __author__ = 'Sarra Souissi'
 
@@ -14,7 +11,6 @@ if __name__ == '__main__':
     maturity = 0.75  # maturity date
     r = 0.05  # risk-less short rate
     volatility = 0.3  # volatility
-    steps = 3  # Steps
     style = 1
     asset = 1
     option_type = 2
@@ -38,10 +34,6 @@ if __name__ == '__main__':
     if str_volatility != "":
         volatility = float(str_volatility)
 
-    str_n = input("Steps (Default Value " + str(steps) + "): ")
-    if str_n != "":
-        steps = int(str_n)
-
     str_style = input("style (Default Value "+str(style)+"): [1: Europeen, 2: American] ")
     if str_style != "":
         style = int(str_style)
@@ -68,22 +60,10 @@ if __name__ == '__main__':
             rf = float(str_rf)
 
     marketData = MarketData(r, volatility)
-    option = Option(option_type, style, underlying_price, strike, maturity, volatility)
-
-    str_valuation_method = input("Valuation method [1:Binomial , 2: , 3: , 4: ]"
-                                 " (Default Value" + str(asset)+"): ")
-    if str_valuation_method == "1":
-        str_steps = input("Steps (Default Value " + str(steps) + "): ")
-        if str_steps != "":
-            steps = int(str_steps)
-
-        binomial_stock_option = BinaryOption(option_type, style, underlying_price, strike, maturity, volatility,
-                                             asset, marketData, steps)
-        root = createTree(steps, binomial_stock_option)
-        computeSt(root, binomial_stock_option, steps)
-        price = computePayOff(root, binomial_stock_option, steps)
-
-    print(price)
-
+    option = Option(option_type, style, underlying_price, strike, maturity, volatility, asset)
 
+    str_engine = input("Valuation engine [auto, bsm, lattice, cos, lewis, mc] (Default Value auto): ")
+    engine = str_engine if str_engine != "" else "auto"
 
+    values, errors, engines = price(option, marketData, engine)
+    print(str(values[0]) + " (" + engines[0] + ", error " + str(errors[0]) + ")")
@@ -1,5 +1,7 @@
 import numpy as np
 
+from valuation.volatility_surface import flat_volatility
+
 __author__ = "Olivier Lefebvre"
 
 
@@ -13,7 +15,8 @@ class MarketData:
         Default constructor
         :param r: float
         free-risk short rate (0.05 for example)
-        :param volatility: float
+        :param volatility: float or VolatilitySurface
+        flat volatility, or implied volatility surface looked up at the strike and maturity of each contract
         :param rho: float
         :param theta: float
         :param kappa: float
@@ -36,3 +39,12 @@ class MarketData:
             self.cholesky_matrix = np.linalg.cholesky(corr_mat)
         else:
             self.cholesky_matrix = None
+
+    def volatility_for(self, strike, maturity):
+        """
+        Volatility of contracts of the given strikes and maturities, read from the surface when volatility is one
+        :param strike: float or numpy array
+        :param maturity: float or numpy array
+        :return: float or numpy array
+        """
+        return flat_volatility(self.volatility, strike, maturity)
@@ -1,8 +1,19 @@
 __author__ = "Olivier Lefebvre"
-import matplotlib.pyplot as plt
+import copy
+import time
+
 import numpy as np
 
-from valuation.montecarlo import random_number_generator as rng
+from valuation import black_scholes_merton as bsm
+from valuation import instrumentation
+from valuation.montecarlo import regression
+from valuation.montecarlo.random_number_generator import RandomNumberGenerator as rng
+from valuation.montecarlo.running_statistics import RunningStatistics
+from valuation.option import Option
+
+SCHEMES = ('qe', 'euler')
+# switching level of the quadratic-exponential scheme between its two approximations of the variance
+PSI_CRITICAL = 1.5
 
 
 class MonteCarloSimulation:
@@ -10,14 +21,33 @@ class MonteCarloSimulation:
     Class responsible for Monte Carlo simulation
     """
 
-    def __init__(self, option, market_data, stochastic_volatility=False, time_intervals=50, paths=50000):
+    def __init__(self, option, market_data, stochastic_volatility=False, time_intervals=50, paths=50000,
+                 scheme='qe', dtype=np.float64, normal_pool=None, random_state=None):
         """
         Class default constructor
         :param option: Option
         :param market_data: MarketData
         :param stochastic_volatility: bool
+        Heston model: the variance follows a square-root diffusion starting at volatility ** 2, with
+        mean reversion speed kappa, long-run variance theta, volatility of variance std_volatility and
+        correlation rho to the underlying
         :param time_intervals: int
+        number of dates of the simulation grid, from 0 to the option's maturity included
         :param paths: int
+        :param scheme: str
+        discretization of the Heston model, 'qe' (Andersen quadratic-exponential with martingale
+        correction) or 'euler' (full truncation Euler, which needs many more dates)
+        :param dtype: numpy dtype
+        precision of the random numbers and paths, np.float32 halves the memory and bandwidth used
+        (and doubles the paths that fit in memory) for a relative accuracy of about 1e-6 on the paths
+        :param normal_pool: numpy array or str
+        standard normals to build the stored paths from instead of drawing them, typically a pool from
+        RandomNumberGenerator.generate_normal_pool or its file name. Valuations sharing a pool use common
+        random numbers, so that their differences are smooth. The number of paths and the precision are
+        then those of the pool.
+        :param random_state: numpy.random.Generator
+        stream the stored paths are drawn from, see RandomNumberGenerator.create_generator, the global
+        numpy.random state is used when None
         :return:
         """
         self.option = option
@@ -25,17 +55,55 @@ class MonteCarloSimulation:
         self.stochastic_volatility = stochastic_volatility
         self.time_intervals = time_intervals
         self.paths = paths
+        self.scheme = scheme
+        self.dtype = dtype
+        self.random_state = random_state
+        self.normal_pool = rng.load_normal_pool(normal_pool) if isinstance(normal_pool, str) else normal_pool
+        if self.normal_pool is not None:
+            self.paths = self.normal_pool.shape[-1]
+            self.dtype = self.normal_pool.dtype
         self.gbm_paths = None
         self.srd_paths = None
+        self.rn_set_brownian = 0
+        self.rn_set_volatility = 1
 
         if stochastic_volatility:
             if market_data.rho is None or market_data.cholesky_matrix is None or market_data.theta is None \
                     or market_data.kappa is None:
                 print("Error parsing market data.")
             else:
-                self.random_numbers = rng.generate_standard_normal(2, self.time_intervals, self.paths)
-                self.rn_set_brownian = 0
-                self.rn_set_volatility = 1
+                self.random_numbers = self._stored_random_numbers(2)
+
+    def _stored_random_numbers(self, sets):
+        """
+        Standard normals of the stored paths, taken from the normal pool when there is one
+        :param sets: int
+        :return: numpy array
+        (time_intervals, paths) for one set, (sets, time_intervals, paths) otherwise
+        """
+        if self.normal_pool is None:
+            with instrumentation.stage('random_numbers'):
+                return rng.generate_standard_normal(sets, self.time_intervals, self.paths,
+                                                    random_state=self.random_state, dtype=self.dtype)
+        pool = self.normal_pool if self.normal_pool.ndim == 3 else self.normal_pool[np.newaxis]
+        if pool.shape[0] < sets or pool.shape[1] != self.time_intervals:
+            raise ValueError("the normal pool needs " + str(sets) + " sets of " + str(self.time_intervals) +
+                             " dates, it has shape " + str(pool.shape))
+        return pool[0] if sets == 1 else pool[:sets]
+
+    def _volatility(self):
+        """
+        Volatility of the option, read at its strike and maturity when the market data holds a surface
+        :return: float
+        """
+        return self.market_data.volatility_for(self.option.strike, self.option.maturity)
+
+    def time_step(self):
+        """
+        Length of one interval of the simulation grid
+        :return: float
+        """
+        return self.option.maturity / (self.time_intervals - 1)
 
     def generate_geometric_brownian_motion_paths(self):
         """
@@ -43,32 +111,121 @@ class MonteCarloSimulation:
         to model the option's underlying's movement
         :return:
         """
-        # array initialization for path simulation
-        paths = np.zeros((self.time_intervals, self.paths))
-        # initialize first date with initial value
-        paths[0] = self.option.underlying_price
-        # if the stochastic volatility is taken into consideration, generate square root diffusion paths for it and
-        # select previously generated random numbers for correlation
+        # if the stochastic volatility is taken into consideration, the variance paths are generated
+        # along with the underlying ones from the previously generated random numbers
         if self.stochastic_volatility is False:
-            random_numbers = rng.generate_standard_normal(1, self.time_intervals, self.paths)
+            random_numbers = self._stored_random_numbers(1)
+            with instrumentation.stage('paths'):
+                self.gbm_paths = self._geometric_brownian_motion_paths(random_numbers,
+                                                                       overwrite=self.normal_pool is None)
         else:
-            random_numbers = self.random_numbers
-            self.generate_square_root_diffusion_paths()
+            with instrumentation.stage('paths'):
+                self.gbm_paths, self.srd_paths = self._heston_paths(self.random_numbers)
+        instrumentation.count('paths', self.paths)
 
-        dt = self.option.maturity / self.time_intervals
-        for t in range(1, self.time_intervals):
-            # select the right time slice from the relevant random number set and the right volatility
-            if self.stochastic_volatility is False:
-                ran = random_numbers[t]
-                volatility = self.market_data.volatility
-            else:
+    def _geometric_brownian_motion_paths(self, random_numbers, overwrite=False):
+        """
+        Builds geometric brownian motion paths with constant volatility from given random numbers, in log
+        space: the log increments of all the dates are computed at once, summed cumulatively in place and
+        exponentiated once
+        :param random_numbers: numpy array
+        (time_intervals, paths) standard normals, the paths having the same precision
+        :param overwrite: bool
+        build the paths in the memory of random_numbers, which are then lost
+        :return: numpy array
+        (time_intervals, paths) underlying prices
+        """
+        paths = random_numbers if overwrite else np.empty(random_numbers.shape, dtype=random_numbers.dtype)
+        dt = self.time_step()
+        volatility = self._volatility()
+        np.multiply(random_numbers[1:], volatility * np.sqrt(dt), out=paths[1:])
+        paths[1:] += (self.market_data.r - 0.5 * volatility ** 2) * dt
+        # initialize first date with initial value
+        paths[0] = np.log(self.option.underlying_price)
+        np.cumsum(paths, axis=0, out=paths)
+        return np.exp(paths, out=paths)
+
+    def _heston_paths(self, random_numbers):
+        """
+        Builds the underlying and variance paths of the Heston model together, date by date, so that the
+        random numbers of each date are drawn and correlated once for both processes
+        :param random_numbers: numpy array
+        (2, time_intervals, paths) standard normals
+        :return: tuple (numpy array, numpy array)
+        (time_intervals, paths) underlying prices and variances
+        """
+        if self.scheme not in SCHEMES:
+            raise ValueError("scheme must be one of " + str(SCHEMES))
+        kappa = self.market_data.kappa
+        theta = self.market_data.theta
+        sigma = self.market_data.std_volatility
+        rho = self.market_data.rho
+        dt = self.time_step()
+
+        log_paths = np.zeros(random_numbers.shape[-2:], dtype=random_numbers.dtype)
+        variances = np.zeros_like(log_paths)
+        log_paths[0] = np.log(self.option.underlying_price)
+        variances[0] = self._volatility() ** 2
+
+        if self.scheme == 'euler':
+            for t in range(1, self.time_intervals):
                 ran = np.dot(self.market_data.cholesky_matrix, random_numbers[:, t, :])
-                ran = ran[self.rn_set_brownian]
-                volatility = self.srd_paths[t]
-            # step computation
-            paths[t] = paths[t - 1] * np.exp((self.market_data.r - 0.5 * volatility ** 2) * dt +
-                                             volatility * np.sqrt(dt) * ran)
-        self.gbm_paths = paths
+                # full truncation: the negative part of the variance is ignored in the drift and diffusion
+                variance = np.maximum(0, variances[t - 1])
+                log_paths[t] = (log_paths[t - 1] + (self.market_data.r - 0.5 * variance) * dt +
+                                np.sqrt(variance * dt) * ran[self.rn_set_brownian])
+                variances[t] = (variances[t - 1] + kappa * (theta - variance) * dt +
+                                sigma * np.sqrt(variance * dt) * ran[self.rn_set_volatility])
+            return np.exp(log_paths), np.maximum(0, variances)
+
+        # Andersen (2008): the variance is drawn from moment-matched approximations of its exact
+        # transition, the correlation enters the log-price step through the variance increment (central
+        # discretization of the integrated variance), leaving an independent normal for the underlying
+        decay = np.exp(-kappa * dt)
+        k0 = -rho * kappa * theta * dt / sigma
+        k1 = 0.5 * dt * (kappa * rho / sigma - 0.5) - rho / sigma
+        k2 = 0.5 * dt * (kappa * rho / sigma - 0.5) + rho / sigma
+        k3 = 0.5 * dt * (1 - rho ** 2)
+        a = k2 + 0.5 * k3
+        for t in range(1, self.time_intervals):
+            variance = variances[t - 1]
+            mean = theta + (variance - theta) * decay
+            square_deviation = (variance * sigma ** 2 * decay * (1 - decay) / kappa +
+                                theta * sigma ** 2 * (1 - decay) ** 2 / (2 * kappa))
+            psi = square_deviation / mean ** 2
+            ran = random_numbers[self.rn_set_volatility, t]
+            quadratic = psi <= PSI_CRITICAL
+            exponential = ~quadratic
+            # martingale corrected k0, so that the discounted underlying has the right expectation
+            shift = np.full_like(variance, k0)
+            corrected = np.zeros_like(variance, dtype=bool)
+
+            # quadratic branch: scaled non-central chi-square with one degree of freedom
+            inverse_psi = 2 / psi[quadratic]
+            b2 = inverse_psi - 1 + np.sqrt(inverse_psi * (inverse_psi - 1))
+            scale = mean[quadratic] / (1 + b2)
+            variances[t, quadratic] = scale * (np.sqrt(b2) + ran[quadratic]) ** 2
+            valid = a * scale < 0.5
+            corrected[quadratic] = valid
+            shift[np.flatnonzero(quadratic)[valid]] = (-a * b2[valid] * scale[valid] / (1 - 2 * a * scale[valid]) +
+                                                       0.5 * np.log(1 - 2 * a * scale[valid]))
+
+            # exponential branch: probability mass at zero and exponential tail, drawn by inversion of the
+            # uniform N(ran), 1 - N(ran) being computed as N(-ran)
+            p = (psi[exponential] - 1) / (psi[exponential] + 1)
+            beta = (1 - p) / mean[exponential]
+            tail = bsm.N(-ran[exponential])
+            variances[t, exponential] = np.where(tail < 1 - p, np.log((1 - p) / np.maximum(tail, 1e-300)) / beta, 0)
+            valid = beta > a
+            corrected[exponential] = valid
+            shift[np.flatnonzero(exponential)[valid]] = -np.log(p[valid] + beta[valid] * (1 - p[valid]) /
+                                                                (beta[valid] - a))
+
+            shift[corrected] -= (k1 + 0.5 * k3) * variance[corrected]
+            log_paths[t] = (log_paths[t - 1] + self.market_data.r * dt + shift + k1 * variance +
+                            k2 * variances[t] + np.sqrt(k3 * (variance + variances[t])) *
+                            random_numbers[self.rn_set_brownian, t])
+        return np.exp(log_paths), variances
 
     def generate_square_root_diffusion_paths(self):
         """
@@ -76,25 +233,33 @@ class MonteCarloSimulation:
         volatility's stochastic aspect
         :return:
         """
-        # array initialization with initial value
-        paths = np.zeros((self.time_intervals, self.paths))
-        paths_ = np.zeros_like(paths)
-        paths[0] = self.market_data.volatility
-        paths_[0] = self.market_data.volatility
-
         if self.stochastic_volatility is False:
-            random_numbers = rng.generate_standard_normal(1, self.time_intervals, self.paths)
+            random_numbers = self._stored_random_numbers(1)
+            with instrumentation.stage('variance_paths'):
+                self.srd_paths = self._square_root_diffusion_paths(random_numbers)
         else:
-            random_numbers = self.random_numbers
+            with instrumentation.stage('variance_paths'):
+                self.srd_paths = self._heston_paths(self.random_numbers)[1]
+        instrumentation.count('variance_paths', self.paths)
+
+    def _square_root_diffusion_paths(self, random_numbers):
+        """
+        Builds square-root diffusion paths of the volatility from given random numbers, without stochastic
+        volatility of the underlying (see _heston_paths otherwise)
+        :param random_numbers: numpy array
+        (time_intervals, paths) standard normals
+        :return: numpy array
+        (time_intervals, paths) volatility paths
+        """
+        # array initialization with initial value
+        paths = np.zeros(random_numbers.shape[-2:], dtype=random_numbers.dtype)
+        paths_ = np.zeros_like(paths)
+        paths[0] = self._volatility()
+        paths_[0] = self._volatility()
 
-        dt = self.option.maturity / self.time_intervals
+        dt = self.time_step()
         for t in range(1, self.time_intervals):
-            # select the right time slice from the relevant random number set
-            if self.stochastic_volatility is False:
-                ran = random_numbers[t]
-            else:
-                ran = np.dot(self.market_data.cholesky_matrix, random_numbers[:, t, :])
-                ran = ran[self.rn_set_volatility]
+            ran = random_numbers[t]
             # step computation
             # full truncation Euler discretization
             paths_[t] = (paths_[t - 1] + self.market_data.kappa *
@@ -102,103 +267,452 @@ class MonteCarloSimulation:
                          np.sqrt(np.maximum(0, paths_[t - 1, :])) * self.market_data.std_volatility *
                          np.sqrt(dt) * ran)
             paths[t] = np.maximum(0, paths_[t])
-        self.srd_paths = paths
+        return paths
 
-    def valuate_option(self, basic_functions=5):
+    def valuate_option(self, basic_functions=5, control_variate=None, drift_shift=None, basis='laguerre',
+                       out_of_sample=False):
         """
         Function to price an option based on the Monte Carlo simulation
         :param basic_functions: int
         the number of basic functions to use with the least square optimizer
-        :return:
+        :param basis: str
+        regression basis of the least square optimizer: 'laguerre', 'hermite' or 'monomial'
+        :param out_of_sample: bool
+        for American options, fit the exercise rule on an independent set of paths and apply it to the
+        simulated ones, which removes the high bias of reusing the same paths
+        :param control_variate: str
+        None, 'underlying' (discounted terminal underlying), 'european' (discounted European payoff
+        against its Black-Scholes-Merton value, for American options) or 'geometric_asian' (discounted
+        geometric average payoff against its closed form, for Asian options). The optimal coefficient is
+        estimated from the simulated paths. The last two need a constant volatility.
+        :param drift_shift: float or str
+        importance sampling for European and Asian options with constant volatility: every standard normal
+        increment is shifted by drift_shift and the values are reweighted by the likelihood ratio.
+        'auto' centres the terminal underlying on the strike, which suits deep out-of-the-money strikes.
+        :return: tuple (float, float, int)
+        price, standard error and number of paths used, the paths i and i + paths / 2 being averaged
+        pairwise for the standard error since they are antithetic
         """
-        if self.gbm_paths is None:
-            self.generate_geometric_brownian_motion_paths()
+        if not self._check_option():
+            return
+        if drift_shift is not None and (self.stochastic_volatility or self._is_american()):
+            print("Error: importance sampling needs a European or Asian option with constant volatility")
+            return
+        if control_variate in ('european', 'geometric_asian') and self.stochastic_volatility:
+            print("Error: the " + control_variate + " control variate needs a constant volatility")
+            return
 
-        if self.option.option_type == 'call':
-            h = np.maximum(self.gbm_paths - self.option.strike, 0)
-        elif self.option.option_type == 'put':
-            h = np.maximum(self.option.strike - self.gbm_paths, 0)
+        weights = None
+        if drift_shift is None:
+            if self.gbm_paths is None:
+                self.generate_geometric_brownian_motion_paths()
+            gbm_paths = self.gbm_paths
         else:
-            print("Error parsing option: option_type must be either 'call' or 'put'")
+            # shifted paths are not stored, they do not follow the risk-neutral dynamics
+            shift = self._importance_sampling_drift() if drift_shift == 'auto' else drift_shift
+            random_numbers = self._stored_random_numbers(1)
+            if self.normal_pool is not None:
+                random_numbers = np.array(random_numbers)
+            random_numbers[1:] += shift
+            gbm_paths = self._geometric_brownian_motion_paths(random_numbers)
+            # likelihood ratio of the original to the shifted normals along each path
+            weights = np.exp(-shift * np.sum(random_numbers[1:], axis=0) +
+                             0.5 * (self.time_intervals - 1) * shift ** 2)
+
+        coefficients = None
+        if out_of_sample and self._is_american():
+            _, coefficients = self._longstaff_schwartz(self._simulate_paths(self.paths), basic_functions, basis)
+        values = self._discounted_path_values(gbm_paths, basic_functions, basis, coefficients)
+        if weights is not None:
+            values = values * weights
+        half = len(values) // 2
+        samples = 0.5 * (values[:half] + values[half:2 * half])
+
+        if control_variate is not None:
+            control = self._control_variate(control_variate, gbm_paths)
+            if control is None:
+                return
+            control, expectation = control
+            if weights is not None:
+                control = control * weights
+            control = 0.5 * (control[:half] + control[half:2 * half])
+            # optimal coefficient Cov(Y, X) / Var(X)
+            covariance = np.cov(samples, control)
+            samples = samples - covariance[0, 1] / covariance[1, 1] * (control - expectation)
+
+        # MCS estimator
+        self.option.C0 = float(np.mean(samples))
+        return self.option.C0, float(np.std(samples, ddof=1) / np.sqrt(half)), 2 * half
+
+    def _control_variate(self, control_variate, gbm_paths):
+        """
+        Discounted control variate along each path and its known expectation
+        :param control_variate: str
+        :param gbm_paths: numpy array
+        :return: tuple (numpy array, float)
+        """
+        r = self.market_data.r
+        maturity = self.option.maturity
+        discount = np.exp(-r * maturity)
+        option_type = 1 if self._payoff_sign() == 1 else 2
+        if control_variate == 'underlying':
+            return discount * gbm_paths[-1], self.option.underlying_price
+        elif control_variate == 'european':
+            payoff = np.maximum(self._payoff_sign() * (gbm_paths[-1] - self.option.strike), 0)
+            return discount * payoff, float(bsm.BSM_value_array(self.option.underlying_price, self.option.strike,
+                                                                maturity, r, self._volatility(),
+                                                                option_type))
+        elif control_variate == 'geometric_asian':
+            average = np.exp(np.mean(np.log(gbm_paths[1:]), axis=0))
+            payoff = np.maximum(self._payoff_sign() * (average - self.option.strike), 0)
+            return discount * payoff, float(bsm.geometric_asian_value_array(
+                self.option.underlying_price, self.option.strike, maturity, r, self._volatility(),
+                self.time_intervals - 1, option_type))
+        print("Error parsing control variate: must be 'underlying', 'european' or 'geometric_asian'")
+
+    def _importance_sampling_drift(self):
+        """
+        Shift of every standard normal increment that moves the expected log of the terminal
+        underlying onto the log strike
+        :return: float
+        """
+        volatility = self._volatility()
+        maturity = self.option.maturity
+        steps = self.time_intervals - 1
+        log_distance = np.log(self.option.strike / self.option.underlying_price) - \
+            (self.market_data.r - 0.5 * volatility ** 2) * maturity
+        return log_distance / (volatility * np.sqrt(self.time_step()) * steps)
+
+    def valuate_option_streaming(self, target_std_error=None, time_budget=None, max_paths=10000000,
+                                 block_size=10000, basic_functions=5, pilot_paths=50000):
+        """
+        Function to price an option by simulating paths in fixed-size blocks and accumulating
+        running mean and variance, so that memory stays flat whatever the number of paths.
+        The simulation stops as soon as the standard error reaches target_std_error, the elapsed time
+        reaches time_budget or max_paths paths have been used. European options without stochastic
+        volatility only simulate the underlying at maturity. Antithetic paths are averaged pairwise
+        before being accumulated, so that the standard error accounts for their correlation.
+        The exercise rule of American options is fitted once on pilot_paths independent paths and applied
+        to every block, so that the estimate does not depend on block_size.
+        :param target_std_error: float
+        :param time_budget: float
+        in seconds
+        :param max_paths: int
+        :param block_size: int
+        number of paths simulated at once
+        :param basic_functions: int
+        the number of basic functions to use with the least square optimizer
+        :param pilot_paths: int
+        number of paths the exercise rule of American options is fitted on
+        :return: tuple (float, float, int)
+        price, standard error and number of paths used, the pilot paths excluded
+        """
+        if not self._check_option():
             return
 
-        if self.option.style == "european":
-            # MCS estimator
-            self.option.C0 = np.exp(-self.market_data.r * self.option.maturity) * np.sum(h[-1]) / self.paths
-        elif self.option.style == "american":
-            # LSM algorithm
-            V = np.copy(h)
-            dt = self.option.maturity / self.time_intervals
-            df = np.exp(-self.market_data.r * dt)
-            for t in range(self.time_intervals - 2, 0, - 1):
-                reg = np.polyfit(self.gbm_paths[t], V[t + 1] * df, basic_functions)
-                C = np.polyval(reg, self.gbm_paths[t])
-                V[t] = np.where(C > h[t], V[t + 1] * df, h[t])
-            # MCS estimator
-            self.option.C0 = df * np.sum(V[1]) / self.paths
+        statistics = RunningStatistics()
+        start = time.perf_counter()
+        coefficients = self._exercise_rule(pilot_paths, basic_functions, self.random_state)
+        while 2 * statistics.count < max_paths:
+            statistics.update(self._simulate_block(min(block_size, max_paths - 2 * statistics.count),
+                                                   basic_functions, self.random_state, coefficients))
+            if target_std_error is not None and statistics.std_error <= target_std_error:
+                break
+            if time_budget is not None and time.perf_counter() - start >= time_budget:
+                break
+        self.option.C0 = statistics.mean
+        return statistics.mean, statistics.std_error, 2 * statistics.count
+
+    def valuate_option_parallel(self, workers=None, seed=None, chunk_size=100000, basic_functions=5,
+                                bit_generator='pcg64', pilot_paths=50000):
+        """
+        Function to price an option by splitting self.paths paths across a pool of processes.
+        The paths are cut into chunks of fixed size, each drawing from its own stream spawned from
+        a numpy SeedSequence, and the chunk statistics are merged in chunk order. The same seed therefore
+        gives bit-identical prices whatever the number of workers. The exercise rule of American options is
+        fitted once, before the chunks are spawned, on pilot_paths paths drawn from a stream of its own, and
+        shipped to every chunk, so that the estimate does not depend on chunk_size.
+        :param workers: int
+        number of processes, all available cores when None, in-process simulation when 1
+        :param seed: int
+        entropy of the root SeedSequence, fresh entropy when None
+        :param chunk_size: int
+        number of paths simulated by one task
+        :param basic_functions: int
+        the number of basic functions to use with the least square optimizer
+        :param bit_generator: str
+        bit generator of the chunk streams, see RandomNumberGenerator.create_generator
+        :param pilot_paths: int
+        number of paths the exercise rule of American options is fitted on
+        :return: tuple (float, float, int)
+        price, standard error and number of paths used, the pilot paths excluded
+        """
+        if not self._check_option():
+            return
+
+        sizes = [chunk_size] * (self.paths // chunk_size)
+        if self.paths % chunk_size:
+            sizes.append(self.paths % chunk_size)
+        # the chunks keep the first streams whatever the option, the exercise rule is fitted on the last one
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes) + 1)
+        coefficients = self._exercise_rule(pilot_paths, basic_functions, rng.create_generator(seeds[-1],
+                                                                                               bit_generator))
+        # only the contract and model terms are shipped to the workers, not the simulated arrays
+        simulation = copy.copy(self)
+        simulation.gbm_paths = simulation.srd_paths = simulation.random_numbers = None
+        simulation.normal_pool = simulation.random_state = None
+        tasks = [(simulation, size, seed_sequence, basic_functions, bit_generator, coefficients)
+                 for size, seed_sequence in zip(sizes, seeds)]
+
+        if workers == 1:
+            chunks = [_simulate_chunk(task) for task in tasks]
         else:
-            print("Error parsing option: option_style must be either 'european' or 'american'")
+            # multiprocessing is only loaded when a pool is used
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = list(executor.map(_simulate_chunk, tasks))
+        statistics = RunningStatistics()
+        for chunk in chunks:
+            statistics.merge(chunk)
+        self.option.C0 = statistics.mean
+        return statistics.mean, statistics.std_error, 2 * statistics.count
+
+    def valuate_option_qmc(self, replications=16, seed=None, brownian_bridge=True, basic_functions=5):
+        """
+        Function to price an option by randomized quasi-Monte Carlo: every replication simulates
+        self.paths paths (rounded up to a power of two) from an independently scrambled Sobol sequence,
+        with Brownian bridge construction, for the underlying and for the square-root diffusion.
+        The error is estimated from the spread of the replication estimates.
+        :param replications: int
+        number of independent scramblings, at least 2
+        :param seed: int
+        entropy of the scramblings, fresh entropy when None
+        :param brownian_bridge: bool
+        :param basic_functions: int
+        the number of basic functions to use with the least square optimizer, per replication
+        :return: tuple (float, float, int)
+        price, standard error and number of paths used
+        """
+        if not self._check_option():
             return
 
-    def plot_paths_distribution(self, nb_bins=50, normed=True):
+        sets = 2 if self.stochastic_volatility else 1
+        estimates = np.empty(replications)
+        paths_used = 0
+        for i, seed_sequence in enumerate(np.random.SeedSequence(seed).spawn(replications)):
+            random_numbers = rng.generate_sobol_normal(sets, self.time_intervals, self.paths, brownian_bridge,
+                                                       np.random.default_rng(seed_sequence), self.dtype)
+            if self.stochastic_volatility:
+                gbm_paths = self._heston_paths(random_numbers)[0]
+            else:
+                gbm_paths = self._geometric_brownian_motion_paths(random_numbers, overwrite=True)
+            estimates[i] = np.mean(self._discounted_path_values(gbm_paths, basic_functions))
+            paths_used += gbm_paths.shape[1]
+        self.option.C0 = float(np.mean(estimates))
+        return self.option.C0, float(np.std(estimates, ddof=1) / np.sqrt(replications)), paths_used
+
+    @staticmethod
+    def valuate_book(book, market_data, stochastic_volatility=False, time_intervals=50, paths=50000, scheme='qe',
+                     dtype=np.float64, random_state=None, **valuation_parameters):
         """
-        Method to show distribution of paths final values
-        :return:
+        Function to price every contract of an OptionBook. The paths only depend on the underlying price,
+        the maturity and the volatility, so they are simulated once for each group of contracts sharing them
+        and only the payoffs (and exercise rules) are computed per distinct contract.
+        :param book: OptionBook
+        :param market_data: MarketData
+        :param stochastic_volatility: bool
+        :param time_intervals: int
+        :param paths: int
+        :param scheme: str
+        :param dtype: numpy dtype
+        :param random_state: numpy.random.Generator
+        see the class constructor
+        :param valuation_parameters:
+        keyword parameters of valuate_option
+        :return: tuple (numpy array, numpy array)
+        price and standard error of each contract, NaN for the contracts that could not be valued
         """
+        values = np.full(len(book), np.nan)
+        std_errors = np.full(len(book), np.nan)
+        volatilities = np.broadcast_to(market_data.volatility_for(book.strikes, book.maturities), (len(book),))
+        for _, index in book.groups((book.underlying_prices, book.maturities, volatilities)):
+            # duplicated contracts are valued once
+            distinct, inverse = book[index].factorize(('strike', 'option_type', 'style', 'asset'))
+            group_values = np.full(len(distinct[0]), np.nan)
+            group_std_errors = np.full(len(distinct[0]), np.nan)
+            simulation = None
+            for position, (strike, option_type, style, asset) in enumerate(zip(*[key.tolist() for key in distinct])):
+                option = Option(option_type, style, float(book.underlying_prices[index[0]]), strike,
+                                float(book.maturities[index[0]]), asset=asset)
+                if simulation is None:
+                    simulation = MonteCarloSimulation(option, market_data, stochastic_volatility, time_intervals,
+                                                      paths, scheme, dtype, random_state=random_state)
+                simulation.option = option
+                result = simulation.valuate_option(**valuation_parameters)
+                if result is not None:
+                    group_values[position], group_std_errors[position] = result[:2]
+            values[index] = group_values[inverse]
+            std_errors[index] = group_std_errors[inverse]
+        return values, std_errors
 
-        if normed:
-            ylabel="Normalized sum"
-        else:
-            ylabel="Sum"
-
-        plt.figure()
-        if self.stochastic_volatility:
-            plt.subplot(211)
-            plt.hist(self.gbm_paths[-1], nb_bins, normed=normed, histtype='bar', rwidth=0.8)
-            plt.ylabel(ylabel)
-            plt.title("Final underlying value of simulated Monte Carlo paths (geometric brownian motion)")
-
-            plt.subplot(212)
-            plt.hist(self.srd_paths[-1], nb_bins, normed=normed, histtype='bar',rwidth=0.8)
-            plt.ylabel(ylabel)
-            plt.xlabel("Path final value")
-            plt.title("Final volatility value of simulated Monte Carlo paths (square-root diffusion)")
+    def _simulate_block(self, number_paths, basic_functions=5, random_state=None, coefficients=None):
+        """
+        Simulates a block of antithetic paths and returns their discounted values averaged pairwise
+        :param number_paths: int
+        :param basic_functions: int
+        :param random_state: numpy.random.Generator
+        stream to draw from, the global numpy.random state is used when None
+        :param coefficients: list
+        exercise rule of American options, see _exercise_rule, fitted on the block itself when None
+        :return: numpy array
+        """
+        number_paths = max(2, number_paths - number_paths % 2)
+        if self._is_european() and not self.stochastic_volatility:
+            # the terminal value of a geometric brownian motion can be drawn in one step
+            instrumentation.count('paths', number_paths)
+            ran = rng.generate_standard_normal(1, 1, number_paths, moment_matching=False,
+                                               random_state=random_state, dtype=self.dtype)[0]
+            volatility = self._volatility()
+            maturity = self.option.maturity
+            underlying = self.option.underlying_price * np.exp(
+                (self.market_data.r - 0.5 * volatility ** 2) * maturity + volatility * np.sqrt(maturity) * ran)
+            values = np.exp(-self.market_data.r * maturity) * np.maximum(
+                self._payoff_sign() * (underlying - self.option.strike), 0)
         else:
-            plt.hist(self.gbm_paths[-1], nb_bins, normed=normed, histtype='bar', rwidth=0.8)
-            plt.ylabel(ylabel)
-            plt.xlabel("Path final value")
-            plt.title("Final underlying value of simulated Monte Carlo paths (geometric brownian motion)")
-        plt.draw()
+            gbm_paths = self._simulate_paths(number_paths, random_state, moment_matching=False)
+            values = self._discounted_path_values(gbm_paths, basic_functions, coefficients=coefficients)
+        half = number_paths // 2
+        return 0.5 * (values[:half] + values[half:])
+
+    def _exercise_rule(self, pilot_paths, basic_functions=5, random_state=None):
+        """
+        Longstaff-Schwartz regressions of an American option fitted on pilot paths, to be applied out of sample
+        to independent blocks: fitting each block on itself gives a high bias that more blocks do not reduce
+        :param pilot_paths: int
+        :param basic_functions: int
+        :param random_state: numpy.random.Generator
+        :return: list
+        regressions of each date, None for the other styles
+        """
+        if not self._is_american():
+            return None
+        return self._longstaff_schwartz(self._simulate_paths(pilot_paths, random_state), basic_functions)[1]
+
+    def _simulate_paths(self, number_paths, random_state=None, moment_matching=True):
+        """
+        Simulates a fresh set of antithetic underlying paths, through the Heston model with
+        stochastic volatility, without storing them
+        :param number_paths: int
+        :param random_state: numpy.random.Generator
+        :param moment_matching: bool
+        :return: numpy array
+        """
+        instrumentation.count('paths', number_paths)
+        with instrumentation.stage('random_numbers'):
+            random_numbers = rng.generate_standard_normal(2 if self.stochastic_volatility else 1, self.time_intervals,
+                                                          number_paths, moment_matching=moment_matching,
+                                                          random_state=random_state, dtype=self.dtype)
+        with instrumentation.stage('paths'):
+            if self.stochastic_volatility:
+                return self._heston_paths(random_numbers)[0]
+            return self._geometric_brownian_motion_paths(random_numbers, overwrite=True)
+
+    def _discounted_path_values(self, gbm_paths, basic_functions=5, basis='laguerre', coefficients=None):
+        """
+        Discounted value of the option along each simulated path, early exercise being decided by the
+        Longstaff-Schwartz least square regression for American options
+        :param gbm_paths: numpy array
+        :param basic_functions: int
+        :param basis: str
+        :param coefficients: list
+        regressions defining the exercise rule, fitted on gbm_paths when None
+        :return: numpy array
+        """
+        if self._is_asian():
+            # arithmetic average over the simulation dates following time 0
+            with instrumentation.stage('payoff'):
+                average = np.mean(gbm_paths[1:], axis=0)
+                return np.exp(-self.market_data.r * self.option.maturity) * np.maximum(
+                    self._payoff_sign() * (average - self.option.strike), 0)
+        if self._is_european():
+            with instrumentation.stage('payoff'):
+                return np.exp(-self.market_data.r * self.option.maturity) * np.maximum(
+                    self._payoff_sign() * (gbm_paths[-1] - self.option.strike), 0)
+        # LSM algorithm
+        return self._longstaff_schwartz(gbm_paths, basic_functions, basis, coefficients)[0]
+
+    def _longstaff_schwartz(self, gbm_paths, basic_functions=5, basis='laguerre', coefficients=None):
+        """
+        Runs the Longstaff-Schwartz regression over the given paths
+        :return: tuple (numpy array, list)
+        discounted path values and regressions of each date
+        """
+        instrumentation.count('regressions', gbm_paths.shape[0] - 2)
+        with instrumentation.stage('regression'):
+            return regression.longstaff_schwartz(gbm_paths, self.option.strike, self._payoff_sign(),
+                                                 np.exp(-self.market_data.r * self.time_step()), basic_functions,
+                                                 basis, coefficients=coefficients)
+
+    def _payoff_sign(self):
+        """
+        1 for calls, -1 for puts (option_type 1 or 'call', 2 or 'put'), None otherwise
+        :return: int
+        """
+        if self.option.option_type in (1, 'call'):
+            return 1
+        elif self.option.option_type in (2, 'put'):
+            return -1
+        return None
+
+    def _is_european(self):
+        return self.option.style in (1, 'european')
+
+    def _is_american(self):
+        return self.option.style in (2, 'american')
+
+    def _is_asian(self):
+        return self.option.style in (3, 'asian')
+
+    def _check_option(self):
+        """
+        Checks that the option type and style can be simulated, printing the error otherwise
+        :return: bool
+        """
+        if self._payoff_sign() is None:
+            print("Error parsing option: option_type must be either 'call' or 'put'")
+            return False
+        if not (self._is_european() or self._is_american() or self._is_asian()):
+            print("Error parsing option: option_style must be either 'european', 'american' or 'asian'")
+            return False
+        return True
+
+    def plot_paths_distribution(self, nb_bins=50, normed=True):
+        """
+        Method to show distribution of paths final values, see visualization.plot_paths_distribution
+        :return:
+        """
+        from valuation import visualization
+        visualization.plot_paths_distribution(self, nb_bins, normed)
 
     def plot_paths_graphs(self, nb_paths=10):
         """
-        Function to show path motion in graphs
+        Function to show path motion in graphs, see visualization.plot_paths_graphs
         :param nb_paths: int
         number of paths to show
         :return:
         """
-        plt.figure()
-        if self.stochastic_volatility:
-            sub1 = plt.subplot(211)
-            plt.plot(np.arange(0, self.option.maturity, self.option.maturity / self.time_intervals),
-                     self.gbm_paths[:, :nb_paths])
-            plt.grid(True)
-            plt.ylabel("Underlying price")
-            plt.title("Simulated Monte Carlo paths for underlying (geometric brownian motion)")
-            plt.setp(sub1.get_xticklabels(), visible=False)
-            plt.subplot(212)
-            plt.plot(np.arange(0, self.option.maturity, self.option.maturity / self.time_intervals),
-                     self.srd_paths[:, :nb_paths])
-            plt.axhline(self.market_data.theta, color='r', ls='--', lw=2.0)
-            plt.grid(True)
-            plt.ylabel("Volatility")
-            plt.xlabel("Time (years)")
-            plt.title("Simulated Monte Carlo paths for volatility (square-root diffusion)")
-        else:
-            plt.plot(np.arange(0, self.option.maturity, self.option.maturity / self.time_intervals),
-                     self.gbm_paths[:, :nb_paths])
-            plt.grid(True)
-            plt.ylabel("Underlying price")
-            plt.xlabel("Time (years)")
-            plt.title("Simulated Monte Carlo paths for underlying (geometric brownian motion)")
-        plt.draw()
+        from valuation import visualization
+        visualization.plot_paths_graphs(self, nb_paths)
+
+
+def _simulate_chunk(task):
+    """
+    Worker of MonteCarloSimulation.valuate_option_parallel, simulating one chunk of paths from its own stream
+    :param task: tuple (MonteCarloSimulation, int, numpy.random.SeedSequence, int, str, list)
+    :return: RunningStatistics
+    """
+    simulation, number_paths, seed_sequence, basic_functions, bit_generator, coefficients = task
+    statistics = RunningStatistics()
+    statistics.update(simulation._simulate_block(number_paths, basic_functions,
+                                                 rng.create_generator(seed_sequence, bit_generator), coefficients))
+    return statistics
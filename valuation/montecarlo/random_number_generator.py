@@ -1,14 +1,37 @@
 __author__ = "Olivier Lefebvre"
 
+import math
+
 import numpy as np
 
+BIT_GENERATORS = {'pcg64': np.random.PCG64, 'philox': np.random.Philox, 'sfc64': np.random.SFC64,
+                  'mt19937': np.random.MT19937}
+
 
 class RandomNumberGenerator:
     """
     Class to generate random number.
     """
     @staticmethod
-    def generate_standard_normal(sets, time_intervals, number_paths, anti_paths=True, moment_matching=True):
+    def create_generator(seed=None, bit_generator='pcg64'):
+        """ Function to create an independent random stream on the chosen bit generator.
+        Parameters
+        ==========
+        seed : int or numpy.random.SeedSequence
+        fresh entropy when None
+        bit_generator : str
+        'pcg64', 'philox' (counter-based, cheap to split across processes), 'sfc64' or 'mt19937'
+        Returns
+        =======
+        numpy.random.Generator
+        """
+        if bit_generator not in BIT_GENERATORS:
+            raise ValueError("bit_generator must be one of " + str(sorted(BIT_GENERATORS)))
+        return np.random.Generator(BIT_GENERATORS[bit_generator](seed))
+
+    @staticmethod
+    def generate_standard_normal(sets, time_intervals, number_paths, anti_paths=True, moment_matching=True,
+                                 random_state=None, dtype=np.float64):
         """ Function to generate random numbers following a standard normal distribution.
         Parameters
         ==========
@@ -22,16 +45,182 @@ class RandomNumberGenerator:
         use of antithetic variates
         moment_matching : Boolean
         use of moment matching
+        random_state : numpy.random.Generator
+        independent stream to draw from, the global numpy.random state is used when None
+        dtype : numpy dtype
+        float64, or float32 to halve the memory used
         """
         if anti_paths is True:
-            sn = np.random.standard_normal((sets, time_intervals, number_paths / 2))
+            shape = (sets, time_intervals, number_paths // 2)
+        else:
+            shape = (sets, time_intervals, number_paths)
+        if random_state is None and np.dtype(dtype) != np.float64:
+            # the global state only draws float64, whose temporary would be larger than the float32 numbers:
+            # draw them from a stream seeded by the global state, which keeps numpy.random.seed reproducible
+            random_state = RandomNumberGenerator.create_generator(int(np.random.randint(np.iinfo(np.int64).max,
+                                                                                        dtype=np.int64)))
+        if random_state is None:
+            sn = np.random.standard_normal(shape)
+        else:
+            sn = random_state.standard_normal(shape, dtype=dtype)
+        if anti_paths is True:
             sn = np.concatenate((sn, -sn), axis=2)
+        if moment_matching is True:
+            sn -= np.mean(sn)
+            sn /= np.std(sn)
+        if sets == 1:
+            return sn[0]
         else:
-            sn = np.random.standard_normal((sets, time_intervals, number_paths))
+            return sn
+
+    @staticmethod
+    def generate_normal_pool(filename, sets, time_intervals, number_paths, anti_paths=True, moment_matching=True,
+                             random_state=None, dtype=np.float64, block_paths=65536):
+        """ Function to generate random numbers following a standard normal distribution, with the layout
+        of generate_standard_normal, straight into a .npy file. The paths are drawn block by block so that
+        pools larger than memory can be built, and moment matching is done once here rather than at every
+        valuation. The pool is returned memory-mapped read-only, see load_normal_pool.
+        Parameters
+        ==========
+        filename : str
+        .npy file to create
+        sets : int
+        number of different set of random variables to be generated
+        time_intervals : int
+        number of time intervals for discretization
+        number_paths : int
+        number of paths to be simulated
+        anti_paths: Boolean
+        use of antithetic variates, the path i + number_paths / 2 mirroring the path i
+        moment_matching : Boolean
+        use of moment matching
+        random_state : numpy.random.Generator
+        stream to draw from, a fresh PCG64 stream when None
+        dtype : numpy dtype
+        block_paths : int
+        number of paths drawn at once
+        """
+        if random_state is None:
+            random_state = RandomNumberGenerator.create_generator()
+        drawn = number_paths // 2 if anti_paths is True else number_paths
+        total_paths = 2 * drawn if anti_paths is True else drawn
+        pool = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=(sets, time_intervals, total_paths))
+        total = 0.0
+        total_square = 0.0
+        for start in range(0, drawn, block_paths):
+            stop = min(start + block_paths, drawn)
+            sn = random_state.standard_normal((sets, time_intervals, stop - start), dtype=dtype)
+            pool[:, :, start:stop] = sn
+            if anti_paths is True:
+                pool[:, :, drawn + start:drawn + stop] = -sn
+            else:
+                total += float(np.sum(sn, dtype=np.float64))
+            total_square += float(np.sum(np.square(sn, dtype=np.float64)))
         if moment_matching is True:
-            sn = sn - np.mean(sn)
-            sn = sn / np.std(sn)
+            # the antithetic half doubles the sum of squares and cancels the sum
+            count = float(pool.size)
+            mean = total / count
+            std = math.sqrt(total_square * total_paths / drawn / count - mean ** 2)
+            for start in range(0, total_paths, block_paths):
+                sn = pool[:, :, start:start + block_paths]
+                sn -= mean
+                sn /= std
+        pool.flush()
+        del pool
+        return RandomNumberGenerator.load_normal_pool(filename)
+
+    @staticmethod
+    def load_normal_pool(filename):
+        """ Function to map a pool written by generate_normal_pool, read-only and without loading it, so
+        that valuations can share it as common random numbers.
+        Parameters
+        ==========
+        filename : str
+        Returns
+        =======
+        numpy.memmap of shape (sets, time_intervals, number_paths), or (time_intervals, number_paths)
+        when there is a single set
+        """
+        sn = np.load(filename, mmap_mode='r')
+        if sn.shape[0] == 1:
+            return sn[0]
+        else:
+            return sn
+
+    @staticmethod
+    def generate_sobol_normal(sets, time_intervals, number_paths, brownian_bridge=True, random_state=None,
+                              dtype=np.float64):
+        """ Function to generate quasi-random numbers following a standard normal distribution from a
+        scrambled Sobol sequence, with the same layout as generate_standard_normal. The first slice of the
+        time axis is left at zero since paths start at a known value.
+        With brownian_bridge, the Sobol dimensions are spent on a Brownian bridge: the first dimensions
+        of every set decide the terminal value, the next ones the midpoints and so on, so that the best
+        distributed coordinates drive the largest part of the path variance. The numbers returned are
+        the normalized increments of the bridged path.
+        Parameters
+        ==========
+        sets : int
+        number of different set of random variables to be generated
+        time_intervals : int
+        number of dates of the discretization, the first one included
+        number_paths : int
+        number of paths to be simulated, rounded up to a power of two since only such sets of
+        Sobol points are balanced
+        brownian_bridge : Boolean
+        use of the Brownian bridge construction
+        random_state : numpy.random.Generator or int
+        seed of the scrambling
+        dtype : numpy dtype
+        float64, or float32 to halve the memory used
+        """
+        from scipy.special import ndtri
+        from scipy.stats import qmc
+
+        steps = time_intervals - 1
+        points = qmc.Sobol(sets * steps, scramble=True, seed=random_state).random_base2(
+            int(math.ceil(math.log(number_paths, 2))))
+        # dimension k * sets + s feeds the k-th normal of set s
+        normals = ndtri(np.clip(points, 1e-12, 1 - 1e-12)).T.reshape(steps, sets, -1).transpose(1, 0, 2)
+        if brownian_bridge:
+            normals = RandomNumberGenerator.brownian_bridge_increments(normals)
+
+        sn = np.zeros((sets, time_intervals, normals.shape[2]), dtype=dtype)
+        sn[:, 1:, :] = normals
         if sets == 1:
             return sn[0]
         else:
             return sn
+
+    @staticmethod
+    def brownian_bridge_increments(normals):
+        """ Function turning independent standard normals into the increments of a Brownian path built
+        by Brownian bridge on a uniform grid.
+        Parameters
+        ==========
+        normals : numpy array
+        (..., steps, paths) standard normals, consumed in order along the steps axis: the first one
+        fixes the terminal value, the following ones the successive midpoints
+        Returns
+        =======
+        (..., steps, paths) standard normal increments of the path, step by step
+        """
+        steps = normals.shape[-2]
+        path = np.zeros(normals.shape[:-2] + (steps + 1,) + normals.shape[-1:])
+        path[..., steps, :] = math.sqrt(steps) * normals[..., 0, :]
+        intervals = [(0, steps)]
+        k = 1
+        # breadth-first refinement, coarse intervals first
+        while intervals:
+            refined = []
+            for left, right in intervals:
+                if right - left < 2:
+                    continue
+                middle = (left + right) // 2
+                path[..., middle, :] = (((right - middle) * path[..., left, :] + (middle - left) * path[..., right, :]) /
+                                        float(right - left) +
+                                        math.sqrt((middle - left) * (right - middle) / float(right - left)) *
+                                        normals[..., k, :])
+                k += 1
+                refined += [(left, middle), (middle, right)]
+            intervals = refined
+        return np.diff(path, axis=-2)
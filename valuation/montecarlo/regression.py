@@ -0,0 +1,123 @@
+import numpy as np
+from numpy.polynomial import hermite_e, polynomial
+
+BASES = ('laguerre', 'hermite', 'monomial')
+
+
+def basis_matrix(x, degree, basis='laguerre', center=None, scale=None):
+    """
+    Function evaluating the regression basis on the normalized state variable
+    :param x: numpy array
+    state variable, the underlying price divided by the strike
+    :param degree: int
+    highest degree of the basis functions
+    :param basis: str
+    'laguerre' (weighted Laguerre polynomials exp(-x / 2) L_n(x) as in Longstaff-Schwartz),
+    'hermite' (probabilists' Hermite polynomials of the standardized state) or
+    'monomial' (powers of the standardized state)
+    :param center: float
+    :param scale: float
+    standardization of the state for the Hermite and monomial bases, taken from x when None
+    :return: tuple (numpy array, float, float)
+    (len(x), degree + 1) design matrix, center and scale used
+    """
+    if basis == 'laguerre':
+        # three-term recurrence (n + 1) L_n+1 = (2n + 1 - x) L_n - n L_n-1, one contiguous row per function
+        columns = np.empty((degree + 1, len(x)))
+        columns[0] = np.exp(-0.5 * x)
+        if degree > 0:
+            columns[1] = columns[0] * (1 - x)
+        for n in range(1, degree):
+            columns[n + 1] = ((2 * n + 1 - x) * columns[n] - n * columns[n - 1]) / (n + 1)
+        return columns.T, None, None
+    # standardizing keeps the powers of the state in the same range, which conditions the fit
+    if center is None:
+        center = np.mean(x)
+        scale = max(np.std(x), 1e-12)
+    z = (x - center) / scale
+    if basis == 'hermite':
+        return hermite_e.hermevander(z, degree), center, scale
+    elif basis == 'monomial':
+        return polynomial.polyvander(z, degree), center, scale
+    raise ValueError("basis must be one of " + str(BASES))
+
+
+def least_squares(design, y, sketch_rows=1000):
+    """
+    Function solving the linear least squares problem with a preconditioned QR approach.
+    The R factor of a Householder QR on an evenly spaced subset of the rows is used as a right
+    preconditioner: the preconditioned design is then well conditioned (whatever the conditioning of
+    the basis) and its small normal equations are solved directly, which only needs matrix products
+    over all the paths. A full Householder QR is used when the subset does not have full rank.
+    :param design: numpy array
+    :param y: numpy array
+    :param sketch_rows: int
+    approximate number of rows used to build the preconditioner
+    :return: numpy array
+    coefficients
+    """
+    rows, columns = design.shape
+    r = np.linalg.qr(design[::max(rows // sketch_rows, 1)], mode='r')
+    diagonal = np.abs(np.diag(r))
+    if len(diagonal) == columns and diagonal.min() > columns * np.finfo(float).eps * diagonal.max():
+        preconditioner = np.linalg.inv(r)
+        preconditioned = np.dot(design, preconditioner)
+        gram = np.dot(preconditioned.T, preconditioned)
+        try:
+            return np.dot(preconditioner, np.linalg.solve(gram, np.dot(preconditioned.T, y)))
+        except np.linalg.LinAlgError:
+            pass
+    q, r = np.linalg.qr(design)
+    return np.linalg.lstsq(r, np.dot(q.T, y), rcond=None)[0]
+
+
+def longstaff_schwartz(gbm_paths, strike, payoff_sign, discount, degree=5, basis='laguerre', itm_only=True,
+                       coefficients=None):
+    """
+    Function applying the Longstaff-Schwartz algorithm backwards over the simulation dates, keeping a
+    single vector of path values. The continuation value is regressed on the paths that are in the
+    money only (unless itm_only is False), since the others are never exercised.
+    When coefficients are given, no regression is done and the exercise rule they define is applied,
+    which gives a low-biased out-of-sample estimate on paths independent from the ones they were fitted on.
+    :param gbm_paths: numpy array
+    (time_intervals, paths) underlying prices
+    :param strike: float
+    :param payoff_sign: int
+    1 for calls, -1 for puts
+    :param discount: float
+    discount factor of one interval
+    :param degree: int
+    :param basis: str
+    :param itm_only: bool
+    :param coefficients: list
+    regressions of each date, as returned by a previous call
+    :return: tuple (numpy array, list)
+    value of each path discounted to time 0 and the regression of each date as a tuple
+    (coefficients, center, scale), None where nothing was regressed. The regressions fit the continuation
+    value discounted to the first simulation date
+    """
+    time_intervals = gbm_paths.shape[0]
+    # values are kept discounted to time 0, so that only the exercised paths need discounting at each date
+    discounts = discount ** np.arange(time_intervals)
+    values = np.maximum(payoff_sign * (gbm_paths[-1] - strike), 0) * discounts[-1]
+    fitted = [None] * time_intervals
+    for t in range(time_intervals - 2, 0, -1):
+        exercise = payoff_sign * (gbm_paths[t] - strike)
+        regressed = np.flatnonzero(exercise > 0) if itm_only else np.arange(len(values))
+        if len(regressed) == 0:
+            continue
+        state = gbm_paths[t, regressed] / strike
+        if coefficients is None:
+            if len(state) <= degree:
+                continue
+            design, center, scale = basis_matrix(state, degree, basis)
+            fitted[t] = (least_squares(design, values[regressed]), center, scale)
+        else:
+            fitted[t] = coefficients[t]
+            if fitted[t] is None:
+                continue
+            design = basis_matrix(state, degree, basis, fitted[t][1], fitted[t][2])[0]
+        discounted_exercise = np.maximum(exercise[regressed], 0) * discounts[t]
+        exercised = discounted_exercise > np.dot(design, fitted[t][0])
+        values[regressed[exercised]] = discounted_exercise[exercised]
+    return values, fitted
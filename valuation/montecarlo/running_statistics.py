@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+
+
+class RunningStatistics:
+    """
+    Class accumulating the mean and variance of a stream of samples block by block,
+    without keeping the samples themselves
+    """
+
+    def __init__(self):
+        """
+        Class default constructor
+        :return: an empty accumulator
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, samples):
+        """
+        Method adding a block of samples to the accumulator
+        :param samples: numpy array
+        :return:
+        """
+        samples = np.asarray(samples, dtype=float).ravel()
+        if len(samples) == 0:
+            return
+        block = RunningStatistics()
+        block.count = len(samples)
+        block.mean = float(np.mean(samples))
+        block.m2 = float(np.sum((samples - block.mean) ** 2))
+        self.merge(block)
+
+    def merge(self, other):
+        """
+        Method combining the statistics of another accumulator into this one (Chan et al. pairwise update)
+        :param other: RunningStatistics
+        :return:
+        """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+
+    @property
+    def variance(self):
+        """
+        Unbiased sample variance
+        :return: float
+        """
+        if self.count < 2:
+            return float('nan')
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std_error(self):
+        """
+        Standard error of the mean
+        :return: float
+        """
+        if self.count < 2:
+            return float('inf')
+        return math.sqrt(self.variance / self.count)
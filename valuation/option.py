@@ -13,7 +13,7 @@ class Option:
         :param option_type: int
         type of the option, 1: Call, 2: Put
         :param style: int
-        style of the option, 1: Europeen 2: American
+        style of the option, 1: Europeen 2: American 3: Asian (arithmetic average price)
         :param underlying_price: float
         price of the underlying at time 0
         :param strike: float
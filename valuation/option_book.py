@@ -0,0 +1,210 @@
+import numpy as np
+
+from valuation.option import Option
+
+# one record per contract, the fields being the attributes of Option plus an underlying identifier
+BOOK_DTYPE = np.dtype([('option_type', np.int8), ('style', np.int8), ('underlying_price', np.float64),
+                       ('strike', np.float64), ('maturity', np.float64), ('implied_volatility', np.float64),
+                       ('asset', np.int8), ('underlying', np.int32)])
+# codes of the option types and styles that Option also accepts by name
+OPTION_TYPES = {'call': 1, 'put': 2}
+STYLES = {'european': 1, 'american': 2, 'asian': 3}
+
+
+class OptionBook:
+    """
+    Class storing the terms of many contracts as columns of a NumPy structured array, one record per contract,
+    so that a book of hundreds of thousands of options is a single allocation that engines read column-wise.
+    Basic slicing returns books sharing the same records (no copy), masks and index arrays return copies.
+    """
+
+    def __init__(self, contracts):
+        """
+        Class default constructor
+        :param contracts: numpy array
+        structured array of BOOK_DTYPE, used without copy
+        :return:
+        """
+        contracts = np.asarray(contracts)
+        if contracts.dtype != BOOK_DTYPE:
+            raise ValueError("contracts must be a structured array of BOOK_DTYPE")
+        self.contracts = np.atleast_1d(contracts)
+
+    @staticmethod
+    def from_arrays(option_types, styles, underlying_prices, strikes, maturities, implied_volatilities=0.2,
+                    assets=1, underlyings=0):
+        """
+        Book built from one array (or scalar, broadcast) per term
+        :param option_types: numpy array
+        1: Call, 2: Put
+        :param styles: numpy array
+        1: Europeen 2: American 3: Asian
+        :param underlying_prices: numpy array
+        :param strikes: numpy array
+        :param maturities: numpy array
+        :param implied_volatilities: numpy array
+        :param assets: numpy array
+        asset class codes of Option
+        :param underlyings: numpy array
+        identifier of the underlying of each contract
+        :return: OptionBook
+        """
+        columns = np.broadcast_arrays(*[np.asarray(column) for column in (
+            option_types, styles, underlying_prices, strikes, maturities, implied_volatilities, assets,
+            underlyings)])
+        contracts = np.empty(columns[0].size, dtype=BOOK_DTYPE)
+        for name, column in zip(BOOK_DTYPE.names, columns):
+            contracts[name] = column.ravel()
+        return OptionBook(contracts)
+
+    @staticmethod
+    def from_options(options, underlyings=None):
+        """
+        Book holding the terms of Option objects
+        :param options: list of Option
+        :param underlyings: numpy array
+        identifier of the underlying of each option. By default options quoted on the same underlying price
+        share an identifier.
+        :return: OptionBook
+        """
+        contracts = np.array([(_code(option.option_type, OPTION_TYPES, 'option_type'),
+                               _code(option.style, STYLES, 'style'), option.underlying_price, option.strike,
+                               option.maturity, np.nan if option.implied_volatility is None else
+                               option.implied_volatility, option.asset, 0) for option in options], dtype=BOOK_DTYPE)
+        if underlyings is None:
+            underlyings = np.unique(contracts['underlying_price'], return_inverse=True)[1]
+        contracts['underlying'] = underlyings
+        return OptionBook(contracts)
+
+    def to_options(self):
+        """
+        Option objects with the terms of the contracts, None for the missing implied volatilities
+        :return: list of Option
+        """
+        columns = [self.contracts[name].tolist() for name in BOOK_DTYPE.names[:-1]]
+        columns[5] = [None if volatility != volatility else volatility for volatility in columns[5]]
+        return [Option(*terms) for terms in zip(*columns)]
+
+    def __len__(self):
+        return len(self.contracts)
+
+    def __getitem__(self, index):
+        """
+        Sub-book of the contracts selected by a slice (a view), a boolean mask or an index array (copies)
+        :return: OptionBook
+        """
+        return OptionBook(self.contracts[index])
+
+    def __repr__(self):
+        return "OptionBook(" + str(len(self)) + " contracts)"
+
+    @property
+    def option_types(self):
+        return self.contracts['option_type']
+
+    @property
+    def styles(self):
+        return self.contracts['style']
+
+    @property
+    def underlying_prices(self):
+        return self.contracts['underlying_price']
+
+    @property
+    def strikes(self):
+        return self.contracts['strike']
+
+    @property
+    def maturities(self):
+        return self.contracts['maturity']
+
+    @property
+    def implied_volatilities(self):
+        return self.contracts['implied_volatility']
+
+    @property
+    def assets(self):
+        return self.contracts['asset']
+
+    @property
+    def underlyings(self):
+        return self.contracts['underlying']
+
+    def mask(self, option_type=None, style=None, asset=None, underlying=None):
+        """
+        Boolean mask of the contracts matching every given term
+        :param option_type: int
+        :param style: int
+        :param asset: int
+        :param underlying: int
+        :return: numpy array of bool
+        """
+        selected = np.ones(len(self), dtype=bool)
+        for name, value in (('option_type', option_type), ('style', style), ('asset', asset),
+                            ('underlying', underlying)):
+            if value is not None:
+                selected &= self.contracts[name] == value
+        return selected
+
+    def select(self, option_type=None, style=None, asset=None, underlying=None):
+        """
+        Sub-book of the contracts matching every given term, see mask
+        :return: OptionBook
+        """
+        return self[self.mask(option_type, style, asset, underlying)]
+
+    def factorize(self, by):
+        """
+        Distinct values of the given columns and position of each contract among them, so that duplicated
+        contracts can be priced once
+        :param by: tuple
+        field names of BOOK_DTYPE, or arrays with one value per contract (volatilities for instance)
+        :return: tuple (list of numpy arrays, numpy array)
+        one array of distinct keys per column, sorted lexicographically, and the index of the key of each
+        contract
+        """
+        columns = [self.contracts[column] if isinstance(column, str) else np.asarray(column) for column in by]
+        order = np.lexsort(columns[::-1])
+        columns = [column[order] for column in columns]
+        change = np.zeros(len(order), dtype=bool)
+        change[:1] = True
+        for column in columns:
+            change[1:] |= column[1:] != column[:-1]
+        inverse = np.empty(len(order), dtype=np.intp)
+        inverse[order] = np.cumsum(change) - 1
+        return [column[change] for column in columns], inverse
+
+    def groups(self, by=('underlying', 'maturity')):
+        """
+        Positions of the contracts sharing the same values of the given columns, groups being sorted by key
+        :param by: tuple
+        field names of BOOK_DTYPE, or arrays with one value per contract, see factorize
+        :return: list of tuples (tuple, numpy array)
+        key of each group and positions of its contracts in the book
+        """
+        keys, inverse = self.factorize(by)
+        order = np.argsort(inverse, kind='stable')
+        stops = np.cumsum(np.bincount(inverse, minlength=len(keys[0])))
+        starts = stops - np.bincount(inverse, minlength=len(keys[0]))
+        return [(tuple(key[group].item() for key in keys), order[starts[group]:stops[group]])
+                for group in range(len(keys[0]))]
+
+
+def _code(value, codes, name):
+    """
+    Integer code of an option type or style given by code or by name
+    :param value: int or str
+    :param codes: dict
+    codes by name
+    :param name: str
+    term, for the error message
+    :return: int
+    """
+    if isinstance(value, str):
+        if value.lower() not in codes:
+            raise ValueError(name + " must be one of " + str(sorted(codes)) + " or their codes, not " + repr(value))
+        return codes[value.lower()]
+    if value not in codes.values():
+        raise ValueError(name + " must be one of " + str(sorted(codes.values())) + " or their names, not " +
+                         repr(value))
+    return value
@@ -0,0 +1,227 @@
+import time
+import warnings
+
+import numpy as np
+
+from valuation import black_scholes_merton as bsm
+from valuation import instrumentation
+from valuation.binomial.binomial_lattice import lattice_book_value
+from valuation.fourier import characteristic_functions as cf
+from valuation.fourier.fourier_valuation import Fourier
+from valuation.fourier.lewis import LewisPricer
+from valuation.montecarlo.monte_carlo_simulation import MonteCarloSimulation
+from valuation.option import Option
+from valuation.option_book import OptionBook
+
+ENGINES = ('auto', 'bsm', 'lattice', 'cos', 'lewis', 'mc')
+
+
+def price(book, market_data, engine='auto', tolerance=1e-3, time_budget=None, max_paths=2000000,
+          stochastic_volatility=None):
+    """
+    Values a book of contracts through a single interface. With engine='auto' each contract is routed to the
+    cheapest engine able to value it within tolerance:
+    European options to the closed form (Black-Scholes-Merton) or to the COS method under Heston,
+    American options to a Leisen-Reimer lattice refined until its Richardson estimates agree within tolerance,
+    Asian options and American options under Heston to Monte Carlo, with enough paths for a standard error
+    below tolerance.
+    :param book: OptionBook, Option or list of Option
+    :param market_data: MarketData
+    the market is taken as Heston when kappa, theta, std_volatility and rho are all set
+    :param engine: str
+    'auto' or the engine to use for every contract: 'bsm', 'lattice', 'cos', 'lewis' or 'mc'
+    :param tolerance: float
+    absolute accuracy targeted for each value
+    :param time_budget: float
+    seconds granted to the refinements (lattice steps, Monte Carlo paths), which stop early when it is spent,
+    no limit when None
+    :param max_paths: int
+    largest number of Monte Carlo paths per contract group
+    :param stochastic_volatility: bool
+    simulate the Heston model rather than a constant volatility, defaults to whether the market is Heston
+    :return: tuple (numpy array, numpy array, numpy array)
+    value, error estimate (0 for closed forms, standard error for Monte Carlo, change between the two last
+    refinements otherwise) and engine used of each contract, NaN and '' for the contracts left unvalued.
+    A RuntimeWarning is issued when error estimates are still above tolerance, because max_paths, the largest
+    refinement or the time budget was reached first.
+    """
+    if engine not in ENGINES:
+        raise ValueError("engine must be one of " + str(ENGINES))
+    book = _as_book(book)
+    heston = _is_heston(market_data)
+    if stochastic_volatility is None:
+        stochastic_volatility = heston
+    start = time.perf_counter()
+    deadline = None if time_budget is None else start + time_budget
+
+    values = np.full(len(book), np.nan)
+    errors = np.full(len(book), np.nan)
+    engines = np.full(len(book), '', dtype='<U7')
+    routes = _routes(book, heston, stochastic_volatility) if engine == 'auto' else \
+        [(engine, np.arange(len(book)))]
+    for route, index in routes:
+        if len(index) == 0:
+            continue
+        sub_book = book[index]
+        instrumentation.count('contracts_' + route, len(index))
+        with instrumentation.stage('engine_' + route):
+            route_values, route_errors = _route_value(route, sub_book, market_data, heston, tolerance, deadline,
+                                                      max_paths, stochastic_volatility)
+        valued = ~np.isnan(route_values)
+        values[index] = route_values
+        errors[index] = np.where(valued, route_errors, np.nan)
+        engines[index] = np.where(valued, route, '')
+    missed = np.flatnonzero(errors >= tolerance)
+    if len(missed) > 0:
+        warnings.warn(str(len(missed)) + " contracts valued outside the tolerance of " + str(tolerance) +
+                      " (largest error estimate " + str(float(np.max(errors[missed]))) + "), see the errors returned",
+                      RuntimeWarning)
+    return values, errors, engines
+
+
+def _route_value(route, book, market_data, heston, tolerance, deadline, max_paths, stochastic_volatility):
+    """
+    Values and error estimates of the contracts of a book with one engine
+    :return: tuple (numpy array, numpy array)
+    """
+    if route == 'bsm':
+        return bsm.BSM_value_book(book, market_data), np.zeros(len(book))
+    if route == 'cos':
+        return _cos_value(book, market_data, heston, tolerance)
+    if route == 'lewis':
+        return _lewis_value(book, market_data, heston)
+    if route == 'lattice':
+        return _lattice_value(book, market_data, tolerance, deadline)
+    return _monte_carlo_value(book, market_data, tolerance, deadline, max_paths, stochastic_volatility)
+
+
+def _as_book(book):
+    """
+    OptionBook of the contracts to value
+    :param book: OptionBook, Option or list of Option
+    :return: OptionBook
+    """
+    if isinstance(book, OptionBook):
+        return book
+    if isinstance(book, Option):
+        return OptionBook.from_options([book])
+    return OptionBook.from_options(book)
+
+
+def _is_heston(market_data):
+    """
+    Whether the market data holds the parameters of the Heston model
+    :param market_data: MarketData
+    :return: bool
+    """
+    return all(parameter is not None for parameter in (market_data.kappa, market_data.theta,
+                                                        market_data.std_volatility, market_data.rho))
+
+
+def _routes(book, heston, stochastic_volatility):
+    """
+    Engine chosen for each style of contract by the automatic routing
+    :return: list of tuples (str, numpy array)
+    engine and positions of the contracts it values
+    """
+    european = np.flatnonzero(book.styles == 1)
+    american = np.flatnonzero(book.styles == 2)
+    asian = np.flatnonzero(book.styles == 3)
+    if heston:
+        return [('cos', european), ('mc' if stochastic_volatility else 'lattice', american), ('mc', asian)]
+    return [('bsm', european), ('lattice', american), ('mc', asian)]
+
+
+def _cos_value(book, market_data, heston, tolerance):
+    """
+    COS values, the number of terms being doubled until two successive values agree within tolerance
+    :return: tuple (numpy array, numpy array)
+    values and change from the previous number of terms
+    """
+    model = 'heston' if heston else 'bsm'
+    terms = 128
+    values = Fourier.valuate_book(book, market_data, model, terms)
+    while True:
+        terms *= 2
+        refined = Fourier.valuate_book(book, market_data, model, terms)
+        change = np.abs(refined - values)
+        values = refined
+        if not np.any(change >= tolerance) or terms >= 4096:
+            return values, change
+
+
+def _lewis_value(book, market_data, heston):
+    """
+    Lewis values of the European contracts on 96 nodes, the error being estimated against 64 nodes. Without
+    Heston parameters, a volatility surface is read at each contract and contracts are grouped by volatility.
+    :return: tuple (numpy array, numpy array)
+    """
+    values = np.full(len(book), np.nan)
+    errors = np.full(len(book), np.nan)
+    european = np.flatnonzero(book.styles == 1)
+    if heston:
+        # the initial variance is a parameter of the model, surfaces are rejected
+        volatilities = np.zeros(len(book))
+        characteristic_function = cf.characteristic_function(market_data, 'heston')
+    else:
+        volatilities = np.broadcast_to(market_data.volatility_for(book.strikes, book.maturities), (len(book),))
+    for (underlying_price, volatility), index in book[european].groups((book.underlying_prices[european],
+                                                                        volatilities[european])):
+        index = european[index]
+        if not heston:
+            characteristic_function = cf.characteristic_function(market_data, 'bsm', volatility)
+        arguments = (underlying_price, book.strikes[index], book.maturities[index], market_data.r,
+                     book.option_types[index])
+        values[index] = LewisPricer(characteristic_function, 96).value(*arguments)
+        errors[index] = np.abs(LewisPricer(characteristic_function, 64).value(*arguments) - values[index])
+    return values, errors
+
+
+def _lattice_value(book, market_data, tolerance, deadline, initial_steps=51, max_steps=10000):
+    """
+    Leisen-Reimer lattice values with Richardson extrapolation, the number of steps being doubled until two
+    successive values agree within tolerance, the deadline is passed or max_steps is reached
+    :return: tuple (numpy array, numpy array)
+    values and change from the previous refinement
+    """
+    steps = initial_steps
+    values = lattice_book_value(book, market_data, steps, 'lr', richardson=True)
+    while True:
+        steps *= 2
+        refined = lattice_book_value(book, market_data, steps, 'lr', richardson=True)
+        change = np.abs(refined - values)
+        values = refined
+        if not np.any(change >= tolerance) or 2 * steps > max_steps or \
+                (deadline is not None and time.perf_counter() > deadline):
+            return values, change
+
+
+def _monte_carlo_value(book, market_data, tolerance, deadline, max_paths, stochastic_volatility,
+                       pilot_paths=10000, block_size=10000):
+    """
+    Monte Carlo values: a pilot run estimates the standard errors, and the contracts that miss the tolerance
+    are valued again by streaming blocks of paths until their standard error reaches the tolerance, max_paths
+    is reached or their share of the time left is spent, so that memory stays flat whatever the number of paths.
+    American exercise rules are always fitted on paths independent from the valued ones, so that a standard
+    error within tolerance is not that of a high-biased in-sample estimate.
+    :return: tuple (numpy array, numpy array)
+    values and standard errors
+    """
+    values, errors = MonteCarloSimulation.valuate_book(book, market_data, stochastic_volatility,
+                                                       paths=pilot_paths, out_of_sample=True)
+    missed = np.flatnonzero(errors >= tolerance)
+    if len(missed) == 0:
+        return values, errors
+    groups = book[missed].groups(('underlying_price', 'maturity', 'strike', 'option_type', 'style', 'asset'))
+    for position, ((underlying_price, maturity, strike, option_type, style, asset), index) in enumerate(groups):
+        time_budget = None
+        if deadline is not None:
+            time_budget = (deadline - time.perf_counter()) / (len(groups) - position)
+            if time_budget <= 0:
+                break
+        option = Option(option_type, style, underlying_price, strike, maturity, asset=asset)
+        simulation = MonteCarloSimulation(option, market_data, stochastic_volatility, paths=block_size)
+        result = simulation.valuate_option_streaming(tolerance, time_budget, max_paths, block_size)
+        if result is not None and result[1] < errors[missed[index[0]]]:
+            values[missed[index]], errors[missed[index]] = result[:2]
+    return values, errors
@@ -0,0 +1,250 @@
+import collections
+import threading
+
+from valuation import instrumentation
+from valuation.market_data import MarketData
+from valuation.option import Option
+from valuation.volatility_surface import VolatilitySurface, flat_volatility
+
+# marker of the values absent from the cache, None being a possible value
+_MISSING = object()
+
+
+class _Frozen:
+    """
+    Base of the immutable value types: attributes are set once by _freeze, and equality and hashing follow the
+    tuple of the attributes, computed once, so that instances are cheap dictionary keys
+    """
+    __slots__ = ('_key', '_hash')
+    FIELDS = ()
+
+    def _freeze(self, values):
+        for name, value in zip(self.FIELDS, values):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_key', tuple(values))
+        object.__setattr__(self, '_hash', hash((type(self).__name__,) + self._key))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(type(self).__name__ + " is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(type(self).__name__ + " is immutable")
+
+    def __eq__(self, other):
+        return self is other or (type(self) is type(other) and self._key == other._key)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return type(self).__name__ + "(" + ", ".join(name + "=" + repr(value)
+                                                     for name, value in zip(self.FIELDS, self._key)) + ")"
+
+    def __reduce__(self):
+        return type(self), self._key
+
+
+class OptionTerms(_Frozen):
+    """
+    Immutable, hashable terms of an option contract, with the attributes of Option (C0 excepted)
+    """
+    FIELDS = ('option_type', 'style', 'underlying_price', 'strike', 'maturity', 'implied_volatility', 'asset')
+    __slots__ = FIELDS
+
+    def __init__(self, option_type=1, style=1, underlying_price=100.0, strike=100.0, maturity=2.0,
+                 implied_volatility=0.2, asset=1):
+        """
+        Class default constructor, see Option
+        :return:
+        """
+        self._freeze((int(option_type), int(style), float(underlying_price), float(strike), float(maturity),
+                      None if implied_volatility is None else float(implied_volatility), int(asset)))
+
+    @staticmethod
+    def from_option(option):
+        """
+        Snapshot of the terms of an Option
+        :param option: Option
+        :return: OptionTerms
+        """
+        return OptionTerms(option.option_type, option.style, option.underlying_price, option.strike,
+                           option.maturity, option.implied_volatility, option.asset)
+
+    def to_option(self):
+        """
+        Mutable Option with the same terms
+        :return: Option
+        """
+        return Option(*self._key)
+
+
+class MarketState(_Frozen):
+    """
+    Immutable, hashable snapshot of a MarketData. A volatility surface is part of the state by identity,
+    so a refitted surface is a new state.
+    """
+    FIELDS = ('r', 'volatility', 'rho', 'theta', 'kappa', 'std_volatility')
+    __slots__ = FIELDS
+
+    def __init__(self, r=0.05, volatility=0.2, rho=None, theta=None, kappa=None, std_volatility=None):
+        """
+        Class default constructor, see MarketData
+        :return:
+        """
+        volatility = volatility if isinstance(volatility, VolatilitySurface) else float(volatility)
+        self._freeze((float(r), volatility) + tuple(None if value is None else float(value)
+                                                    for value in (rho, theta, kappa, std_volatility)))
+
+    @staticmethod
+    def from_market_data(market_data):
+        """
+        Snapshot of the current content of a MarketData
+        :param market_data: MarketData
+        :return: MarketState
+        """
+        return MarketState(market_data.r, market_data.volatility, market_data.rho, market_data.theta,
+                           market_data.kappa, market_data.std_volatility)
+
+    def to_market_data(self):
+        """
+        Mutable MarketData with the same content
+        :return: MarketData
+        """
+        return MarketData(*self._key)
+
+    def volatility_for(self, strike, maturity):
+        """
+        Volatility of contracts of the given strikes and maturities, see MarketData.volatility_for
+        :param strike: float or numpy array
+        :param maturity: float or numpy array
+        :return: float or numpy array
+        """
+        return flat_volatility(self.volatility, strike, maturity)
+
+
+class PricingCache:
+    """
+    Bounded least recently used cache of option values, keyed on the terms of the contract, the state of the
+    market, the pricer and its keyword parameters. Mutable Option and MarketData objects are snapshot into
+    OptionTerms and MarketState on every lookup, so changing them in place simply leads to new keys; the values
+    computed on the previous market can be dropped with invalidate. The cache can be shared between threads.
+    """
+
+    def __init__(self, maxsize=4096, pricer=None):
+        """
+        Class default constructor
+        :param maxsize: int
+        number of values kept, the least recently used ones being evicted first
+        :param pricer: function
+        default pricer called as pricer(option, market_data, **parameters),
+        black_scholes_merton.BSM_value when None
+        :return:
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        if pricer is None:
+            from valuation.black_scholes_merton import BSM_value
+            pricer = BSM_value
+        self.maxsize = maxsize
+        self.pricer = pricer
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.RLock()
+
+    def value(self, option, market_data, pricer=None, **parameters):
+        """
+        Value of an option, computed by the pricer only when the same contract has not already been priced on
+        the same market with the same parameters
+        :param option: Option or OptionTerms
+        :param market_data: MarketData or MarketState
+        :param pricer: function
+        defaults to the pricer of the cache. Settings of the pricer that are not attributes of Option and
+        MarketData (steps, paths...) must be passed as keyword parameters to be part of the key
+        :param parameters:
+        keyword parameters of the pricer, which must be hashable
+        :return:
+        value returned by the pricer
+        """
+        pricer = self.pricer if pricer is None else pricer
+        key = self.key(option, market_data, pricer, parameters)
+        with self.lock:
+            result = self.entries.get(key, _MISSING)
+            if result is not _MISSING:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                instrumentation.count('cache_hits')
+                return result
+            self.misses += 1
+        instrumentation.count('cache_misses')
+        # the pricer runs outside the lock, concurrent misses on the same key price it twice
+        result = pricer(option, market_data, **parameters)
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    @staticmethod
+    def key(option, market_data, pricer, parameters=None):
+        """
+        Cache key of a valuation
+        :param option: Option or OptionTerms
+        :param market_data: MarketData or MarketState
+        :param pricer: function
+        :param parameters: dict
+        :return: tuple
+        """
+        terms = option if isinstance(option, OptionTerms) else OptionTerms.from_option(option)
+        state = market_data if isinstance(market_data, MarketState) else MarketState.from_market_data(market_data)
+        return terms, state, pricer, tuple(sorted(parameters.items())) if parameters else ()
+
+    def invalidate(self, market_data=None):
+        """
+        Method dropping the values computed on a market, or every value when market_data is None.
+        To be called when market data changes, the old values being otherwise kept until they are evicted.
+        A MarketData is read as it is now, so the state of a market about to be changed in place is best taken
+        with MarketState.from_market_data beforehand.
+        :param market_data: MarketData or MarketState
+        :return: int
+        number of values dropped
+        """
+        with self.lock:
+            if market_data is None:
+                stale = list(self.entries)
+            else:
+                state = market_data if isinstance(market_data, MarketState) else \
+                    MarketState.from_market_data(market_data)
+                stale = [key for key in self.entries if key[1] == state]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        """
+        Method dropping every value and resetting the statistics
+        :return:
+        """
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        """
+        Usage statistics of the cache
+        :return: dict
+        with keys 'hits', 'misses', 'hit_rate', 'size', 'maxsize', 'evictions' and 'invalidations'
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / float(lookups) if lookups else 0.0, 'size': len(self.entries),
+                    'maxsize': self.maxsize, 'evictions': self.evictions, 'invalidations': self.invalidations}
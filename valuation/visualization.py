@@ -0,0 +1,186 @@
+# Plotting of the valuations. Matplotlib is only needed by this module, which the engines import on the
+# first call to one of their plotting methods, so that pricing alone never loads it.
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from valuation import black_scholes_merton as bsm
+
+
+def plot_values(option, market_data):
+    """
+    Plots European option values for different strikes, maturities, short rates and volatilities
+    :param option: Option
+    :param market_data: MarketData
+    :return:
+    """
+    with plt.rc_context({'font.family': 'serif'}):
+        plt.figure(figsize=(10, 8.3))
+        points = 100
+
+        # C(K) plot
+        plt.subplot(221)
+        klist = np.linspace(option.strike - 20, option.strike + 20, points)
+        vlist = bsm.BSM_value_array(option.underlying_price, klist, option.maturity, market_data.r,
+                                    market_data.volatility_for(klist, option.maturity), option.option_type)
+        plt.plot(klist, vlist)
+        plt.grid()
+        plt.xlabel('strike $K$')
+        plt.ylabel('present value')
+
+        # C(T) plot
+        plt.subplot(222)
+        tlist = np.linspace(0.0001, option.maturity, points)
+        vlist = bsm.BSM_value_array(option.underlying_price, option.strike, tlist, market_data.r,
+                                    market_data.volatility_for(option.strike, tlist), option.option_type)
+        plt.plot(tlist, vlist)
+        plt.grid(True)
+        plt.xlabel('maturity $T$')
+
+        # C(r) plot
+        plt.subplot(223)
+        rlist = np.linspace(0, 0.1, points)
+        vlist = bsm.BSM_value_array(option.underlying_price, option.strike, option.maturity, rlist,
+                                    market_data.volatility_for(option.strike, option.maturity), option.option_type)
+        plt.plot(rlist, vlist)
+        plt.grid(True)
+        plt.xlabel('short rate $r$')
+        plt.ylabel('present value')
+        plt.axis('tight')
+
+        # C(sigma) plot
+        plt.subplot(224)
+        sigmalist = np.linspace(0.001, 0.5, points)
+        vlist = bsm.BSM_value_array(option.underlying_price, option.strike, option.maturity, market_data.r,
+                                    sigmalist, option.option_type)
+        plt.plot(sigmalist, vlist)
+        plt.grid(True)
+        plt.xlabel(r'volatility $\sigma$')
+        plt.show()
+
+
+def plot_paths_distribution(simulation, nb_bins=50, normed=True):
+    """
+    Shows the distribution of the final values of the paths of a simulation
+    :param simulation: MonteCarloSimulation
+    with generated paths
+    :param nb_bins: int
+    :param normed: bool
+    plot densities rather than counts
+    :return:
+    """
+    ylabel = "Normalized sum" if normed else "Sum"
+
+    plt.figure()
+    if simulation.stochastic_volatility:
+        plt.subplot(211)
+        plt.hist(simulation.gbm_paths[-1], nb_bins, density=normed, histtype='bar', rwidth=0.8)
+        plt.ylabel(ylabel)
+        plt.title("Final underlying value of simulated Monte Carlo paths (geometric brownian motion)")
+
+        plt.subplot(212)
+        plt.hist(simulation.srd_paths[-1], nb_bins, density=normed, histtype='bar', rwidth=0.8)
+        plt.ylabel(ylabel)
+        plt.xlabel("Path final value")
+        plt.title("Final variance value of simulated Monte Carlo paths (square-root diffusion)")
+    else:
+        plt.hist(simulation.gbm_paths[-1], nb_bins, density=normed, histtype='bar', rwidth=0.8)
+        plt.ylabel(ylabel)
+        plt.xlabel("Path final value")
+        plt.title("Final underlying value of simulated Monte Carlo paths (geometric brownian motion)")
+    plt.draw()
+
+
+def plot_paths_graphs(simulation, nb_paths=10):
+    """
+    Shows the motion of the first paths of a simulation
+    :param simulation: MonteCarloSimulation
+    with generated paths
+    :param nb_paths: int
+    number of paths to show
+    :return:
+    """
+    times = np.linspace(0, simulation.option.maturity, simulation.time_intervals)
+    plt.figure()
+    if simulation.stochastic_volatility:
+        sub1 = plt.subplot(211)
+        plt.plot(times, simulation.gbm_paths[:, :nb_paths])
+        plt.grid(True)
+        plt.ylabel("Underlying price")
+        plt.title("Simulated Monte Carlo paths for underlying (geometric brownian motion)")
+        plt.setp(sub1.get_xticklabels(), visible=False)
+        plt.subplot(212)
+        plt.plot(times, simulation.srd_paths[:, :nb_paths])
+        plt.axhline(simulation.market_data.theta, color='r', ls='--', lw=2.0)
+        plt.grid(True)
+        plt.ylabel("Variance")
+        plt.xlabel("Time (years)")
+        plt.title("Simulated Monte Carlo paths for variance (square-root diffusion)")
+    else:
+        plt.plot(times, simulation.gbm_paths[:, :nb_paths])
+        plt.grid(True)
+        plt.ylabel("Underlying price")
+        plt.xlabel("Time (years)")
+        plt.title("Simulated Monte Carlo paths for underlying (geometric brownian motion)")
+    plt.draw()
+
+
+def tree_edges(tree):
+    """
+    Segments joining the nodes of a binary tree to their children
+    :param tree: BinaryTree
+    :return: list of [tuple, tuple]
+    """
+    edges = []
+    for child in (tree.getDownChild(), tree.getUpChild()):
+        if child is not None:
+            edges.append([tree.drawPosition, child.drawPosition])
+            edges = edges + tree_edges(child)
+    return edges
+
+
+def node_positions(tree):
+    """
+    Position, underlying price, payoff and exercise decision of the nodes of a binary tree
+    :param tree: BinaryTree
+    :return: set of tuples
+    """
+    position = set()
+    position.add(((tree.drawPosition[0], tree.drawPosition[1] - 4), tree.St, tree.payOff, tree.exercice))
+    for child in (tree.getDownChild(), tree.getUpChild()):
+        if child is not None:
+            position.update(node_positions(child))
+    return position
+
+
+def plot_tree(tree, option, n):
+    """
+    Draws a binary tree whose underlying prices and payoffs have been computed, with the nodes where the
+    option should be exercised
+    :param tree: BinaryTree
+    root of the tree
+    :param option: BinaryOption
+    :param n: int
+    number of steps of the tree
+    :return:
+    """
+    fig = plt.figure()
+    ax = fig.add_subplot(111)
+    fig.subplots_adjust(top=0.85)
+
+    for edge in tree_edges(tree):
+        ax.plot([p[0] for p in edge], [p[1] for p in edge], 'k-*')
+
+    for p in node_positions(tree):
+        if p[3] is True:
+            ax.annotate(str(round(p[1], 2)) + "\n\nPayOff=" + str(round(p[2], 2)), xy=p[0],
+                        arrowprops=dict(facecolor='black'), label="ss")
+        else:
+            ax.annotate(str(round(p[1], 2)) + "\n\nPayOff=" + str(round(p[2], 2)), xy=p[0], label="")
+
+    ax.annotate("should exercice the option", xy=(2, n * 20 + 15), arrowprops=dict(facecolor='black'))
+
+    plt.title("Option Valuation \n" + str(option), fontsize=9, fontweight='bold')
+    plt.xlim([0, (n + 1) * 10])
+    plt.ylim([0, (n + 1) * 20])
+    plt.show()
@@ -0,0 +1,144 @@
+import numpy as np
+
+# raw SVI parameters of a slice, in the order of the coefficient arrays
+SVI_PARAMETERS = ('a', 'b', 'rho', 'm', 'sigma')
+
+
+class VolatilitySurface:
+    """
+    Class holding an implied volatility surface as raw SVI slices of total implied variance
+    w(k) = a + b (rho (k - m) + sqrt((k - m)^2 + sigma^2)), k = ln(K / F) being the log forward moneyness.
+    Between expiries the total variance is interpolated linearly in maturity at fixed k, after being made
+    non-decreasing across the slices, so the surface is free of calendar arbitrage. Before the first expiry
+    and after the last one the implied volatility of the closest slice is kept.
+    """
+
+    def __init__(self, underlying_price, r, maturities, coefficients):
+        """
+        Class default constructor
+        :param underlying_price: float
+        :param r: float
+        free-risk short rate, giving the forwards F = S_0 e^(rT)
+        :param maturities: numpy array
+        increasing expiries of the slices
+        :param coefficients: numpy array
+        (slices, 5) raw SVI parameters of each slice, see SVI_PARAMETERS
+        :return:
+        """
+        self.underlying_price = underlying_price
+        self.r = r
+        self.maturities = np.asarray(maturities, dtype=float)
+        self.coefficients = np.asarray(coefficients, dtype=float).reshape(len(self.maturities), 5)
+
+    @staticmethod
+    def fit(underlying_price, r, strikes, maturities, volatilities):
+        """
+        Fits one raw SVI slice per expiry to implied volatilities by least squares on the volatilities.
+        The fit keeps b >= 0, |rho| < 1, sigma > 0, a non-negative minimum variance and slopes of the
+        total variance below 2 (Roger Lee's bound).
+        :param underlying_price: float
+        :param r: float
+        :param strikes: numpy array
+        :param maturities: numpy array
+        expiry of each quote, broadcast against strikes
+        :param volatilities: numpy array
+        implied volatility of each quote, broadcast against strikes, NaN quotes being ignored
+        :return: VolatilitySurface
+        """
+        strikes, maturities, volatilities = [array.ravel() for array in np.broadcast_arrays(
+            np.asarray(strikes, dtype=float), np.asarray(maturities, dtype=float),
+            np.asarray(volatilities, dtype=float))]
+        valid = np.isfinite(volatilities)
+        expiries = np.unique(maturities[valid])
+        coefficients = np.empty((len(expiries), 5))
+        for i, maturity in enumerate(expiries):
+            selected = valid & (maturities == maturity)
+            log_moneyness = np.log(strikes[selected] / underlying_price) - r * maturity
+            coefficients[i] = _fit_svi_slice(log_moneyness, volatilities[selected] ** 2 * maturity, maturity)
+        return VolatilitySurface(underlying_price, r, expiries, coefficients)
+
+    def total_variance(self, log_moneyness, maturities):
+        """
+        Total implied variance at log forward moneyness and maturities
+        :param log_moneyness: numpy array
+        :param maturities: numpy array
+        broadcast against log_moneyness
+        :return: numpy array
+        """
+        k, maturities = np.broadcast_arrays(np.asarray(log_moneyness, dtype=float),
+                                            np.asarray(maturities, dtype=float))
+        a, b, rho, m, sigma = [c.reshape((-1,) + (1,) * k.ndim) for c in self.coefficients.T]
+        # (slices, ...) total variance of every slice at every point, cumulated to rule out calendar arbitrage
+        slices = np.maximum.accumulate(a + b * (rho * (k - m) + np.sqrt((k - m) ** 2 + sigma ** 2)), axis=0)
+
+        last = len(self.maturities) - 1
+        upper = np.clip(np.searchsorted(self.maturities, maturities), 1, max(last, 1))
+        lower = upper - 1
+        if last == 0:
+            upper = lower = np.zeros_like(upper)
+        lower_variance = np.take_along_axis(slices, lower[np.newaxis], axis=0)[0]
+        upper_variance = np.take_along_axis(slices, upper[np.newaxis], axis=0)[0]
+        lower_maturity = self.maturities[lower]
+        upper_maturity = self.maturities[upper]
+        span = np.where(upper_maturity > lower_maturity, upper_maturity - lower_maturity, 1.0)
+        weight = np.clip((maturities - lower_maturity) / span, 0, 1)
+        variance = lower_variance + weight * (upper_variance - lower_variance)
+        # constant implied volatility outside the quoted expiries
+        variance = np.where(maturities < self.maturities[0], slices[0] * maturities / self.maturities[0], variance)
+        return np.where(maturities > self.maturities[-1], slices[-1] * maturities / self.maturities[-1], variance)
+
+    def volatility(self, strikes, maturities):
+        """
+        Implied volatilities at strikes and maturities, vectorized
+        :param strikes: numpy array
+        :param maturities: numpy array
+        broadcast against strikes
+        :return: numpy array
+        """
+        maturities = np.maximum(np.asarray(maturities, dtype=float), 1e-8)
+        log_moneyness = np.log(np.asarray(strikes, dtype=float) / self.underlying_price) - self.r * maturities
+        return np.sqrt(np.maximum(self.total_variance(log_moneyness, maturities), 0) / maturities)
+
+
+def flat_volatility(volatility, strike, maturity):
+    """
+    Volatility to use for contracts of the given strikes and maturities, volatility being either a number or a
+    VolatilitySurface
+    :param volatility: float or VolatilitySurface
+    :param strike: float or numpy array
+    :param maturity: float or numpy array
+    :return: float or numpy array
+    """
+    if isinstance(volatility, VolatilitySurface):
+        looked_up = volatility.volatility(strike, maturity)
+        return float(looked_up) if np.ndim(looked_up) == 0 else looked_up
+    return volatility
+
+
+def _fit_svi_slice(log_moneyness, total_variance, maturity):
+    """
+    Least squares fit of a raw SVI slice on implied volatilities, parametrized by its minimum variance so that
+    the bounds keep the total variance non-negative
+    :return: numpy array
+    a, b, rho, m, sigma
+    """
+    from scipy.optimize import least_squares
+
+    volatility = np.sqrt(total_variance / maturity)
+
+    def raw(parameters):
+        minimum, b, rho, m, sigma = parameters
+        return np.array([minimum - b * sigma * np.sqrt(1 - rho ** 2), b, rho, m, sigma])
+
+    def residuals(parameters):
+        a, b, rho, m, sigma = raw(parameters)
+        w = a + b * (rho * (log_moneyness - m) + np.sqrt((log_moneyness - m) ** 2 + sigma ** 2))
+        return np.sqrt(np.maximum(w, 0) / maturity) - volatility
+
+    spread = max(np.ptp(log_moneyness), 1e-2)
+    x0 = np.array([np.min(total_variance), 0.1, -0.3, log_moneyness[np.argmin(total_variance)], 0.1 * spread])
+    bounds = (np.array([0.0, 0.0, -0.999, np.min(log_moneyness) - spread, 1e-4]),
+              np.array([np.max(total_variance) * 2 + 1e-8, 1.0, 0.999, np.max(log_moneyness) + spread, 2 * spread]))
+    # b (1 + |rho|) <= 2 is ensured by b <= 1
+    result = least_squares(residuals, np.clip(x0, bounds[0], bounds[1]), bounds=bounds, method='trf')
+    return raw(result.x)